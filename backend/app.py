@@ -4,284 +4,656 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from flask import Flask, request, jsonify, send_file
 from flask_cors import CORS
-import pandas as pd
-import joblib
-import traceback
-import numpy as np
-
-from backend.visualizations.visualize_data import (
-    plot_histogram,
-    plot_bar,
-    plot_scatter,
-    plot_line,
-    plot_heatmap
-)
+import logging
+import threading
+import time
+from io import BytesIO
+
+from backend.observability.log import configure_logging
+from backend.observability.metrics import REGISTRY, instrument_app, stage
+from backend.model.artifacts import load_serving
+from backend.model.training_worker import ModelSlot, TrainingWorker
+from backend.model.inference import predict_batch
+from backend.model.prediction_cache import PredictionCache
+from backend.model.registry import ModelRegistry, UnknownTenant
+from backend.startup import Warmup
+from backend.store.dataset_store import DatasetStore, DatasetStores
+from backend.store.date_index import parse_window
+from backend.store.job_records import JobRecords
+from backend.store.segment_log import SegmentLog, end_position, segments_dir_for
+from backend.visualizations.plot_cache import PlotCache
+from backend.visualizations.render_queue import RenderQueue, RenderQueueFull
+from backend.visualizations.render_stats import RenderProfileStats
+from backend.visualizations.render_profiles import DEFAULT_PROFILE, RENDER_PROFILES, validate_chart_request
+
+logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
-CORS(app)
+# Expose the render diagnostics headers to the browser
+CORS(app, expose_headers=['X-Plot-Cache', 'X-Render-Profile', 'X-Render-Seconds', 'X-Payload-Bytes',
+                          'X-Points-Drawn', 'X-Point-Reduction', 'Server-Timing'])
 
-try:
-    model_path = os.path.join(os.path.dirname(__file__), 'model', 'model.pkl')
-    print(f"Attempting to load model from: {model_path}")
-    print(f"Model file exists: {os.path.exists(model_path)}")
-    
-    if os.path.exists(model_path):
-        model = joblib.load(model_path)
-        print("Model loaded successfully!")
-        print(f"Model type: {type(model)}")
-        
-        # Test if model has required methods
-        if hasattr(model, 'predict'):
-            print("Model has predict method")
-            # Test with dummy data to ensure model works
-            try:
-                dummy_data = pd.DataFrame([{
-                    'Mood': 5, 'Hour': 14, 'Week(day/end)': 0, 'SleepHours': 7,
-                    'Distractions': 2, 'ConfidenceScore': 6, 'Completed': 1, 'DayOfWeek': 2
-                }])
-                test_pred = model.predict(dummy_data)
-                print(f"Model test prediction successful: {test_pred}")
-            except Exception as test_e:
-                print(f"Model test failed: {test_e}")
-                
-        else:
-            print("WARNING: Model doesn't have predict method")
-    else:
-        print("ERROR: Model file does not exist!")
-        print("Please run: python backend/model/train_tasktype_model.py")
-        model = None
-        
-except Exception as e:
-    print(f"Error loading model: {e}")
-    traceback.print_exc()
-    model = None
+# Request counters, latency/size histograms and /metrics; X-Profile: 1 on a
+# request returns its stage breakdown in a Server-Timing header
+instrument_app(app)
+
+# 'compiled' serves the exported NumPy forest (no sklearn import) when it is
+# current; 'sklearn' always unpickles model.pkl
+MODEL_RUNTIME = os.environ.get('MODEL_RUNTIME', 'compiled')
+
+# Trained models live as versions under backend/model/versions; the newest
+# one that passes a smoke prediction is served. It is loaded by the startup
+# warm-up, so the slot is empty until then.
+MODEL_DIR = os.path.join(os.path.dirname(__file__), 'model')
+model_slot = ModelSlot()
+
+# Memoized /predict results for the live model; PREDICTION_GRID=1 also
+# precomputes every discrete input combination when a model is loaded
+prediction_cache = PredictionCache(
+    max_entries=int(os.environ.get('PREDICTION_CACHE_SIZE', 4096)),
+    precompute_grid=os.environ.get('PREDICTION_GRID', '0') == '1'
+)
+model_slot.add_listener(prediction_cache.warm)
 
 # Path to your cleaned CSV file
 DATA_PATH = os.path.join(os.path.dirname(__file__), "data", "productivity_log_may.csv")
-print(f"Data path: {DATA_PATH}")
-print(f"Data file exists: {os.path.exists(DATA_PATH)}")
+logger.info("Data path: %s (exists: %s)", DATA_PATH, os.path.exists(DATA_PATH))
+
+# The productivity log is parsed once and shared across requests
+dataset_store = DatasetStore(DATA_PATH)
+
+# Per-tenant models and logs, for requests that name a tenant (X-Tenant-Id
+# header, ?tenant= or a "tenant" field): <TENANTS_DIR>/<tenant>/model holds
+# its model versions, <TENANTS_DIR>/<tenant>/data/productivity_log.csv its
+# log. Models are loaded on first use and kept within MODEL_CACHE_BYTES.
+TENANTS_DIR = os.environ.get("TENANTS_DIR", os.path.join(os.path.dirname(__file__), "tenants"))
+model_registry = ModelRegistry(
+    TENANTS_DIR, runtime=MODEL_RUNTIME,
+    max_bytes=int(os.environ.get("MODEL_CACHE_BYTES", 512 * 1024 * 1024))
+)
+tenant_datasets = DatasetStores(max_stores=int(os.environ.get("TENANT_DATASETS", 16)))
+
+# POST /log appends entries to segment files beside the log it extends
+# (backend/store/segment_log.py); the log itself is never rewritten.
+# LOG_FSYNC is 'batch' (synced before the request returns), 'interval'
+# (at most every LOG_FSYNC_SECONDS) or 'never'. The segments are compacted
+# into a cleaned columnar snapshot every LOG_COMPACT_SECONDS (0 = never).
+LOG_FSYNC = os.environ.get("LOG_FSYNC", "batch")
+LOG_FSYNC_SECONDS = float(os.environ.get("LOG_FSYNC_SECONDS", 1.0))
+LOG_COMPACT_SECONDS = float(os.environ.get("LOG_COMPACT_SECONDS", 300))
+ingest_logs = {}  # data path -> SegmentLog
+ingest_logs_lock = threading.Lock()
+
+def _ingest_log(data_path):
+    with ingest_logs_lock:
+        log = ingest_logs.get(data_path)
+        if log is None:
+            log = ingest_logs[data_path] = SegmentLog(
+                data_path, fsync=LOG_FSYNC, fsync_seconds=LOG_FSYNC_SECONDS,
+                compact_seconds=LOG_COMPACT_SECONDS)
+        return log
+
+def _ingest_totals():
+    with ingest_logs_lock:
+        logs = list(ingest_logs.values())
+    return {name: sum(getattr(log, name) for log in logs)
+            for name in ('batches', 'entries', 'fsyncs', 'compactions')}
+
+# Rendered plots are cached on disk, keyed by request and data file contents
+PLOTS_DIR = os.path.join(os.path.dirname(__file__), "plots")
+plot_cache = PlotCache(
+    os.path.join(PLOTS_DIR, "cache"),
+    max_entries=int(os.environ.get("PLOT_CACHE_MAX_ENTRIES", 128)),
+    max_bytes=int(os.environ.get("PLOT_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+)
+
+# Render time and payload size for each output profile
+render_stats = RenderProfileStats()
+
+# Async job status on disk, so any server worker process can report it
+JOBS_DIR = os.environ.get("JOBS_DIR", os.path.join(PLOTS_DIR, "jobs"))
+
+# Background training; new versions are hot-swapped into model_slot
+training_worker = TrainingWorker(
+    DATA_PATH, model_slot, MODEL_DIR, runtime=MODEL_RUNTIME,
+    records=JobRecords(os.path.join(JOBS_DIR, "training"))
+)
+
+# Worker processes for asynchronous renders ({"async": true} on /visualize).
+# New charts are refused with 503 once RENDER_QUEUE_LIMIT are in flight.
+render_queue = RenderQueue(
+    DATA_PATH, plot_cache,
+    max_workers=int(os.environ.get("RENDER_WORKERS", 0)) or None,
+    render_stats=render_stats,
+    max_pending=int(os.environ.get("RENDER_QUEUE_LIMIT", 32)),
+    records=JobRecords(os.path.join(JOBS_DIR, "render"))
+)
+
+# Synchronous renders allowed at once per process; more get a 503 so slow
+# charts can't take every request thread from /predict
+RENDER_CONCURRENCY = int(os.environ.get("RENDER_CONCURRENCY", 4))
+render_slots = threading.BoundedSemaphore(RENDER_CONCURRENCY)
+
+# With RENDER_OFFLOAD=1 synchronous renders also run in the render worker
+# processes and the request thread only waits for the bytes (the default
+# under backend.asgi)
+RENDER_OFFLOAD = os.environ.get("RENDER_OFFLOAD", "0") == "1"
+
+# Seconds clients are asked to wait (Retry-After) when renders are saturated
+RENDER_RETRY_AFTER = 2
+
+def _component_metrics():
+    """Counters the caches and workers already keep, for /metrics"""
+    plots = plot_cache.stats()
+    predictions = prediction_cache.stats()
+    renders = render_queue.stats()
+    training = training_worker.stats()
+    tenants = model_registry.totals()
+    ingest = _ingest_totals()
+    return [
+        ('plot_cache_hits_total', 'counter', 'Plot cache hits', plots['hits']),
+        ('plot_cache_misses_total', 'counter', 'Plot cache misses', plots['misses']),
+        ('plot_cache_bytes', 'gauge', 'Bytes of cached plots on disk', plots['bytes']),
+        ('prediction_cache_hits_total', 'counter', 'Prediction cache hits, grid included',
+         predictions['hits'] + predictions['grid_hits']),
+        ('prediction_cache_misses_total', 'counter', 'Prediction cache misses', predictions['misses']),
+        ('render_queue_depth', 'gauge', 'Async renders waiting for a worker', renders['queue_depth']),
+        ('render_queue_running', 'gauge', 'Async renders in progress', renders['running']),
+        ('dataset_rows', 'gauge', 'Rows in the loaded productivity log', dataset_store.stats()['rows']),
+        ('model_swaps_total', 'counter', 'Models hot-swapped in by training', training['swaps']),
+        ('tenant_model_hits_total', 'counter', 'Tenant model lookups served from memory', tenants['hits']),
+        ('tenant_model_misses_total', 'counter', 'Tenant model lookups that loaded the model', tenants['misses']),
+        ('tenant_model_loads_coalesced_total', 'counter', 'Tenant model lookups that waited for a load in progress',
+         tenants['coalesced']),
+        ('tenant_model_load_seconds_total', 'counter', 'Time spent loading tenant models',
+         round(tenants['load_seconds_total'], 6)),
+        ('tenant_model_evictions_total', 'counter', 'Tenant models evicted for memory', tenants['evictions']),
+        ('tenant_models_resident', 'gauge', 'Tenant models held in memory', tenants['resident']),
+        ('tenant_model_bytes', 'gauge', 'Approximate memory held by tenant models', tenants['bytes']),
+        ('log_entries_total', 'counter', 'Entries ingested through /log', ingest['entries']),
+        ('log_commits_total', 'counter', 'Group commits of /log entries', ingest['batches']),
+        ('log_fsyncs_total', 'counter', 'fsync calls made for /log entries', ingest['fsyncs']),
+        ('log_compactions_total', 'counter', 'Compactions of ingested entries', ingest['compactions'])
+    ]
+
+REGISTRY.add_collector(_component_metrics)
+
+def _load_model():
+    logger.info("Loading model from %s", MODEL_DIR)
+    serving = load_serving(MODEL_DIR, MODEL_RUNTIME)
+    if serving is None:
+        logger.error("No usable model found. Please run: python backend/model/train_tasktype_model.py")
+        raise RuntimeError('No usable model found')
+    model_slot.swap(serving)
+
+def _load_dataset():
+    if os.path.exists(DATA_PATH):
+        dataset_store.get()
+
+def _import_plotting():
+    import backend.visualizations.visualize_data  # noqa: F401
+
+# Model loading, the data parse and the matplotlib/seaborn imports happen
+# after import, on a background thread. WARMUP=sync runs them before the
+# import returns; WARMUP=manual leaves calling warmup.start() to the
+# importer (the startup benchmark uses it to time the bare import). The app
+# is ready to predict once the model step is done; /visualize imports the
+# plotting stack itself if it gets there first.
+WARMUP = os.environ.get('WARMUP', 'background')
+warmup = Warmup(required=['model'])
+warmup.add('model', _load_model)
+warmup.add('dataset', _load_dataset)
+warmup.add('plotting', _import_plotting)
+if WARMUP != 'manual':
+    warmup.start(background=WARMUP != 'sync')
+
+def _render_busy(message):
+    response = jsonify({'error': message})
+    response.headers['Retry-After'] = str(RENDER_RETRY_AFTER)
+    return response, 503
+
+def _model_unavailable():
+    """Error response for a prediction request while no model is loaded"""
+    if warmup.status('model') in ('pending', 'running'):
+        response = jsonify({'error': 'Model is still loading. Retry shortly.'})
+        response.headers['Retry-After'] = '1'
+        return response, 503
+    logger.error("Prediction requested but no model is loaded")
+    return jsonify({
+        'error': 'Model not loaded. Please train the model first.',
+        'solution': 'Run: python backend/model/train_tasktype_model.py'
+    }), 500
+
+def _tenant_id(data=None):
+    """Tenant a request names, or None for the default model and log"""
+    tenant_id = request.headers.get('X-Tenant-Id') or request.args.get('tenant')
+    if not tenant_id and isinstance(data, dict):
+        tenant_id = data.get('tenant')
+    return tenant_id or None
+
+def _tenant_error(tenant_id, error):
+    if isinstance(error, UnknownTenant):
+        return jsonify({'error': f'Unknown tenant: {tenant_id}'}), 404
+    return jsonify({'error': str(error)}), 400
+
+def _data_fingerprint(data_path):
+    """Plot cache fingerprint of a log: its file plus how far its segments reach"""
+    fingerprint = plot_cache.data_fingerprint(data_path)
+    position = end_position(segments_dir_for(data_path))
+    return fingerprint if position is None else f"{fingerprint}-{position[0]}-{position[1]}"
+
+def _serving_for(tenant_id):
+    """(ServingModel, None) for the tenant or default model, or (None, error response)"""
+    if tenant_id is None:
+        serving = model_slot.get()
+        return (serving, None) if serving is not None else (None, _model_unavailable())
+    try:
+        with stage('model'):
+            serving = model_registry.get(tenant_id)
+    except (UnknownTenant, ValueError) as e:
+        return None, _tenant_error(tenant_id, e)
+    if serving is None:
+        return None, (jsonify({'error': f'No trained model for tenant {tenant_id}'}), 404)
+    return serving, None
 
 @app.route('/', methods=['GET'])
 def index():
     return jsonify({
         'message': 'Productivity Predictor API is running',
-        'model_status': 'loaded' if model is not None else 'not loaded',
+        'model_status': 'loaded' if model_slot.get() is not None else 'not loaded',
         'endpoints': {
             '/predict': 'POST - Get productivity predictions',
+            '/predict/batch': 'POST - Score many feature records in one call',
+            '/log': 'POST - Append productivity log entries',
             '/visualize': 'POST - Generate visualizations',
+            '/visualize/<job_id>': 'GET - Status/result of an async visualization',
+            '/train-model': 'POST - Start a background training job',
+            '/train-model/<job_id>': 'GET - Status of a training job',
             '/health': 'GET - Check API health',
+            '/health/live': 'GET - Liveness probe',
+            '/health/ready': 'GET - Readiness probe (503 until the model is loaded)',
+            '/metrics': 'GET - Prometheus metrics',
             '/test': 'GET - Test endpoint'
-        }
+        },
+        'tenants': 'Send X-Tenant-Id (or ?tenant=) with /predict, /log and /visualize to use a tenant\'s model and log'
     })
 
 @app.route('/test', methods=['GET'])
 def test():
+    serving = model_slot.get()
     return jsonify({
         'message': 'Backend is working!', 
-        'model_loaded': model is not None,
-        'model_type': str(type(model)) if model else None
+        'model_loaded': serving is not None,
+        'model_type': str(type(serving.model)) if serving else None
     })
 
 @app.route('/predict', methods=['POST'])
 def predict():
-    print("=== PREDICT REQUEST RECEIVED ===")
-    
-    if model is None:
-        print("ERROR: Model is None - model failed to load")
-        return jsonify({
-            'error': 'Model not loaded. Please train the model first.',
-            'solution': 'Run: python backend/model/train_tasktype_model.py'
-        }), 500
-    
-    print("Model is loaded successfully")
-    
     try:
-        data = request.json
-        print(f"Received data: {data}")
+        with stage('parse'):
+            data = request.json
+        logger.debug("Received data: %s", data)
         
         if not data:
             return jsonify({'error': 'No data received'}), 400
+
+        tenant_id = _tenant_id(data)
+        serving, error = _serving_for(tenant_id)
+        if error is not None:
+            return error
         
-        # Create DataFrame with the expected features for the model
-        df = pd.DataFrame([{
-            'Mood': data.get('Mood', 5),
-            'Hour': data.get('Hour', 14),
-            'Week(day/end)': data.get('Week(day/end)', 0),
-            'SleepHours': data.get('SleepHours', 7),
-            'Distractions': data.get('Distractions', 2),
-            'ConfidenceScore': data.get('ConfidenceScore', 6),
-            'Completed': data.get('Completed', 1),
-            'DayOfWeek': data.get('DayOfWeek', 2)
-        }])
-        
-        print(f"DataFrame created: {df}")
-        print(f"DataFrame columns: {list(df.columns)}")
-        print(f"DataFrame shape: {df.shape}")
-        print(f"DataFrame dtypes: {df.dtypes}")
-        
-        # Ensure all values are numeric
-        for col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors='coerce')
+        # The model version's own feature pipeline: defaults for missing
+        # features, one float32 row in training column order
+        with stage('features'):
+            X, invalid = serving.features.transform_record(data)
+        if invalid:
+            logger.warning("Prediction input has non-numeric values; filling with 0",
+                           extra={'columns': invalid})
         
-        # Check for NaN values
-        if df.isnull().any().any():
-            print("WARNING: DataFrame contains NaN values")
-            df = df.fillna(0)
-            print(f"DataFrame after filling NaN: {df}")
+        # Arguments are only formatted when debug logging is on
+        logger.debug("Prediction input: %s", X)
         
-        # Try prediction
-        print("Attempting prediction...")
-        pred = model.predict(df)[0]
-        print(f"Prediction successful: {pred}")
+        with stage('predict'):
+            if tenant_id is None:
+                pred = prediction_cache.predict(serving, X)
+            else:
+                pred = serving.model.predict(serving.features.model_input(serving.model, X))[0]
         
         # Ensure prediction is an integer
         prediction_int = int(pred)
-        print(f"Prediction as integer: {prediction_int}")
+        logger.debug("Prediction: %d", prediction_int)
         
-        return jsonify({'prediction': prediction_int})
+        with stage('serialize'):
+            return jsonify({'prediction': prediction_int})
         
     except Exception as e:
-        print(f"PREDICTION ERROR: {e}")
-        traceback.print_exc()
+        logger.exception("Prediction failed")
         return jsonify({
             'error': f'Prediction failed: {str(e)}',
             'details': 'Check backend logs for more information'
         }), 500
 
+@app.route('/predict/batch', methods=['POST'])
+def predict_batch_endpoint():
+    with stage('parse'):
+        data = request.get_json(silent=True)
+    if not data:
+        return jsonify({'error': 'No data received'}), 400
+
+    serving, error = _serving_for(_tenant_id(data))
+    if error is not None:
+        return error
+
+    # Accept a bare array/columnar payload or one wrapped in {"records": ...}
+    payload = data.get('records', data) if isinstance(data, dict) else data
+
+    try:
+        with stage('predict'):
+            result = predict_batch(serving.model, payload, serving.mapping, serving.features)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.exception("Batch prediction failed")
+        return jsonify({
+            'error': f'Batch prediction failed: {str(e)}',
+            'details': 'Check backend logs for more information'
+        }), 500
+
+    with stage('serialize'):
+        return jsonify(result)
+
+@app.route('/log', methods=['POST'])
+def log_entries():
+    """Append entries to the productivity log (or a tenant's).
+
+    Body: one entry, a list of them or {"entries": [...]}, each with the
+    log's columns (Time, DayOfWeek and Week(day/end) are derived from Date
+    when left out) and one of the log's task types. Returns once the
+    entries are durably written; charts and training pick them up from
+    then on.
+    """
+    with stage('parse'):
+        data = request.get_json(silent=True)
+    if not data:
+        return jsonify({'error': 'No data received'}), 400
+
+    tenant_id = _tenant_id(data)
+    data_path = DATA_PATH
+    if tenant_id is not None:
+        try:
+            data_path = model_registry.data_path(tenant_id)
+        except (UnknownTenant, ValueError) as e:
+            return _tenant_error(tenant_id, e)
+    if not os.path.exists(data_path):
+        return jsonify({'error': f'Data file not found at {data_path}'}), 404
+
+    if isinstance(data, dict):
+        entries = data.get('entries', [{k: v for k, v in data.items() if k != 'tenant'}])
+    else:
+        entries = data
+    if not isinstance(entries, list):
+        return jsonify({'error': 'entries must be a list'}), 400
+
+    try:
+        with stage('append'):
+            accepted = _ingest_log(data_path).append(entries)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except (OSError, RuntimeError):
+        logger.exception("Log ingestion failed")
+        return jsonify({'error': 'Could not write log entries'}), 500
+    return jsonify({'accepted': accepted}), 201
+
 @app.route('/visualize', methods=['POST'])
 def visualize():
     try:
-        data = request.json
+        with stage('parse'):
+            data = request.json
         graph_type = data.get("graphType")
         column1 = data.get("column1")
         column2 = data.get("column2")
+        run_async = bool(data.get("async", False))
+        profile = data.get("profile", DEFAULT_PROFILE)
 
-        print(f"Visualization request: {graph_type}, {column1}, {column2}")
+        logger.debug("Visualization request: %s, %s, %s", graph_type, column1, column2)
 
         # Validate inputs
         if not graph_type:
             return jsonify({"error": "Graph type is required"}), 400
         if not column1:
             return jsonify({"error": "Column1 is required"}), 400
+        if profile not in RENDER_PROFILES:
+            return jsonify({"error": f"Invalid render profile: {profile}. Choose from {', '.join(RENDER_PROFILES)}"}), 400
+        output_format = RENDER_PROFILES[profile]['format']
+        mimetype = RENDER_PROFILES[profile]['mimetype']
+        # Optional start/end/weekday/hour filters on the rows charted
+        try:
+            window = parse_window(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        options = {'profile': profile}
+        if window:
+            options['window'] = window
+
+        # A tenant's own log (`source`, passed on to the renderers), or the default one
+        tenant_id = _tenant_id(data)
+        source = None
+        if tenant_id is not None:
+            try:
+                source = model_registry.data_path(tenant_id)
+            except (UnknownTenant, ValueError) as e:
+                return _tenant_error(tenant_id, e)
+        data_path = source or DATA_PATH
 
-        if not os.path.exists(DATA_PATH):
-            return jsonify({"error": f"Data file not found at {DATA_PATH}"}), 404
+        if not os.path.exists(data_path):
+            return jsonify({"error": f"Data file not found at {data_path}"}), 404
 
-        # Load and validate data
-        df = pd.read_csv(DATA_PATH)
-        print(f"Data loaded. Shape: {df.shape}, Columns: {list(df.columns)}")
+        # Serve a previously rendered copy of this exact chart if the data is unchanged
+        with stage('cache_lookup'):
+            fingerprint = _data_fingerprint(data_path)
+            cache_key = plot_cache.make_key(graph_type, [column1, column2], fingerprint, options)
+            cached_path = plot_cache.get(cache_key)
+        if cached_path is not None:
+            logger.debug("Plot cache hit: %s", cached_path)
+            summary = plot_cache.info(cache_key)
+            if run_async:
+                job = render_queue.record_cached(
+                    cache_key, graph_type, column1, column2, profile, cached_path, summary)
+                return jsonify(_render_job_response(job)), 202
+            with stage('send_file'):
+                response = send_file(cached_path, mimetype=mimetype, as_attachment=False)
+            response.headers['X-Plot-Cache'] = 'hit'
+            response.headers['X-Render-Profile'] = profile
+            response.headers['X-Payload-Bytes'] = str(os.path.getsize(cached_path))
+            _point_headers(response, summary)
+            return response
 
-        # Check if columns exist
-        if column1 not in df.columns:
-            return jsonify({"error": f"Column '{column1}' not found in data"}), 400
-        
-        if column2 and column2 not in df.columns:
-            return jsonify({"error": f"Column '{column2}' not found in data"}), 400
+        # Shared in-memory copy of the data; only re-read when the file changes
+        with stage('load'):
+            dataset = dataset_store.get() if source is None else tenant_datasets.get(source)
 
-        # Create plots directory
-        plots_dir = os.path.join(os.path.dirname(__file__), "plots")
-        os.makedirs(plots_dir, exist_ok=True)
-        
-        # Generate unique filename
-        import time
-        timestamp = str(int(time.time()))
-        save_path = os.path.join(plots_dir, f"{graph_type}_{column1}_{timestamp}.png")
-        print(f"Saving plot to: {save_path}")
+        error = validate_chart_request(graph_type, column1, column2, dataset.columns, profile)
+        if error:
+            return jsonify({"error": error}), 400
+
+        # Binary search on the dataset's date index; only the rows in range are copied
+        with stage('window'):
+            try:
+                dataset = dataset.window(window)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+        if window and not len(dataset.frame):
+            return jsonify({"error": "No data in the requested time window"}), 404
+
+        if run_async:
+            # Render in the worker pool and let the client poll /visualize/<job_id>
+            try:
+                job, coalesced = render_queue.submit(
+                    cache_key, fingerprint, graph_type, column1, column2, profile, data_path=source,
+                    window=window)
+            except RenderQueueFull:
+                return _render_busy('Render queue is full. Retry shortly.')
+            response = _render_job_response(job)
+            response['coalesced'] = coalesced
+            return jsonify(response), 202
 
-        # Generate plot based on type
+        # Render in memory and stream the bytes; the cache keeps a copy on disk
+        if not render_slots.acquire(blocking=False):
+            return _render_busy('Too many renders in progress. Retry shortly.')
         try:
-            if graph_type == "histogram":
-                plot_histogram(df, column1, save_path)
-            elif graph_type == "bar":
-                if not column2:
-                    return jsonify({"error": "Column2 is required for bar charts"}), 400
-                plot_bar(df, column1, column2, save_path)
-            elif graph_type == "scatter":
-                if not column2:
-                    return jsonify({"error": "Column2 is required for scatter plots"}), 400
-                plot_scatter(df, column1, column2, save_path)
-            elif graph_type == "line":
-                plot_line(df, column1, save_path)
-            elif graph_type == "heatmap":
-                # Select only numeric columns for heatmap
-                numeric_cols = df.select_dtypes(include=[np.number]).columns
-                df_numeric = df[numeric_cols]
-                plot_heatmap(df_numeric, save_path)
+            if RENDER_OFFLOAD:
+                with stage('render'):
+                    image, render_seconds, summary = render_queue.render(
+                        graph_type, column1, column2, profile, data_path=source, window=window)
             else:
-                return jsonify({"error": f"Invalid graph type: {graph_type}"}), 400
-
+                # Already imported by the startup warm-up unless this is the first request
+                from backend.visualizations.visualize_data import render_chart
+                render_start = time.perf_counter()
+                with stage('render'):
+                    buffer = BytesIO()
+                    summary = render_chart(dataset, graph_type, column1, column2, buffer, profile)
+                    image = buffer.getvalue()
+                render_seconds = time.perf_counter() - render_start
         except Exception as plot_error:
-            print(f"Plot generation error: {plot_error}")
-            traceback.print_exc()
+            logger.exception("Plot generation failed")
             return jsonify({"error": f"Failed to generate plot: {str(plot_error)}"}), 500
+        finally:
+            render_slots.release()
 
-        # Check if file was created
-        if os.path.exists(save_path):
-            print(f"Plot saved successfully at: {save_path}")
-            return send_file(save_path, mimetype='image/png', as_attachment=False)
-        else:
-            return jsonify({"error": "Plot file was not created"}), 500
+        render_stats.record(profile, render_seconds, len(image))
+        with stage('cache_store'):
+            plot_cache.put_bytes(cache_key, image, fingerprint, output_format, source, summary)
+        with stage('send_file'):
+            response = send_file(BytesIO(image), mimetype=mimetype, as_attachment=False)
+        response.headers['X-Plot-Cache'] = 'miss'
+        response.headers['X-Render-Profile'] = profile
+        response.headers['X-Render-Seconds'] = f"{render_seconds:.4f}"
+        response.headers['X-Payload-Bytes'] = str(len(image))
+        _point_headers(response, summary)
+        return response
 
     except Exception as e:
-        print(f"Visualization error: {e}")
-        traceback.print_exc()
+        logger.exception("Visualization failed")
         return jsonify({"error": str(e)}), 500
 
+def _point_headers(response, summary):
+    """Points a scatter/line chart drew, and how they were reduced from the rows"""
+    if summary and summary.get('points') is not None:
+        response.headers['X-Points-Drawn'] = str(summary['points'])
+        response.headers['X-Point-Reduction'] = summary.get('reduction') or 'none'
+
+def _render_job_response(job):
+    response = job.to_dict()
+    response['status_url'] = f"/visualize/{job.job_id}"
+    return response
+
+@app.route('/visualize/<job_id>', methods=['GET'])
+def visualize_job(job_id):
+    """Status of an asynchronous render; streams the PNG once it is done"""
+    job = render_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown render job: {job_id}"}), 404
+
+    info = _render_job_response(job)
+    if job.status == 'failed':
+        return jsonify(info), 500
+    if job.status != 'done':
+        return jsonify(info), 202
+    if not job.result_path or not os.path.exists(job.result_path):
+        info['error'] = 'Rendered plot was evicted from the cache; submit the request again'
+        return jsonify(info), 410
+    response = send_file(job.result_path, mimetype=RENDER_PROFILES[job.profile]['mimetype'], as_attachment=False)
+    _point_headers(response, job.summary)
+    return response
+
 
 @app.route('/health', methods=['GET'])
 def health():
+    serving = model_slot.get()
     health_info = {
-        'status': 'healthy',
-        'model_loaded': model is not None,
+        'status': 'healthy' if warmup.ready else ('starting' if not warmup.finished else 'degraded'),
+        'live': True,
+        'ready': warmup.ready,
+        'startup': warmup.stats(),
+        'model_loaded': serving is not None,
         'data_file_exists': os.path.exists(DATA_PATH),
-        'model_file_path': os.path.join(os.path.dirname(__file__), 'model', 'model.pkl'),
-        'data_file_path': DATA_PATH
+        'model_dir': MODEL_DIR,
+        'data_file_path': DATA_PATH,
+        'plot_cache': plot_cache.stats(),
+        'dataset': dataset_store.stats(),
+        'render_queue': render_queue.stats(),
+        'render_profiles': render_stats.stats(),
+        'training': training_worker.stats(),
+        'prediction_cache': prediction_cache.stats(),
+        'model_registry': model_registry.stats(),
+        'tenant_datasets': tenant_datasets.stats(),
+        'ingest': {path: log.stats() for path, log in list(ingest_logs.items())}
     }
     
-    if model is not None:
-        health_info['model_type'] = str(type(model))
+    if serving is not None:
+        health_info['model_type'] = str(type(serving.model))
+        health_info['model_runtime'] = serving.runtime
+        health_info['model_version'] = serving.version
     
     return jsonify(health_info)
 
+@app.route('/health/live', methods=['GET'])
+def health_live():
+    """The process is up and serving requests"""
+    return jsonify({'live': True})
+
+@app.route('/health/ready', methods=['GET'])
+def health_ready():
+    """200 once the model is loaded; 503 while starting or if it failed to load"""
+    info = {'ready': warmup.ready, 'startup': warmup.stats()}
+    return jsonify(info), 200 if warmup.ready else 503
+
 @app.route('/train-model', methods=['POST'])
 def train_model():
-    """Emergency endpoint to train model if it doesn't exist"""
+    """Start a background training job; poll /train-model/<job_id> for its status.
+
+    Body (optional): {"mode": "full" | "incremental" | "search"}.
+    {"incremental": true} is accepted for "incremental". The live model keeps
+    serving until the new version passes its smoke prediction.
+    """
+    if not os.path.exists(DATA_PATH):
+        return jsonify({
+            'error': 'Data file not found',
+            'message': 'Please ensure data/productivity_log_may.csv exists'
+        }), 404
+
+    options = request.get_json(silent=True) or {}
+    mode = options.get('mode') or ('incremental' if options.get('incremental') else 'full')
     try:
-        # Import and run training
-        from backend.model.train_tasktype_model import train_tasktype_model
-        
-        # Check if data exists, if not create sample data
-        if not os.path.exists(DATA_PATH):
-            return jsonify({
-                'error': 'Data file not found',
-                'message': 'Please ensure data/productivity_log_may.csv exists'
-            }), 404
-        
-        model_trained, mapping = train_tasktype_model(DATA_PATH)
-        
-        if model_trained:
-            # Reload the model
-            global model
-            model_path = os.path.join(os.path.dirname(__file__), 'model', 'model.pkl')
-            model = joblib.load(model_path)
-            
-            return jsonify({
-                'message': 'Model trained and loaded successfully!',
-                'model_loaded': True
-            })
-        else:
-            return jsonify({'error': 'Model training failed'}), 500
-            
-    except Exception as e:
-        print(f"Training error: {e}")
-        traceback.print_exc()
-        return jsonify({'error': str(e)}), 500
+        job, coalesced = training_worker.submit(mode)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
+    info = job.to_dict()
+    info['coalesced'] = coalesced
+    info['status_url'] = f"/train-model/{job.job_id}"
+    return jsonify(info), 202
+
+@app.route('/train-model/<job_id>', methods=['GET'])
+def train_model_job(job_id):
+    job = training_worker.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown training job'}), 404
+    return jsonify(job.to_dict())
+
+# Development server with the reloader. For production use the preforking
+# entry point instead: python -m backend.serve
 if __name__ == '__main__':
-    print("="*50)
-    print("PRODUCTIVITY PREDICTOR API STARTING")
-    print(f"Model loaded: {model is not None}")
-    print(f"Data file exists: {os.path.exists(DATA_PATH)}")
-    print("="*50)
+    # LOG_LEVEL / LOG_FORMAT pick the level and line format (JSON by default).
+    # Only entry points configure logging; importing the app leaves the
+    # host's handlers alone
+    configure_logging()
+    logger.info("Productivity Predictor API starting", extra={
+        'model_loaded': model_slot.get() is not None,
+        'data_file_exists': os.path.exists(DATA_PATH)
+    })
+    # With the reloader on, only the child process serves requests
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        render_queue.start()
     app.run(host="0.0.0.0", port=5000, debug=True)
 
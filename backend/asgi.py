@@ -0,0 +1,306 @@
+"""ASGI entry point: the Flask app behind an asyncio front end.
+
+    uvicorn backend.asgi:application --host 0.0.0.0 --port 5000
+
+(or any other ASGI server). Each request is read on the event loop and then
+handed, as a plain WSGI call, to the thread pool of its route class:
+
+- predict: /predict and /predict/batch
+- render:  POST /visualize
+- default: everything else (health, job status, training submissions, ...)
+
+The pools don't share threads, so a burst of charts can never take the
+threads /predict needs. A class whose threads are all busy queues up to
+`max_waiting` requests on the event loop (no thread is held while
+waiting) and answers the rest with 503 and Retry-After. New renders also
+hold back for up to RENDER_YIELD_SECONDS while predictions are running or
+queued.
+
+Renders themselves run in the render worker processes (RENDER_OFFLOAD
+defaults to 1 here), so the render threads only wait for bytes and don't
+compete with predictions for the GIL. Training already runs in its own
+process.
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+os.environ.setdefault('RENDER_OFFLOAD', '1')
+
+from backend.observability.log import configure_logging  # noqa: E402
+
+# Configured before the app is imported, so warm-up messages are formatted too
+configure_logging()
+
+from backend import app as api  # noqa: E402
+from backend.observability.metrics import LATENCY_BUCKETS, REGISTRY  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+# Longest a new render waits for queued predictions to clear before starting
+RENDER_YIELD_SECONDS = 0.05
+
+POOL_ACTIVE = REGISTRY.gauge('asgi_pool_active', 'Requests running in each route pool')
+POOL_WAITING = REGISTRY.gauge('asgi_pool_waiting', 'Requests queued for a thread in each route pool')
+POOL_REJECTED = REGISTRY.counter('asgi_pool_rejected_total', 'Requests refused with 503 by each route pool')
+POOL_WAIT_SECONDS = REGISTRY.histogram(
+    'asgi_pool_wait_seconds', 'Time requests queued for a thread in each route pool', LATENCY_BUCKETS)
+
+class PoolBusy(Exception):
+    """Raised by RoutePool.run when its queue is full"""
+
+class RoutePool:
+    """Threads, a concurrency limit and a bounded queue for one route class.
+
+    With `yields_to`, a request about to start first waits (up to
+    `max_yield_seconds`) for those pools to go idle, which gives them
+    priority without starving this one.
+    """
+
+    def __init__(self, name, threads, max_waiting, retry_after=1, yields_to=(), max_yield_seconds=0.0):
+        self.name = name
+        self.threads = threads
+        self.max_waiting = max_waiting
+        self.retry_after = retry_after
+        self.yields_to = yields_to
+        self.max_yield_seconds = max_yield_seconds
+        self.executor = ThreadPoolExecutor(threads, thread_name_prefix=f'asgi-{name}')
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+        self._loop = None
+
+    def _bind(self):
+        # asyncio primitives belong to one event loop; make them on first use
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._slots = asyncio.Semaphore(self.threads)
+            self._idle = asyncio.Event()
+            if not self.active and not self.waiting:
+                self._idle.set()
+
+    def _update(self):
+        POOL_ACTIVE.set(self.active, pool=self.name)
+        POOL_WAITING.set(self.waiting, pool=self.name)
+        if self.active or self.waiting:
+            self._idle.clear()
+        else:
+            self._idle.set()
+
+    async def _yield(self):
+        for other in self.yields_to:
+            other._bind()
+            if other._idle.is_set():
+                continue
+            try:
+                await asyncio.wait_for(other._idle.wait(), self.max_yield_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    async def run(self, fn, *args, force=False):
+        """Run fn(*args) on this pool's threads; raises PoolBusy when the queue is full.
+
+        `force` queues the call regardless of the queue length (health probes).
+        """
+        self._bind()
+        if not force and self.waiting >= self.max_waiting and self._slots.locked():
+            self.rejected += 1
+            POOL_REJECTED.inc(pool=self.name)
+            raise PoolBusy(self.name)
+
+        queued_at = time.perf_counter()
+        self.waiting += 1
+        self._update()
+        try:
+            await self._yield()
+            await self._slots.acquire()
+        except BaseException:
+            self.waiting -= 1
+            self._update()
+            raise
+        self.waiting -= 1
+        POOL_WAIT_SECONDS.observe(time.perf_counter() - queued_at, pool=self.name)
+        self.active += 1
+        self._update()
+        try:
+            return await self._loop.run_in_executor(self.executor, fn, *args)
+        finally:
+            self.active -= 1
+            self._slots.release()
+            self._update()
+
+    def stats(self):
+        return {
+            'threads': self.threads,
+            'active': self.active,
+            'waiting': self.waiting,
+            'max_waiting': self.max_waiting,
+            'rejected': self.rejected
+        }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+def _environ(scope, body):
+    """The WSGI environ for an ASGI http scope"""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1] if server[1] is not None else 80),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False
+    }
+    for raw_name, raw_value in scope.get('headers', []):
+        name = raw_name.decode('latin-1').upper().replace('-', '_')
+        value = raw_value.decode('latin-1')
+        if name == 'CONTENT_TYPE':
+            environ['CONTENT_TYPE'] = value
+        elif name != 'CONTENT_LENGTH':
+            key = f'HTTP_{name}'
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+def _call_wsgi(wsgi_app, environ):
+    """Run one WSGI request to completion; returns (status code, headers, body)"""
+    response = {}
+
+    def start_response(status, headers, exc_info=None):
+        if exc_info is not None and response:
+            raise exc_info[1].with_traceback(exc_info[2])
+        response['status'] = int(status.split(' ', 1)[0])
+        response['headers'] = headers
+        return chunks.append
+
+    chunks = []
+    body = wsgi_app(environ, start_response)
+    try:
+        for chunk in body:
+            chunks.append(chunk)
+    finally:
+        close = getattr(body, 'close', None)
+        if close is not None:
+            close()
+    return response['status'], response['headers'], b''.join(chunks)
+
+class AsgiApp:
+    """ASGI application dispatching requests to a WSGI app through route pools"""
+
+    def __init__(self, wsgi_app, pools, route_pool):
+        self.wsgi_app = wsgi_app
+        self.pools = pools
+        self.route_pool = route_pool
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self._http(scope, receive, send)
+        else:
+            raise ValueError(f"Unsupported ASGI scope type: {scope['type']}")
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                api.warmup.start()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                for pool in self.pools.values():
+                    pool.shutdown()
+                # Waits for the render processes so none is left orphaned
+                await asyncio.get_running_loop().run_in_executor(None, api.render_queue.shutdown)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _http(self, scope, receive, send):
+        chunks = []
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+            chunks.append(message.get('body', b''))
+            if not message.get('more_body', False):
+                break
+
+        pool = self.pools[self.route_pool(scope['method'], scope['path'])]
+        environ = _environ(scope, b''.join(chunks))
+        try:
+            status, headers, body = await pool.run(
+                _call_wsgi, self.wsgi_app, environ, force=scope['path'].startswith('/health'))
+        except PoolBusy:
+            status, headers, body = _busy(pool)
+        except Exception:
+            logger.exception("Unhandled error serving %s %s", scope['method'], scope['path'])
+            status, headers, body = 500, [('Content-Type', 'application/json')], b'{"error": "Internal server error"}'
+
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+    def stats(self):
+        return {name: pool.stats() for name, pool in self.pools.items()}
+
+def _busy(pool):
+    body = json.dumps({'error': 'Server is busy. Retry shortly.', 'pool': pool.name}).encode('utf-8')
+    return 503, [
+        ('Content-Type', 'application/json'),
+        ('Content-Length', str(len(body))),
+        ('Retry-After', str(pool.retry_after))
+    ], body
+
+def route_pool(method, path):
+    """Name of the pool serving a request"""
+    if path in ('/predict', '/predict/batch'):
+        return 'predict'
+    if path == '/visualize' and method == 'POST':
+        return 'render'
+    return 'default'
+
+def _pools():
+    predict = RoutePool(
+        'predict',
+        threads=int(os.environ.get('PREDICT_THREADS', 8)),
+        max_waiting=int(os.environ.get('PREDICT_QUEUE_LIMIT', 256))
+    )
+    render = RoutePool(
+        'render',
+        # As many as the app lets render at once, so its own limit never trips
+        threads=api.RENDER_CONCURRENCY,
+        max_waiting=int(os.environ.get('RENDER_WAIT_LIMIT', 16)),
+        retry_after=api.RENDER_RETRY_AFTER,
+        yields_to=(predict,),
+        max_yield_seconds=RENDER_YIELD_SECONDS
+    )
+    default = RoutePool(
+        'default',
+        threads=int(os.environ.get('DEFAULT_THREADS', 4)),
+        max_waiting=int(os.environ.get('DEFAULT_QUEUE_LIMIT', 64))
+    )
+    return {'predict': predict, 'render': render, 'default': default}
+
+application = AsgiApp(api.app, _pools(), route_pool)
@@ -0,0 +1,319 @@
+"""Benchmarks for prediction, visualization, cleaning and training.
+
+    python -m backend.benchmarks.run                          # every suite
+    python -m backend.benchmarks.run clean train --rows 1000 100000
+    python -m backend.benchmarks.run predict --baseline results/old.json
+
+The startup suite (import time and warm-up steps) is also available on its
+own as an import-time budget check: python -m backend.benchmarks.startup
+
+Each run writes one JSON file (by default backend/benchmarks/results/
+<timestamp>.json) holding the environment and every measurement. Times are
+in seconds. With --baseline the timings are also printed next to those of
+an earlier run.
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import argparse
+import gc
+import json
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from backend.benchmarks.synthetic import write_log
+
+SUITES = ('startup', 'predict', 'render', 'clean', 'train')
+
+# Default row counts per suite; the sample log is about 500 rows
+DEFAULT_ROWS = {
+    'render': (1000, 10000),
+    'clean': (1000, 10000, 100000),
+    'train': (1000, 10000, 50000)
+}
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+# (name, graph type, column1, column2) rendered by the render suite; between
+# them they go through every plot_* function and both bar chart branches
+CHART_CASES = (
+    ('histogram_numeric', 'histogram', 'Mood', None),
+    ('histogram_categorical', 'histogram', 'TaskType', None),
+    ('bar_means', 'bar', 'TaskType', 'Mood'),
+    ('bar_crosstab', 'bar', 'TaskType', 'Week(day/end)'),
+    ('scatter', 'scatter', 'SleepHours', 'Mood'),
+    ('line', 'line', 'Mood', None),
+    ('heatmap', 'heatmap', 'Mood', None)
+)
+
+PLOT_FUNCTIONS = {
+    'histogram': 'plot_histogram',
+    'bar': 'plot_bar',
+    'scatter': 'plot_scatter',
+    'line': 'plot_line',
+    'heatmap': 'plot_heatmap'
+}
+
+def summarize(samples):
+    """Distribution of a list of durations in seconds"""
+    ordered = np.sort(np.asarray(samples, dtype=float))
+    return {
+        'n': len(ordered),
+        'min': float(ordered[0]),
+        'mean': float(ordered.mean()),
+        'p50': float(np.percentile(ordered, 50)),
+        'p95': float(np.percentile(ordered, 95)),
+        'p99': float(np.percentile(ordered, 99)),
+        'max': float(ordered[-1])
+    }
+
+def timed(fn, repeat=1):
+    """Run fn `repeat` times; returns (last result, list of durations)"""
+    durations = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        durations.append(time.perf_counter() - start)
+    return result, durations
+
+def peak_memory(fn):
+    """Peak bytes traced (Python objects and NumPy/pandas buffers) while fn runs"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def _random_payload(rng):
+    return {
+        'Mood': int(rng.integers(1, 11)),
+        'Hour': int(rng.integers(0, 24)),
+        'Week(day/end)': int(rng.integers(0, 2)),
+        'SleepHours': round(float(rng.uniform(4, 10)), 2),
+        'Distractions': int(rng.integers(0, 11)),
+        'ConfidenceScore': round(float(rng.uniform(1, 10)), 2),
+        'Completed': int(rng.integers(0, 2)),
+        'DayOfWeek': int(rng.integers(0, 7))
+    }
+
+def bench_predict(requests=500, batch_sizes=(1, 100, 1000, 10000), seed=0):
+    """Single and batch /predict through the Flask test client"""
+    from backend import app as api
+
+    api.warmup.start()
+    api.warmup.wait()
+    serving = api.model_slot.get()
+    if serving is None:
+        raise RuntimeError("No model loaded; train one first")
+    client = api.app.test_client()
+    rng = np.random.default_rng(seed)
+    results = {'model_runtime': serving.runtime, 'model_version': serving.version}
+
+    def run_single(payloads):
+        latencies = []
+        start = time.perf_counter()
+        for payload in payloads:
+            began = time.perf_counter()
+            response = client.post('/predict', json=payload)
+            latencies.append(time.perf_counter() - began)
+            if response.status_code != 200:
+                raise RuntimeError(f"/predict returned {response.status_code}: {response.get_data(as_text=True)}")
+        total = time.perf_counter() - start
+        return {'latency_seconds': summarize(latencies), 'requests_per_second': len(payloads) / total}
+
+    # Distinct rows miss the prediction cache; a repeated row hits it
+    api.prediction_cache.clear()
+    client.post('/predict', json=_random_payload(rng))  # first-request setup
+    results['single_distinct'] = run_single([_random_payload(rng) for _ in range(requests)])
+    results['single_repeated'] = run_single([_random_payload(rng)] * requests)
+
+    results['batch'] = {}
+    for size in batch_sizes:
+        records = [_random_payload(rng) for _ in range(size)]
+        repeat = max(3, min(50, 20000 // size))
+        def call():
+            response = client.post('/predict/batch', json={'records': records})
+            if response.status_code != 200:
+                raise RuntimeError(f"/predict/batch returned {response.status_code}")
+        _, durations = timed(call, repeat)
+        latency = summarize(durations)
+        results['batch'][str(size)] = {
+            'latency_seconds': latency,
+            'rows_per_second': size / latency['p50']
+        }
+    return results
+
+def bench_render(rows_list, profiles=('screen', 'print'), repeat=3, workdir=None, seed=0):
+    """Render time and output size for every chart type and plot_* function"""
+    from backend.store.dataset_store import DatasetStore
+    from backend.visualizations.visualize_data import render_chart_bytes
+
+    results = {}
+    for rows in rows_list:
+        path = write_log(os.path.join(workdir, f"render_{rows}.csv"), rows, seed)
+        store = DatasetStore(path)
+        dataset, load_seconds = timed(store.get)
+        entry = {'load_seconds': load_seconds[0], 'charts': {}}
+        for name, graph_type, column1, column2 in CHART_CASES:
+            chart = {'function': PLOT_FUNCTIONS[graph_type], 'profiles': {}}
+            for profile in profiles:
+                image, durations = timed(
+                    lambda: render_chart_bytes(dataset, graph_type, column1, column2, profile), repeat)
+                chart['profiles'][profile] = {'render_seconds': summarize(durations), 'bytes': len(image)}
+            entry['charts'][name] = chart
+        results[str(rows)] = entry
+    return results
+
+def bench_clean(rows_list, workdir=None, seed=0):
+    """clean_pipeline (in memory) and clean_pipeline_streaming time and peak memory"""
+    from backend.model.preprocess import clean_pipeline, clean_pipeline_streaming
+
+    results = {}
+    for rows in rows_list:
+        path = write_log(os.path.join(workdir, f"clean_{rows}.csv"), rows, seed)
+        output_path = os.path.join(workdir, f"clean_{rows}_out.csv")
+        pipelines = {
+            'clean_pipeline': lambda: clean_pipeline(path, save=False),
+            'clean_pipeline_streaming': lambda: clean_pipeline_streaming(path, output_path)
+        }
+        entry = {'input_bytes': os.path.getsize(path)}
+        for name, run in pipelines.items():
+            # Timed without tracemalloc, which slows allocation-heavy code down
+            _, durations = timed(run, 3)
+            entry[name] = {'seconds': summarize(durations), 'peak_bytes': peak_memory(run)}
+        results[str(rows)] = entry
+    return results
+
+def bench_train(rows_list, cores_list, workdir=None, seed=0):
+    """Feature preparation and forest fit time vs rows and n_jobs"""
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.model_selection import train_test_split
+    from backend.model.train_tasktype_model import FOREST_PARAMS, prepare_training_data
+
+    results = {}
+    for rows in rows_list:
+        path = write_log(os.path.join(workdir, f"train_{rows}.csv"), rows, seed)
+        (X, y, _, _), prepare_seconds = timed(lambda: prepare_training_data(path))
+        X_train, _, y_train, _ = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+        entry = {'prepare_seconds': prepare_seconds[0], 'train_rows': len(X_train), 'fit_seconds': {}}
+        for cores in cores_list:
+            model = RandomForestClassifier(**FOREST_PARAMS, n_jobs=cores)
+            _, durations = timed(lambda: model.fit(X_train, y_train))
+            entry['fit_seconds'][str(cores)] = durations[0]
+        results[str(rows)] = entry
+    return results
+
+def environment():
+    import matplotlib
+    import pandas
+    import sklearn
+
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'git_commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pandas.__version__,
+        'sklearn': sklearn.__version__,
+        'matplotlib': matplotlib.__version__
+    }
+
+def _timings(results, prefix=''):
+    """Flatten every timing (a key containing 'seconds') to {path: seconds}"""
+    flat = {}
+    for key, value in results.items():
+        path = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            if 'seconds' in key and 'p50' in value:
+                flat[path] = value['p50']
+            else:
+                flat.update(_timings(value, path))
+        elif 'seconds' in prefix + key and isinstance(value, (int, float)):
+            flat[path] = value
+    return flat
+
+def compare(baseline, current):
+    """Print each timing of `current` next to the same one in `baseline`"""
+    before = _timings(baseline['results'])
+    after = _timings(current['results'])
+    print(f"{'timing':<80} {'baseline':>10} {'current':>10} {'ratio':>7}")
+    for path, seconds in after.items():
+        if path in before and before[path]:
+            print(f"{path:<80} {before[path]:>10.4f} {seconds:>10.4f} {seconds / before[path]:>7.2f}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('suites', nargs='*', help=f"suites to run: {', '.join(SUITES)} (default: all)")
+    parser.add_argument('--rows', type=int, nargs='+', help='row counts for the render, clean and train suites')
+    parser.add_argument('--cores', type=int, nargs='+', help='n_jobs values for the train suite')
+    parser.add_argument('--requests', type=int, default=500, help='single /predict requests per scenario')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='JSON file to write (default: results/<timestamp>.json)')
+    parser.add_argument('--baseline', help='earlier results file to compare against')
+    args = parser.parse_args(argv)
+    unknown = [suite for suite in args.suites if suite not in SUITES]
+    if unknown:
+        parser.error(f"unknown suite(s): {', '.join(unknown)}")
+
+    # Keep per-request logging out of the measurements
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    from backend.observability.log import configure_logging
+    configure_logging(fmt='text')
+
+    suites = args.suites or SUITES
+    cores = args.cores or sorted({1, os.cpu_count() or 1})
+    workdir = tempfile.mkdtemp(prefix='productivity-bench-')
+    report = {'environment': environment(), 'results': {}}
+    try:
+        for suite in suites:
+            rows = args.rows or DEFAULT_ROWS.get(suite)
+            print(f"Running {suite}...", file=sys.stderr)
+            started = time.perf_counter()
+            if suite == 'startup':
+                from backend.benchmarks.startup import measure_startup
+                result = measure_startup()
+            elif suite == 'predict':
+                result = bench_predict(args.requests, seed=args.seed)
+            elif suite == 'render':
+                result = bench_render(rows, workdir=workdir, seed=args.seed)
+            elif suite == 'clean':
+                result = bench_clean(rows, workdir=workdir, seed=args.seed)
+            else:
+                result = bench_train(rows, cores, workdir=workdir, seed=args.seed)
+            report['results'][suite] = result
+            print(f"  {suite} done in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}", file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(json.load(f), report)
+    return report
+
+if __name__ == '__main__':
+    main()
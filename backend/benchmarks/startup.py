@@ -0,0 +1,86 @@
+"""Cold-start measurement and import-time budget for the Flask backend.
+
+    python -m backend.benchmarks.startup [--runs 5] [--budget 0.75]
+
+Imports backend.app in fresh interpreters with WARMUP=manual, then runs the
+warm-up steps in the foreground to time them. Exits with status 1 when the
+median import takes longer than the budget or the import itself loads one
+of DEFERRED_MODULES.
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import argparse
+import json
+import subprocess
+
+from backend.benchmarks.run import summarize
+
+# Median seconds `import backend.app` may take (interpreter start-up excluded)
+IMPORT_BUDGET_SECONDS = 0.75
+
+# Modules the import must leave to the warm-up or the first request
+DEFERRED_MODULES = ('matplotlib', 'seaborn', 'scipy', 'sklearn', 'joblib')
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import backend.app as api
+imported = time.perf_counter() - started
+loaded = sorted(name for name in %r if name in sys.modules)
+api.warmup.start(background=False)
+print(json.dumps({
+    'import_seconds': imported,
+    'deferred_loaded': loaded,
+    'steps': api.warmup.stats()['steps'],
+    'ready': api.warmup.ready
+}))
+"""
+
+def _probe():
+    env = dict(os.environ, WARMUP='manual', LOG_LEVEL='WARNING')
+    completed = subprocess.run(
+        [sys.executable, '-c', _PROBE % (DEFERRED_MODULES,)],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def measure_startup(runs=5, budget=IMPORT_BUDGET_SECONDS):
+    """Import and warm-up timings over `runs` fresh interpreters"""
+    probes = [_probe() for _ in range(runs)]
+    step_names = list(probes[0]['steps'])
+    imports = [probe['import_seconds'] for probe in probes]
+    result = {
+        'runs': runs,
+        'import_seconds': summarize(imports),
+        'model_ready_seconds': summarize([
+            probe['import_seconds'] + probe['steps']['model']['seconds'] for probe in probes]),
+        'warmup_step_seconds': {
+            name: summarize([probe['steps'][name]['seconds'] for probe in probes]) for name in step_names},
+        'deferred_modules_loaded': sorted({name for probe in probes for name in probe['deferred_loaded']}),
+        'ready': all(probe['ready'] for probe in probes),
+        'budget_seconds': budget
+    }
+    result['within_budget'] = result['import_seconds']['p50'] <= budget and not result['deferred_modules_loaded']
+    return result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget', type=float, default=IMPORT_BUDGET_SECONDS)
+    args = parser.parse_args(argv)
+
+    result = measure_startup(args.runs, args.budget)
+    print(json.dumps(result, indent=2))
+    if not result['within_budget']:
+        print(f"Import budget exceeded: median {result['import_seconds']['p50']:.3f}s "
+              f"(budget {args.budget:.3f}s), deferred modules loaded: {result['deferred_modules_loaded']}",
+              file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
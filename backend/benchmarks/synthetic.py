@@ -0,0 +1,52 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# Task type codes in the real log (0-5)
+TASK_TYPES = 6
+
+def generate_log(n_rows, seed=0, missing_fraction=0.01, duplicate_fraction=0.01):
+    """Synthetic productivity log with the same columns and value ranges as
+    backend/data/productivity_log_may.csv.
+
+    TaskType depends on the hour, mood and sleep so the model has something
+    to learn. A `missing_fraction` of the numeric cells are blanked and a
+    `duplicate_fraction` of the rows repeated, so the cleaning steps have
+    work to do.
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.Timestamp('2025-01-01') + pd.to_timedelta(
+        np.sort(rng.integers(0, 365 * 24 * 60, n_rows)), unit='min')
+    hours = dates.hour.to_numpy()
+    mood = rng.integers(0, 6, n_rows)
+    sleep = np.round(rng.uniform(4, 9, n_rows), 1)
+    task = (hours // 4 + (mood > 2) + (sleep > 7) + rng.integers(0, 2, n_rows)) % TASK_TYPES
+
+    df = pd.DataFrame({
+        'Date': dates.strftime('%Y-%m-%d %H:%M:%S'),
+        'TaskType': task,
+        'Duration': np.round(rng.uniform(0.5, 3.0, n_rows), 1),
+        'Completed': rng.integers(0, 2, n_rows).astype(float),
+        'Mood': mood,
+        'SleepHours': sleep,
+        'Distractions': rng.integers(0, 6, n_rows),
+        'ConfidenceScore': np.round(rng.uniform(1, 9.9, n_rows), 1),
+        'Time': dates.strftime('%Y-%m-%d %H:%M:%S'),
+        'DayOfWeek': dates.dayofweek,
+        'Week(day/end)': np.where(dates.dayofweek < 5, 'Weekday', 'Weekend')
+    })
+
+    if missing_fraction:
+        for col in ('Duration', 'SleepHours', 'ConfidenceScore'):
+            df[col] = df[col].mask(rng.random(n_rows) < missing_fraction)
+    if duplicate_fraction:
+        repeats = df.sample(frac=duplicate_fraction, random_state=seed)
+        df = pd.concat([df, repeats]).sort_index(kind='stable').reset_index(drop=True)
+    return df
+
+def write_log(path, n_rows, seed=0, **options):
+    """Write a synthetic log CSV to `path` and return the path"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    generate_log(n_rows, seed, **options).to_csv(path, index=False)
+    return path
@@ -0,0 +1,141 @@
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+
+import numpy as np
+
+from backend.model.features import FeaturePipeline, load_pipeline
+from backend.model.forest_runtime import load_model
+
+logger = logging.getLogger(__name__)
+
+# backend/model: holds the shipped model files and the versions/ directory
+MODEL_DIR = os.path.dirname(os.path.abspath(__file__))
+
+VERSIONS_DIRNAME = 'versions'
+
+# Pointer to the published version, replaced atomically on publish
+CURRENT_FILENAME = 'current.json'
+
+# Published versions kept on disk for rollback
+KEEP_VERSIONS = 5
+
+# Name used for the model files directly in MODEL_DIR (from before versioning)
+LEGACY_VERSION = 'legacy'
+
+class ServingModel:
+    """A loaded model together with the mapping, features and version it came from.
+
+    Handed out as a single object so a request never pairs a model with
+    another version's task mapping or feature pipeline.
+    """
+
+    def __init__(self, model, mapping, runtime, version, features=None):
+        self.model = model
+        self.mapping = mapping
+        self.features = features or FeaturePipeline()
+        self.runtime = runtime
+        self.version = version
+        self.loaded_at = time.time()
+
+def versions_root(model_dir=MODEL_DIR):
+    return os.path.join(model_dir, VERSIONS_DIRNAME)
+
+def new_version_id():
+    """Sortable id: creation time down to the microsecond plus a random suffix"""
+    now = time.time()
+    stamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(now))
+    return f"{stamp}-{int(now * 1e6) % 1000000:06d}-{uuid.uuid4().hex[:4]}"
+
+def version_dir(version, model_dir=MODEL_DIR):
+    if version == LEGACY_VERSION:
+        return model_dir
+    return os.path.join(versions_root(model_dir), version)
+
+def current_version(model_dir=MODEL_DIR):
+    """The published version, or None if nothing has been published yet"""
+    try:
+        with open(os.path.join(model_dir, CURRENT_FILENAME)) as f:
+            return json.load(f)['version']
+    except (OSError, ValueError, KeyError):
+        return None
+
+def list_versions(model_dir=MODEL_DIR):
+    """Complete version directories, newest first"""
+    root = versions_root(model_dir)
+    if not os.path.isdir(root):
+        return []
+    return sorted(
+        (name for name in os.listdir(root)
+         if not name.startswith('.') and os.path.exists(os.path.join(root, name, 'meta.json'))),
+        reverse=True
+    )
+
+def read_metadata(version, model_dir=MODEL_DIR):
+    try:
+        with open(os.path.join(version_dir(version, model_dir), 'meta.json')) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def publish(version, model_dir=MODEL_DIR):
+    """Point CURRENT_FILENAME at `version` (a single atomic rename)"""
+    pointer = os.path.join(model_dir, CURRENT_FILENAME)
+    tmp_path = f"{pointer}.tmp-{os.getpid()}"
+    with open(tmp_path, 'w') as f:
+        json.dump({'version': version, 'published_at': time.time()}, f)
+    os.replace(tmp_path, pointer)
+
+def prune_versions(model_dir=MODEL_DIR, keep=KEEP_VERSIONS):
+    """Delete all but the newest `keep` versions, never the published one"""
+    current = current_version(model_dir)
+    for version in list_versions(model_dir)[keep:]:
+        if version != current:
+            shutil.rmtree(version_dir(version, model_dir), ignore_errors=True)
+
+def load_version(version, model_dir=MODEL_DIR, runtime='compiled'):
+    """Load a version's model, task mapping and feature pipeline as a ServingModel"""
+    import joblib
+
+    directory = version_dir(version, model_dir)
+    model, used_runtime = load_model(os.path.join(directory, 'model.pkl'), runtime)
+    mapping_path = os.path.join(directory, 'task_mapping.pkl')
+    mapping = joblib.load(mapping_path) if os.path.exists(mapping_path) else None
+    return ServingModel(model, mapping, used_runtime, version, load_pipeline(directory))
+
+def smoke_test(serving):
+    """Predict one default feature row; raises if the model can't serve"""
+    X, _ = serving.features.transform_record({})
+    prediction = serving.model.predict(serving.features.model_input(serving.model, X))
+    if len(prediction) != 1 or prediction[0] not in np.asarray(serving.model.classes_):
+        raise ValueError(f"Smoke prediction returned {prediction!r}")
+    return prediction[0]
+
+def load_serving(model_dir=MODEL_DIR, runtime='compiled'):
+    """Load the newest model that passes the smoke prediction.
+
+    Tries the published version first, then older versions and finally the
+    legacy files in `model_dir`, so a broken publish rolls back to the last
+    working model at startup. Returns a ServingModel or None.
+    """
+    current = current_version(model_dir)
+    candidates = [current] if current else []
+    candidates += [version for version in list_versions(model_dir) if version != current]
+    if os.path.exists(os.path.join(model_dir, 'model.pkl')):
+        candidates.append(LEGACY_VERSION)
+
+    for version in candidates:
+        try:
+            serving = load_version(version, model_dir, runtime)
+            prediction = smoke_test(serving)
+        except Exception as e:
+            logger.warning("Model version %s failed to load: %s", version, e)
+            continue
+        if version != candidates[0]:
+            logger.warning("Rolled back to model version %s", version)
+        logger.info("Model version %s loaded (%s); smoke prediction: %s", version, serving.runtime, prediction)
+        return serving
+    return None
@@ -0,0 +1,210 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from backend.model.forest_runtime import CompiledForest
+
+# Feature order the TaskType model is trained and served with
+REQUIRED_COLUMNS = ['Mood', 'Hour', 'Week(day/end)', 'SleepHours', 'Distractions',
+                    'ConfidenceScore', 'Completed', 'DayOfWeek']
+
+# Values used by /predict when a feature is missing from the request
+FEATURE_DEFAULTS = {
+    'Mood': 5,
+    'Hour': 14,
+    'Week(day/end)': 0,
+    'SleepHours': 7,
+    'Distractions': 2,
+    'ConfidenceScore': 6,
+    'Completed': 1,
+    'DayOfWeek': 2
+}
+
+# Saved next to model.pkl in every model version
+PIPELINE_FILENAME = 'features.json'
+
+# Week(day/end) labels in the log and the codes the model sees
+WEEK_CODES = {'Weekday': 0, 'Weekend': 1}
+
+def _payload_columns(payload, columns):
+    """Split a batch payload into one list of raw values per feature.
+
+    Accepts either an array of records (list of dicts) or a columnar payload
+    (dict mapping feature name to a list of values). Returns (values by
+    feature, row count); features absent from the payload map to None.
+    """
+    if isinstance(payload, list):
+        if not all(isinstance(record, dict) for record in payload):
+            raise ValueError("Every record in the batch must be an object")
+        return {col: [record.get(col) for record in payload] for col in columns}, len(payload)
+
+    if isinstance(payload, dict):
+        if any(not isinstance(values, list) for values in payload.values()):
+            raise ValueError("Columnar payload values must be arrays")
+        lengths = {len(values) for values in payload.values()}
+        if len(lengths) > 1:
+            raise ValueError("All columns in a columnar payload must have the same length")
+        n_rows = lengths.pop() if lengths else 0
+        return {col: payload.get(col) for col in columns}, n_rows
+
+    raise ValueError("Batch must be an array of records or an object of columns")
+
+class FeaturePipeline:
+    """Builds the feature matrix the TaskType model is trained and served with.
+
+    Cleaned log rows (training), single /predict payloads and batches all
+    come out as a C-contiguous float32 matrix with one column per entry of
+    `columns`, in that order. Every transform works on whole columns; the
+    only per-row Python is reading JSON records. Missing values take
+    `defaults`.
+
+    fit_transform() records where each feature came from and its range in
+    the training data. The pipeline is saved as PIPELINE_FILENAME next to
+    model.pkl, so a version is always served with the features it was
+    trained on.
+    """
+
+    def __init__(self, columns=REQUIRED_COLUMNS, defaults=FEATURE_DEFAULTS, week_codes=WEEK_CODES, stats=None):
+        self.columns = list(columns)
+        self.defaults = dict(defaults)
+        self.week_codes = dict(week_codes)
+        self.stats = stats or {}
+        self._fill = np.array([self.defaults[col] for col in self.columns], dtype=np.float32)
+
+    def _fill_missing(self, X):
+        missing = np.isnan(X)
+        if missing.any():
+            np.copyto(X, np.broadcast_to(self._fill, X.shape), where=missing)
+        return X
+
+    def _log_column(self, df, col):
+        """(float values with NaN where missing, source) of one feature of cleaned log rows"""
+        if col == 'Hour' and col not in df.columns:
+            if 'Time' not in df.columns:
+                return None, 'default'
+            times = pd.to_datetime(df['Time'], errors='coerce')
+            return times.dt.hour.to_numpy(dtype=np.float64, na_value=np.nan), 'Time'
+        if col not in df.columns:
+            return None, 'default'
+        values = df[col]
+        if col == 'Week(day/end)' and not pd.api.types.is_numeric_dtype(values):
+            values = values.astype(object).map(self.week_codes)
+        return pd.to_numeric(values, errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan), 'data'
+
+    def _transform_frame(self, df):
+        X = np.empty((len(df), len(self.columns)), dtype=np.float32)
+        sources = {}
+        for j, col in enumerate(self.columns):
+            values, sources[col] = self._log_column(df, col)
+            X[:, j] = np.nan if values is None else values
+        return self._fill_missing(X), sources
+
+    def fit_transform(self, df):
+        """Matrix for cleaned training rows, recording per-feature statistics"""
+        X, sources = self._transform_frame(df)
+        self.stats = {
+            col: {
+                'source': sources[col],
+                'mean': round(float(X[:, j].mean()), 4) if len(X) else None,
+                'min': float(X[:, j].min()) if len(X) else None,
+                'max': float(X[:, j].max()) if len(X) else None
+            }
+            for j, col in enumerate(self.columns)
+        }
+        return X
+
+    def transform_frame(self, df):
+        """Matrix for cleaned log rows"""
+        return self._transform_frame(df)[0]
+
+    def transform_record(self, record):
+        """1-row matrix for a single /predict payload.
+
+        Returns (X, invalid): features whose values are not numeric are
+        listed in `invalid` and set to 0.
+        """
+        X = self._fill.copy()
+        invalid = []
+        for j, col in enumerate(self.columns):
+            value = record.get(col)
+            if value is None:
+                continue
+            try:
+                X[j] = float(value)
+            except (TypeError, ValueError):
+                X[j] = np.nan
+            if np.isnan(X[j]):
+                invalid.append(col)
+                X[j] = 0
+        return X.reshape(1, -1), invalid
+
+    def transform_payload(self, payload):
+        """Validate and coerce a batch into a matrix.
+
+        Missing features fall back to the defaults. Values that are present
+        but not numeric raise a ValueError naming the offending rows.
+        """
+        raw_columns, n_rows = _payload_columns(payload, self.columns)
+        if n_rows == 0:
+            raise ValueError("Batch contains no rows")
+
+        X = np.empty((n_rows, len(self.columns)), dtype=np.float32)
+        invalid = np.zeros(X.shape, dtype=bool)
+        for j, col in enumerate(self.columns):
+            raw = raw_columns[col]
+            if raw is None:
+                X[:, j] = np.nan
+                continue
+            raw = pd.Series(raw, dtype=object)
+            values = pd.to_numeric(raw, errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+            invalid[:, j] = np.isnan(values) & raw.notna().to_numpy()
+            X[:, j] = values
+
+        if invalid.any():
+            bad_rows, bad_cols = np.nonzero(invalid)
+            details = [f"row {r}: {self.columns[c]}" for r, c in zip(bad_rows[:10], bad_cols[:10])]
+            raise ValueError(f"Non-numeric feature values ({len(bad_rows)} total): {', '.join(details)}")
+        return self._fill_missing(X)
+
+    def frame(self, X):
+        """X wrapped (without copying) in a DataFrame with the feature names"""
+        return pd.DataFrame(X, columns=self.columns, copy=False)
+
+    def model_input(self, model, X):
+        """X as `model` takes it: the compiled forest reads the matrix directly,
+        sklearn models get the named frame they were fitted with"""
+        if isinstance(model, CompiledForest):
+            return X
+        return self.frame(X)
+
+    def to_dict(self):
+        return {
+            'columns': self.columns,
+            'defaults': self.defaults,
+            'week_codes': self.week_codes,
+            'stats': self.stats
+        }
+
+    @classmethod
+    def from_dict(cls, info):
+        return cls(info['columns'], info['defaults'], info['week_codes'], info.get('stats'))
+
+    def save(self, path):
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+def load_pipeline(directory):
+    """The pipeline saved in a model directory; the defaults for models saved before pipelines"""
+    path = os.path.join(directory, PIPELINE_FILENAME)
+    if os.path.exists(path):
+        return FeaturePipeline.load(path)
+    return FeaturePipeline()
@@ -0,0 +1,233 @@
+import hashlib
+import logging
+import os
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Bump when the layout of the exported arrays changes
+FOREST_FORMAT_VERSION = 1
+
+# Rows evaluated together by apply()
+BLOCK_ROWS = 2048
+
+# File the compiled forest is saved to, next to model.pkl
+FOREST_FILENAME = 'forest.npz'
+
+# The pickle a forest is exported from, in the same directory
+MODEL_FILENAME = 'model.pkl'
+
+def forest_path_for(model_path):
+    return os.path.join(os.path.dirname(os.path.abspath(model_path)), FOREST_FILENAME)
+
+def model_digest(model_path):
+    """'<size>:<sha256>' of a model pickle, recorded in the forest exported
+    from it. Unlike mtimes, this survives a git checkout or a copy."""
+    sha = hashlib.sha256()
+    with open(model_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha.update(chunk)
+    return f"{os.path.getsize(model_path)}:{sha.hexdigest()}"
+
+def _exported_from(forest, model_path):
+    """Whether `forest` was exported from the pickle now at `model_path`"""
+    if not forest.model_digest:
+        return False
+    # The size prefix rules out most mismatches without hashing the pickle
+    if forest.model_digest.split(':', 1)[0] != str(os.path.getsize(model_path)):
+        return False
+    return forest.model_digest == model_digest(model_path)
+
+class CompiledForest:
+    """A fitted RandomForestClassifier flattened into packed NumPy arrays.
+
+    Every tree's nodes are concatenated into one set of arrays (split
+    feature, threshold, left/right child, missing-value direction and
+    normalized leaf class distribution), with `roots` giving the first node
+    of each tree. Leaves point to themselves, so walking `max_depth` levels
+    lands every (tree, row) pair on its leaf without any per-tree Python
+    loop. Only NumPy is needed to evaluate it, and predict/predict_proba
+    match the sklearn model they were exported from. `model_digest`
+    identifies that model's pickle (see model_digest()), or is None.
+    """
+
+    def __init__(self, feature, threshold, left, right, missing_left, leaf_values,
+                 roots, classes, feature_names, max_depth, model_digest=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.missing_left = missing_left
+        self.leaf_values = leaf_values
+        self.roots = roots
+        self.classes_ = classes
+        self.feature_names_in_ = feature_names
+        self.n_features_in_ = len(feature_names)
+        self.max_depth = int(max_depth)
+        self.model_digest = model_digest
+        self._children = np.stack([left, right], axis=1).ravel()
+
+    @property
+    def n_estimators(self):
+        return len(self.roots)
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """Flatten a fitted RandomForestClassifier (single output)"""
+        if getattr(model, 'n_outputs_', 1) != 1:
+            raise ValueError("Only single-output forests can be compiled")
+
+        features, thresholds, lefts, rights, missing, values, roots = [], [], [], [], [], [], []
+        base = 0
+        max_depth = 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            n_nodes = tree.node_count
+            node_ids = np.arange(base, base + n_nodes, dtype=np.int32)
+            is_leaf = tree.children_left == -1
+
+            features.append(np.where(is_leaf, 0, tree.feature).astype(np.int32))
+            thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+            lefts.append(np.where(is_leaf, node_ids, tree.children_left + base).astype(np.int32))
+            rights.append(np.where(is_leaf, node_ids, tree.children_right + base).astype(np.int32))
+            go_left = getattr(tree, 'missing_go_to_left', None)
+            missing.append(np.zeros(n_nodes, dtype=bool) if go_left is None else np.asarray(go_left, dtype=bool))
+
+            value = tree.value[:, 0, :model.n_classes_].astype(np.float64)
+            totals = value.sum(axis=1)
+            if not np.allclose(totals[totals > 0], 1.0):
+                # Trees from sklearn < 1.4 store weighted counts, which their
+                # predict_proba normalized per leaf
+                totals[totals == 0.0] = 1.0
+                value = value / totals[:, np.newaxis]
+            values.append(value)
+
+            roots.append(base)
+            base += n_nodes
+            max_depth = max(max_depth, tree.max_depth)
+
+        feature_names = getattr(model, 'feature_names_in_', None)
+        if feature_names is None:
+            feature_names = [f"x{i}" for i in range(model.n_features_in_)]
+
+        return cls(
+            np.concatenate(features), np.concatenate(thresholds),
+            np.concatenate(lefts), np.concatenate(rights), np.concatenate(missing),
+            np.concatenate(values), np.asarray(roots, dtype=np.int32),
+            np.asarray(model.classes_), np.asarray(feature_names, dtype=str), max_depth
+        )
+
+    def save(self, path):
+        """Write the arrays to an .npz file, replacing any previous export atomically"""
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        with open(tmp_path, 'wb') as f:
+            np.savez(
+                f,
+                version=np.array(FOREST_FORMAT_VERSION),
+                feature=self.feature, threshold=self.threshold,
+                left=self.left, right=self.right, missing_left=self.missing_left,
+                leaf_values=self.leaf_values, roots=self.roots,
+                classes=self.classes_, feature_names=self.feature_names_in_,
+                max_depth=np.array(self.max_depth),
+                model_digest=np.array(self.model_digest or '')
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            version = int(data['version'])
+            if version != FOREST_FORMAT_VERSION:
+                raise ValueError(f"Forest format {version} does not match {FOREST_FORMAT_VERSION}")
+            return cls(
+                data['feature'], data['threshold'], data['left'], data['right'],
+                data['missing_left'], data['leaf_values'], data['roots'],
+                data['classes'], data['feature_names'], data['max_depth'],
+                # Exports from before the digest was recorded can't be verified
+                str(data['model_digest']) if 'model_digest' in data.files else None
+            )
+
+    def _as_matrix(self, X):
+        if hasattr(X, 'columns'):
+            names = list(self.feature_names_in_)
+            if list(X.columns) != names:
+                missing = [name for name in names if name not in X.columns]
+                if missing:
+                    raise ValueError(f"Missing feature columns: {missing}")
+                X = X[names]
+            X = X.to_numpy(dtype=np.float32)
+        # sklearn's trees compare float32 inputs against float64 thresholds
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Expected {self.n_features_in_} features, got shape {X.shape}")
+        return X
+
+    def apply(self, X):
+        """Leaf node index reached by every row in every tree, shape (n_trees, n_rows)"""
+        X = self._as_matrix(X)
+        has_nan = bool(np.isnan(X).any())
+        leaves = np.empty((len(self.roots), X.shape[0]), dtype=np.int32)
+        # Walk the trees a block of rows at a time so the working arrays stay in cache
+        for start in range(0, X.shape[0], BLOCK_ROWS):
+            leaves[:, start:start + BLOCK_ROWS] = self._walk(X[start:start + BLOCK_ROWS], has_nan)
+        return leaves
+
+    def _walk(self, X, has_nan):
+        flat = X.ravel()
+        offsets = (np.arange(X.shape[0]) * X.shape[1])[np.newaxis, :]
+        nodes = np.repeat(self.roots[:, np.newaxis], X.shape[0], axis=1)
+        for _ in range(self.max_depth):
+            values = flat.take(offsets + self.feature.take(nodes))
+            go_left = values <= self.threshold.take(nodes)
+            if has_nan:
+                go_left |= np.isnan(values) & self.missing_left.take(nodes)
+            # Children are interleaved as (left, right) pairs
+            nodes = self._children.take(2 * nodes + ~go_left)
+        return nodes
+
+    def predict_proba(self, X):
+        leaves = self.apply(X)
+        proba = np.zeros((leaves.shape[1], len(self.classes_)))
+        # Summed tree by tree, in the same order as RandomForestClassifier
+        for tree_leaves in leaves:
+            proba += self.leaf_values[tree_leaves]
+        proba /= len(self.roots)
+        return proba
+
+    def predict(self, X):
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
+
+def export_forest(model, path, model_path=None):
+    """Compile a fitted forest and save it to `path`.
+
+    `model_path` is the pickle of `model` (by default model.pkl next to
+    `path`); its digest is saved with the forest so load_model can tell
+    whether the two still match.
+    """
+    forest = CompiledForest.from_sklearn(model)
+    model_path = model_path or os.path.join(os.path.dirname(os.path.abspath(path)), MODEL_FILENAME)
+    if os.path.exists(model_path):
+        forest.model_digest = model_digest(model_path)
+    forest.save(path)
+    return forest
+
+def load_model(model_path, runtime='compiled'):
+    """Load the serving model for `model_path`.
+
+    With runtime='compiled' the exported forest next to the pickle is used
+    when it was exported from that pickle (its recorded digest matches), so
+    sklearn is never imported. Otherwise (or if no matching export exists)
+    the pickle is loaded with joblib. Returns (model, runtime actually used).
+    """
+    forest_path = forest_path_for(model_path)
+    if runtime == 'compiled' and os.path.exists(forest_path):
+        forest = CompiledForest.load(forest_path)
+        if not os.path.exists(model_path) or _exported_from(forest, model_path):
+            return forest, 'compiled'
+        logger.warning("Ignoring %s: not exported from %s", forest_path, model_path)
+
+    import joblib
+    return joblib.load(model_path), 'sklearn'
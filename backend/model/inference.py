@@ -0,0 +1,29 @@
+import numpy as np
+
+from backend.model.features import FeaturePipeline
+
+def predict_batch(model, payload, mapping=None, features=None):
+    """Score a whole batch of feature records with a single model call.
+
+    The payload is coerced into one float32 matrix by the feature pipeline
+    (the model version's own, or the defaults) and passed through
+    predict_proba once; predictions are the argmax class of each row.
+    Class codes are translated to labels through the task mapping.
+    """
+    features = features or FeaturePipeline()
+    X = features.transform_payload(payload)
+    probabilities = model.predict_proba(features.model_input(model, X))
+    classes = model.classes_
+    predictions = classes[np.argmax(probabilities, axis=1)]
+
+    mapping = mapping or {}
+    class_labels = [mapping.get(int(cls), int(cls)) for cls in classes]
+    label_lookup = dict(zip(classes.tolist(), class_labels))
+
+    return {
+        'count': int(X.shape[0]),
+        'predictions': [int(pred) for pred in predictions],
+        'labels': [label_lookup[pred] for pred in predictions.tolist()],
+        'classes': class_labels,
+        'probabilities': np.round(probabilities, 6).tolist()
+    }
@@ -0,0 +1,133 @@
+import itertools
+import logging
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from backend.model.features import FeaturePipeline
+
+logger = logging.getLogger(__name__)
+
+# Value ranges of the discrete /predict inputs, enumerated by the optional
+# precomputed grid. The continuous inputs (SleepHours, ConfidenceScore) are
+# held at the feature pipeline's defaults, which is what PredictionForm sends
+# unless the user edits them.
+PREDICTION_GRID = {
+    'Mood': range(1, 11),
+    'Hour': range(0, 24),
+    'Week(day/end)': (0, 1),
+    'Distractions': range(0, 11),
+    'Completed': (0, 1),
+    'DayOfWeek': range(0, 7)
+}
+
+def feature_key(values):
+    """Cache key for one feature row: the float32 values the model compares"""
+    return tuple(np.asarray(values, dtype=np.float32).tolist())
+
+def grid_matrix(grid=PREDICTION_GRID, features=None):
+    """Every combination of the grid values, other features at their defaults"""
+    features = features or FeaturePipeline()
+    ranges = [grid.get(col, (features.defaults[col],)) for col in features.columns]
+    return np.array(list(itertools.product(*ranges)), dtype=np.float32)
+
+class PredictionCache:
+    """Bounded LRU memo of single-row predictions.
+
+    Entries belong to one ServingModel: the first lookup with a different
+    model (after a reload or a training swap) drops them, so a stale
+    prediction is never served. With `precompute_grid` the predictions for
+    the whole PREDICTION_GRID are computed in one batch in a background
+    thread whenever the model changes, and rows on the grid are answered
+    from that table without touching the model.
+    """
+
+    def __init__(self, max_entries=4096, precompute_grid=False):
+        self.max_entries = max_entries
+        self.precompute_grid = precompute_grid
+        self._serving = None
+        self._entries = OrderedDict()  # feature key -> prediction
+        self._grid = {}  # feature key -> prediction, for self._serving
+        self._grid_thread = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.grid_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _use(self, serving):
+        """Make `serving` the model entries are kept for; call with the lock held"""
+        if serving is self._serving:
+            return
+        if self._serving is not None:
+            self.invalidations += 1
+        self._serving = serving
+        self._entries.clear()
+        self._grid = {}
+        if self.precompute_grid:
+            self._grid_thread = threading.Thread(target=self._build_grid, args=(serving,), daemon=True)
+            self._grid_thread.start()
+
+    def _build_grid(self, serving):
+        X = grid_matrix(features=serving.features)
+        predictions = serving.model.predict(serving.features.model_input(serving.model, X))
+        table = {tuple(row): prediction for row, prediction in zip(X.tolist(), predictions.tolist())}
+        with self._lock:
+            if self._serving is serving:
+                self._grid = table
+        logger.info("Precomputed %d grid predictions for model version %s", len(table), serving.version)
+
+    def warm(self, serving):
+        """Switch to `serving` now (starting the grid build) instead of on first use"""
+        with self._lock:
+            self._use(serving)
+
+    def wait(self, timeout=None):
+        """Block until the grid for the current model is built (if one is being built)"""
+        thread = self._grid_thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def predict(self, serving, X):
+        """Prediction for the 1-row feature matrix `X` (from serving.features)"""
+        key = feature_key(X[0])
+        with self._lock:
+            self._use(serving)
+            if key in self._grid:
+                self.grid_hits += 1
+                return self._grid[key]
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        prediction = serving.model.predict(serving.features.model_input(serving.model, X))[0]
+        if self.max_entries > 0:
+            with self._lock:
+                if self._serving is serving:
+                    self._entries[key] = prediction
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+        return prediction
+
+    def clear(self):
+        with self._lock:
+            self._serving = None
+            self._entries.clear()
+            self._grid = {}
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.grid_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'grid_entries': len(self._grid),
+                'hits': self.hits,
+                'grid_hits': self.grid_hits,
+                'misses': self.misses,
+                'hit_rate': round((self.hits + self.grid_hits) / lookups, 4) if lookups else 0.0,
+                'invalidations': self.invalidations
+            }
@@ -1,9 +1,20 @@
 import pandas as pd
 import numpy as np
+import json
+import logging
 import os
+import shutil
+import tempfile
 
-def load_data(filepath):
-    """Load data from CSV file and handle date/time parsing"""
+from backend.observability.log import configure_logging
+
+logger = logging.getLogger(__name__)
+
+def load_data(filepath, save=False):
+    """Load data from CSV file and handle date/time parsing.
+
+    With save=True the parsed data is also written back over the source file.
+    """
     try:
         df = pd.read_csv(filepath)
         
@@ -18,18 +29,18 @@ def load_data(filepath):
             df["Time"] = df["Date"]
         
         # Save cleaned data
-        os.makedirs(os.path.dirname(filepath), exist_ok=True)
-        df.to_csv(filepath, index=False)
+        if save:
+            os.makedirs(os.path.dirname(filepath), exist_ok=True)
+            df.to_csv(filepath, index=False)
         
         return df
-    except Exception as e:
-        print(f"Error loading data: {e}")
+    except Exception:
+        logger.exception("Error loading data from %s", filepath)
         return None
 
 def handle_missing_values(df):
     """Handle missing values in the dataset"""
-    print("Missing values in each column:")
-    print(df.isnull().sum())
+    logger.debug("Missing values in each column:\n%s", df.isnull().sum())
     
     # Fill missing values for numeric columns
     numeric_columns = df.select_dtypes(include=['float64', 'int64']).columns
@@ -66,7 +77,7 @@ def remove_duplicates(df):
     """Remove duplicate rows"""
     initial_shape = df.shape
     df = df.drop_duplicates()
-    print(f"Removed {initial_shape[0] - df.shape[0]} duplicate rows")
+    logger.info("Removed %d duplicate rows", initial_shape[0] - df.shape[0])
     return df
 
 def extract_time_features(df):
@@ -82,57 +93,480 @@ def extract_time_features(df):
     
     return df
 
-def clean_pipeline(filepath):
-    """Complete data cleaning pipeline"""
+def clean_frame(df):
+    """Clean an already loaded log; returns (cleaned DataFrame, task mapping)"""
+    logger.info("Initial data shape: %s", df.shape)
+    
+    # Handle missing values
+    df = handle_missing_values(df)
+    
+    # Encode task types
+    df, mapping = encode_tasktypes(df)
+    
+    # Remove duplicates
+    df = remove_duplicates(df)
+    
+    # Extract time features
+    df = extract_time_features(df)
+    
+    # Clean text columns
+    text_cols = df.select_dtypes(include='object').columns
+    for col in text_cols:
+        df[col] = df[col].astype(str).str.strip()
+    
+    # Drop rows with missing critical data
+    critical_columns = ['TaskType']
+    df = df.dropna(subset=critical_columns)
+    
+    logger.info("Final cleaned data shape: %s", df.shape)
+    logger.debug("Task mapping: %s", mapping)
+    return df, mapping
+
+def task_code_dtype(mapping):
+    """Integer dtype for TaskType codes: int8 like the category codes of up
+    to 127 task types, int16 beyond that so codes don't wrap"""
+    return 'int8' if len(mapping) < 128 else 'int16'
+
+def task_key(value):
+    """Comparable form of a TaskType value: numbers as float (so 3, 3.0 and
+    '3' are the same task), anything else as stripped text"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return str(value).strip()
+
+def clean_rows(rows, mapping):
+    """Clean rows logged after the source file was cleaned (/log entries).
+
+    clean_frame looks at the whole file (group means, duplicates, the set of
+    task types), so it can't be run on new rows alone. Here every row is
+    cleaned on its own instead: Date/Time are parsed, TaskType is encoded
+    with the `mapping` the file was cleaned with (rows with a task type it
+    doesn't know are dropped), the day features are derived from Date and
+    text is stripped. Nothing is imputed or de-duplicated, so an entry
+    logged twice counts twice, and cleaning rows in batches gives the same
+    result as cleaning them all at once.
+    """
+    rows = parse_dates(rows.copy())
+
+    if 'TaskType' in rows.columns:
+        codes = {task_key(task): code for code, task in mapping.items()}
+        lookup = {value: codes.get(task_key(value), -1) for value in rows['TaskType'].dropna().unique()}
+        encoded = rows['TaskType'].map(lookup).fillna(-1).astype('int64')
+        unknown = int((encoded < 0).sum())
+        if unknown:
+            logger.warning("Dropped %d rows with an unknown TaskType", unknown)
+        rows = rows[(encoded >= 0).to_numpy()]
+        rows["TaskType"] = encoded[encoded >= 0].astype(task_code_dtype(mapping))
+
+    if 'Date' in rows.columns:
+        rows = extract_time_features(rows)
+
+    text_cols = rows.select_dtypes(include=['object', 'string']).columns
+    for col in text_cols:
+        rows[col] = rows[col].astype(str).str.strip()
+    return rows.reset_index(drop=True)
+
+def clean_pipeline(filepath, save=False):
+    """Complete data cleaning pipeline.
+
+    The source file is left untouched unless save=True, which overwrites it
+    with the cleaned data. The columnar cache
+    (backend/store/columnar_cache.py) keeps the cleaned data in its own
+    typed format instead.
+    """
     try:
         # Load data
-        df = load_data(filepath)
+        df = load_data(filepath, save=save)
         if df is None:
             return None, None
         
-        print(f"Initial data shape: {df.shape}")
-        
-        # Handle missing values
-        df = handle_missing_values(df)
-        
-        # Encode task types
-        df, mapping = encode_tasktypes(df)
-        
-        # Remove duplicates
-        df = remove_duplicates(df)
-        
-        # Extract time features
-        df = extract_time_features(df)
-        
-        # Clean text columns
-        text_cols = df.select_dtypes(include='object').columns
-        for col in text_cols:
-            df[col] = df[col].astype(str).str.strip()
-        
-        # Drop rows with missing critical data
-        critical_columns = ['TaskType']
-        df = df.dropna(subset=critical_columns)
-        
-        print(f"Final cleaned data shape: {df.shape}")
-        print(f"Task mapping: {mapping}")
+        df, mapping = clean_frame(df)
         
         # Save cleaned data
-        df.to_csv(filepath, index=False)
+        if save:
+            df.to_csv(filepath, index=False)
         
         return df, mapping
     
-    except Exception as e:
-        print(f"Error in clean_pipeline: {e}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        logger.exception("Error in clean_pipeline")
+        return None, None
+
+# Rows per chunk for the streaming pipeline
+STREAM_CHUNK_SIZE = 50000
+
+# Row hashes held in memory at once when de-duplicating: hash sets and
+# spill files are split into partitions of about this many hashes
+DEDUP_PARTITION_ROWS = 1 << 20
+
+# Distinct values tracked per text column when looking for its mode; beyond
+# this the rarest half is dropped, which keeps memory bounded at the cost of
+# an approximate mode for very high-cardinality columns
+MODE_TRACK_LIMIT = 10000
+
+def parse_dates(chunk):
+    """Parse Date/Time the same way as load_data"""
+    if 'Date' in chunk.columns:
+        chunk["Date"] = pd.to_datetime(chunk["Date"], errors='coerce')
+    if 'Time' in chunk.columns:
+        chunk["Time"] = pd.to_datetime(chunk["Time"], errors='coerce')
+    elif 'Date' in chunk.columns:
+        chunk["Time"] = chunk["Date"]
+    return chunk
+
+def _read_chunks(filepath, chunksize):
+    """Yield the CSV in chunks with dates parsed the same way as load_data"""
+    for chunk in pd.read_csv(filepath, chunksize=chunksize):
+        yield parse_dates(chunk)
+
+def new_statistics():
+    """Empty running statistics for update_statistics/clean_chunk"""
+    return {
+        'rows': 0,
+        'numeric': set(),
+        'float_columns': set(),
+        'text': set(),
+        'group_sums': {},  # column -> {TaskType: [sum, count]}
+        'column_sums': {},  # column -> [sum, count]
+        'mode_counts': {},  # column -> {value: count}
+        'task_types': set()
+    }
+
+def update_statistics(stats, chunk):
+    """Fold a raw chunk into running sums/counts, text modes and column types"""
+    stats['rows'] += len(chunk)
+    # A column is numeric only if no chunk holds text in it; all-empty
+    # chunks say nothing either way
+    all_null = {col for col in chunk.columns if chunk[col].isnull().all()}
+    numeric = set(chunk.select_dtypes(include=['float64', 'int64']).columns) - all_null
+    stats['numeric'] |= numeric
+    stats['text'] |= set(chunk.select_dtypes(include=['object', 'string']).columns) - all_null
+    stats['float_columns'] |= set(chunk.select_dtypes(include=['float64']).columns)
+
+    for col in numeric:
+        total = stats['column_sums'].setdefault(col, [0.0, 0])
+        total[0] += float(chunk[col].sum())
+        total[1] += int(chunk[col].count())
+
+    if 'TaskType' in chunk.columns:
+        stats['task_types'] |= set(chunk['TaskType'].dropna().unique())
+        cols = [col for col in numeric if col != 'TaskType']
+        if cols:
+            grouped = chunk.groupby('TaskType')[cols].agg(['sum', 'count'])
+            for col in cols:
+                sums = stats['group_sums'].setdefault(col, {})
+                for task, total, count in zip(grouped.index, grouped[(col, 'sum')], grouped[(col, 'count')]):
+                    entry = sums.setdefault(task, [0.0, 0])
+                    entry[0] += float(total)
+                    entry[1] += int(count)
+
+    for col in chunk.select_dtypes(include=['object', 'string']).columns:
+        counts = stats['mode_counts'].setdefault(col, {})
+        for value, count in chunk[col].value_counts().items():
+            counts[value] = counts.get(value, 0) + int(count)
+        if len(counts) > MODE_TRACK_LIMIT:
+            keep = sorted(counts.items(), key=lambda item: item[1], reverse=True)[:MODE_TRACK_LIMIT // 2]
+            stats['mode_counts'][col] = dict(keep)
+    return stats
+
+def _scan_statistics(filepath, chunksize):
+    """First pass: running statistics for the whole file"""
+    stats = new_statistics()
+    for chunk in _read_chunks(filepath, chunksize):
+        update_statistics(stats, chunk)
+    return stats
+
+def row_hashes(frame, columns):
+    """Stable 64-bit hash per row of `columns`.
+
+    Values are hashed in a form that survives the columnar cache (numbers as
+    float32, dates as int64 nanoseconds, anything else as text), so a row
+    hashes the same whether it was just cleaned or read back from the cache.
+    """
+    normalized = {}
+    for col in columns:
+        series = frame[col]
+        if pd.api.types.is_bool_dtype(series) or pd.api.types.is_numeric_dtype(series):
+            normalized[col] = series.astype('float32')
+        elif pd.api.types.is_datetime64_any_dtype(series):
+            normalized[col] = series.astype('datetime64[ns]').astype('int64')
+        else:
+            normalized[col] = series.astype(str).astype(object)
+    return pd.util.hash_pandas_object(pd.DataFrame(normalized, index=frame.index), index=False).to_numpy()
+
+def clean_chunk(chunk, stats, mapping):
+    """Clean one raw chunk with running statistics, as clean_pipeline would.
+
+    Duplicates are left in: callers drop them by row_hashes over the raw
+    chunk's columns, against a RowHashSet or (clean_pipeline_streaming)
+    with _repeated_rows.
+    """
+    numeric_columns = sorted(stats['numeric'] - stats['text'])
+    category_codes = {task: code for code, task in mapping.items()}
+    modes = {col: max(counts, key=counts.get) if counts else 'Unknown'
+             for col, counts in stats['mode_counts'].items()}
+
+    # Handle missing values: group mean by TaskType, as handle_missing_values
+    for col in numeric_columns:
+        if col not in chunk.columns:
+            continue
+        if col in stats['float_columns']:
+            chunk[col] = chunk[col].astype('float64')
+        if chunk[col].isnull().any():
+            if 'TaskType' in chunk.columns:
+                group_means = {task: total / count if count else np.nan
+                               for task, (total, count) in stats['group_sums'].get(col, {}).items()}
+                chunk[col] = chunk[col].fillna(chunk['TaskType'].map(group_means))
+            else:
+                total, count = stats['column_sums'].get(col, (0.0, 0))
+                chunk[col] = chunk[col].fillna(total / count if count else np.nan)
+    for col, mode in modes.items():
+        if col in chunk.columns and chunk[col].isnull().any():
+            chunk[col] = chunk[col].fillna(mode)
+
+    # Encode task types with the categories seen across the whole file
+    if 'TaskType' in chunk.columns:
+        chunk["TaskType"] = chunk["TaskType"].map(category_codes).fillna(-1).astype(task_code_dtype(mapping))
+    else:
+        chunk['TaskType'] = np.random.randint(0, 6, len(chunk))
+
+    chunk = extract_time_features(chunk)
+
+    # Clean text columns
+    text_cols = chunk.select_dtypes(include=['object', 'string']).columns
+    for col in text_cols:
+        chunk[col] = chunk[col].astype(str).str.strip()
+    return chunk
+
+def _first_occurrences(hashes):
+    first = np.zeros(len(hashes), dtype=bool)
+    first[np.unique(hashes, return_index=True)[1]] = True
+    return first
+
+def _partition_of(hashes, bits):
+    """Partition index of each hash: its leading `bits` bits"""
+    if not bits:
+        return np.zeros(len(hashes), dtype=np.int64)
+    return (hashes >> np.uint64(64 - bits)).astype(np.int64)
+
+def _link_or_copy(src, dst):
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+class RowHashSet:
+    """Set of row_hashes kept on disk, for dropping duplicates of rows that
+    arrive over time (incremental training).
+
+    Hashes are stored sorted in partition files picked by their leading
+    bits, and the number of bits grows with the set so a partition holds
+    at most about DEDUP_PARTITION_ROWS hashes. add() loads one partition at
+    a time, so memory stays flat however many rows have been seen. Files
+    are replaced rather than modified, so a copy() made with hard links is
+    independent of the original.
+    """
+
+    META_FILENAME = 'hashes.json'
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        try:
+            with open(os.path.join(directory, self.META_FILENAME)) as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            meta = {'bits': 0, 'size': 0}
+        self.bits = meta['bits']
+        self.size = meta['size']
+
+    def __len__(self):
+        return self.size
+
+    def _path(self, index, bits=None):
+        return os.path.join(self.directory, f"part-{self.bits if bits is None else bits:02d}-{index:06d}.npy")
+
+    def _read(self, index):
+        try:
+            return np.load(self._path(index))
+        except FileNotFoundError:
+            return np.empty(0, dtype=np.uint64)
+
+    def _write(self, path, values):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.save(f, values)
+        os.replace(tmp_path, path)
+
+    def _save_meta(self):
+        path = os.path.join(self.directory, self.META_FILENAME)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'bits': self.bits, 'size': self.size}, f)
+        os.replace(tmp_path, path)
+
+    def add(self, hashes):
+        """Add `hashes` to the set. Returns a mask of the ones that were new:
+        not in the set already and not repeating an earlier one in `hashes`."""
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        new = _first_occurrences(hashes)
+        partitions = _partition_of(hashes, self.bits)
+        order = np.argsort(partitions, kind='stable')
+        largest = 0
+        for rows in np.split(order, np.flatnonzero(np.diff(partitions[order])) + 1):
+            if not len(rows):
+                continue
+            index = int(partitions[rows[0]])
+            existing = self._read(index)
+            if len(existing):
+                new[rows[np.isin(hashes[rows], existing)]] = False
+            fresh = hashes[rows[new[rows]]]
+            if len(fresh):
+                existing = np.union1d(existing, fresh)
+                self._write(self._path(index), existing)
+            largest = max(largest, len(existing))
+        self.size += int(new.sum())
+        while largest > DEDUP_PARTITION_ROWS:
+            largest = self._split()
+        self._save_meta()
+        return new
+
+    def _split(self):
+        """Double the number of partitions; returns the largest new partition's size"""
+        bits = self.bits + 1
+        old_paths = []
+        largest = 0
+        for index in range(1 << self.bits):
+            values = self._read(index)
+            old_paths.append(self._path(index))
+            upper = (_partition_of(values, bits) & 1).astype(bool)
+            for half, part in ((0, values[~upper]), (1, values[upper])):
+                if len(part):
+                    self._write(self._path(2 * index + half, bits), part)
+                largest = max(largest, len(part))
+        self.bits = bits
+        self._save_meta()
+        for path in old_paths:
+            if os.path.exists(path):
+                os.remove(path)
+        return largest
+
+    def copy(self, directory):
+        """Independent copy of the set in `directory` (hard links where possible)"""
+        shutil.copytree(self.directory, directory, copy_function=_link_or_copy, dirs_exist_ok=True)
+        return RowHashSet(directory)
+
+def _repeated_rows(hash_chunks, rows, directory):
+    """Flags marking every row whose hash matches an earlier row's.
+
+    `hash_chunks` yields the row_hashes of consecutive chunks, `rows` in
+    total. (hash, row number) pairs are spilled to files in `directory`
+    partitioned by the hash's leading bits, enough partitions that each
+    holds about DEDUP_PARTITION_ROWS pairs, and each partition is then
+    sorted on its own. The flags are a memory-mapped file, so memory stays
+    flat however many rows (and chunks) there are.
+    """
+    bits = max(0, int(np.ceil(np.log2(max(rows, 1) / DEDUP_PARTITION_ROWS))))
+    pair = np.dtype([('hash', '<u8'), ('row', '<u8')])
+    start = 0
+    for hashes in hash_chunks:
+        pairs = np.empty(len(hashes), dtype=pair)
+        pairs['hash'] = hashes
+        pairs['row'] = np.arange(start, start + len(hashes))
+        start += len(hashes)
+        partitions = _partition_of(pairs['hash'], bits)
+        for index in np.unique(partitions):
+            with open(os.path.join(directory, f"part-{index:06d}.bin"), 'ab') as f:
+                pairs[partitions == index].tofile(f)
+
+    flags = np.memmap(os.path.join(directory, 'repeated.bin'), dtype=bool, mode='w+', shape=(max(rows, 1),))
+    for index in range(1 << bits):
+        path = os.path.join(directory, f"part-{index:06d}.bin")
+        if not os.path.exists(path):
+            continue
+        pairs = np.fromfile(path, dtype=pair)
+        pairs = pairs[np.lexsort((pairs['row'], pairs['hash']))]
+        repeated = np.flatnonzero(pairs['hash'][1:] == pairs['hash'][:-1]) + 1
+        flags[pairs['row'][repeated].astype(np.int64)] = True
+        os.remove(path)
+    return flags
+
+def _clean_chunks(filepath, stats, mapping, chunksize):
+    """Yield (raw columns, cleaned chunk) using the whole-file statistics"""
+    for chunk in _read_chunks(filepath, chunksize):
+        columns = list(chunk.columns)
+        yield columns, clean_chunk(chunk, stats, mapping)
+
+def task_mapping_for(stats):
+    """TaskType codes for the categories in `stats`, as encode_tasktypes assigns them"""
+    if stats['task_types']:
+        return dict(enumerate(sorted(stats['task_types'])))
+    return {0: 'Study', 1: 'Exercise', 2: 'Social', 3: 'Leisure', 4: 'Sleep', 5: 'Work'}
+
+def clean_pipeline_streaming(filepath, output_path=None, chunksize=STREAM_CHUNK_SIZE):
+    """Bounded-memory version of clean_pipeline for logs too large for RAM.
+
+    Reads the CSV three times in chunks: the first pass gathers running
+    per-TaskType means, text modes and the TaskType categories; the second
+    cleans each chunk with those whole-file statistics and spills its row
+    hashes to disk, where _repeated_rows finds the duplicates one partition
+    at a time; the third cleans the chunks again and appends the rows that
+    aren't repeats to `output_path` (by default `<name>_cleaned.csv` next
+    to the input). The source file is not modified. Memory is bounded by
+    the chunk size and DEDUP_PARTITION_ROWS, however long the file is.
+
+    Returns (output_path, mapping), or (None, None) on failure.
+    """
+    try:
+        if output_path is None:
+            root, ext = os.path.splitext(filepath)
+            output_path = f"{root}_cleaned{ext or '.csv'}"
+
+        stats = _scan_statistics(filepath, chunksize)
+        logger.info("Initial data rows: %d", stats['rows'])
+
+        mapping = task_mapping_for(stats)
+
+        tmp_path = f"{output_path}.tmp"
+        rows_written = 0
+        header = True
+        spill = tempfile.mkdtemp(prefix='.dedup-', dir=os.path.dirname(os.path.abspath(output_path)))
+        try:
+            repeated = _repeated_rows(
+                (row_hashes(chunk, columns) for columns, chunk in _clean_chunks(filepath, stats, mapping, chunksize)),
+                stats['rows'], spill)
+            start = 0
+            for _, chunk in _clean_chunks(filepath, stats, mapping, chunksize):
+                keep = ~np.asarray(repeated[start:start + len(chunk)])
+                start += len(chunk)
+                chunk[keep].to_csv(tmp_path, mode='w' if header else 'a', header=header, index=False)
+                header = False
+                rows_written += int(keep.sum())
+            del repeated
+        finally:
+            shutil.rmtree(spill, ignore_errors=True)
+        if header:
+            # Empty input: still produce an (empty) output file
+            open(tmp_path, 'w').close()
+        os.replace(tmp_path, output_path)
+
+        logger.info("Removed %d duplicate rows", stats['rows'] - rows_written)
+        logger.info("Final cleaned data rows: %d", rows_written)
+        logger.debug("Task mapping: %s", mapping)
+        return output_path, mapping
+
+    except Exception:
+        logger.exception("Error in clean_pipeline_streaming")
         return None, None
 
 # Test the pipeline if run directly
 if __name__ == "__main__":
+    configure_logging(fmt='text')
     df_cleaned, mapping = clean_pipeline("data/productivity_log_may.csv")
     if df_cleaned is not None:
-        print("Data cleaning completed successfully!")
-        print(f"Columns: {list(df_cleaned.columns)}")
-        print(f"Sample data:\n{df_cleaned.head()}")
+        logger.info("Data cleaning completed successfully!")
+        logger.info("Columns: %s", list(df_cleaned.columns))
+        logger.info("Sample data:\n%s", df_cleaned.head())
     else:
-        print("Data cleaning failed!")
+        logger.error("Data cleaning failed!")
@@ -0,0 +1,206 @@
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from backend.model import artifacts
+from backend.model.forest_runtime import CompiledForest
+
+logger = logging.getLogger(__name__)
+
+# Tenant ids are used as directory names under the registry root
+_TENANT_ID = re.compile(r'^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$')
+
+# Layout of a tenant directory: model versions as in backend/model, and the log
+TENANT_MODEL_DIRNAME = 'model'
+TENANT_DATA_PATH = os.path.join('data', 'productivity_log.csv')
+
+# Seconds between checks of a resident model against its published version
+REFRESH_SECONDS = 5
+
+# Bytes per tree node of a fitted sklearn tree (the node struct), for model_nbytes
+_SKLEARN_NODE_BYTES = 64
+
+class UnknownTenant(LookupError):
+    """Raised for a tenant id with no directory under the registry root"""
+
+def validate_tenant_id(tenant_id):
+    if not isinstance(tenant_id, str) or not _TENANT_ID.match(tenant_id):
+        raise ValueError(f"Invalid tenant id: {tenant_id!r}")
+    return tenant_id
+
+def model_nbytes(model):
+    """Approximate memory held by a loaded model"""
+    if isinstance(model, CompiledForest):
+        return sum(array.nbytes for array in (
+            model.feature, model.threshold, model.left, model.right, model.missing_left,
+            model.leaf_values, model.roots, model._children))
+    total = 0
+    for estimator in getattr(model, 'estimators_', ()):
+        tree = estimator.tree_
+        total += tree.node_count * _SKLEARN_NODE_BYTES + tree.value.nbytes
+    return total
+
+class _Entry:
+    def __init__(self, serving, nbytes):
+        self.serving = serving
+        self.nbytes = nbytes
+        self.checked_at = time.monotonic()
+
+def _new_stats():
+    return {'hits': 0, 'misses': 0, 'coalesced': 0, 'loads': 0, 'evictions': 0,
+            'load_seconds_total': 0.0, 'last_load_seconds': None}
+
+class ModelRegistry:
+    """Serving models for many tenants, loaded on demand.
+
+    Each tenant has a directory under `root` with its model versions (the
+    same layout as backend/model) and its productivity log. get() loads a
+    tenant's newest working model the first time it is asked for and keeps
+    it resident; once the resident models take more than `max_bytes`, the
+    least recently used ones are evicted. Requests for a model that is
+    already being loaded wait for that load instead of starting their own.
+    A resident model is compared with the tenant's published version at
+    most every `refresh_seconds` and reloaded when a new one is out. A
+    tenant without a usable model is retried at the same interval.
+    """
+
+    def __init__(self, root, runtime='compiled', max_bytes=512 * 1024 * 1024,
+                 refresh_seconds=REFRESH_SECONDS, loader=artifacts.load_serving):
+        self.root = root
+        self.runtime = runtime
+        self.max_bytes = max_bytes
+        self.refresh_seconds = refresh_seconds
+        self.loader = loader
+        self._entries = OrderedDict()  # tenant id -> _Entry, least recently used first
+        self._loading = {}  # tenant id -> threading.Event set when its load ends
+        self._stats = {}  # tenant id -> counters
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def tenant_dir(self, tenant_id):
+        """A tenant's directory; raises ValueError or UnknownTenant"""
+        directory = os.path.join(self.root, validate_tenant_id(tenant_id))
+        if not os.path.isdir(directory):
+            raise UnknownTenant(tenant_id)
+        return directory
+
+    def model_dir(self, tenant_id):
+        return os.path.join(self.tenant_dir(tenant_id), TENANT_MODEL_DIRNAME)
+
+    def data_path(self, tenant_id):
+        return os.path.join(self.tenant_dir(tenant_id), TENANT_DATA_PATH)
+
+    def get(self, tenant_id):
+        """The tenant's ServingModel, or None if it has no usable model"""
+        model_dir = self.model_dir(tenant_id)
+        with self._lock:
+            entry = self._entries.get(tenant_id)
+            if entry is not None:
+                self._entries.move_to_end(tenant_id)
+        if entry is not None and not self._outdated(entry, model_dir):
+            with self._lock:
+                self._stats[tenant_id]['hits'] += 1
+            return entry.serving
+        return self._load(tenant_id, model_dir)
+
+    def _outdated(self, entry, model_dir):
+        now = time.monotonic()
+        if now < entry.checked_at + self.refresh_seconds:
+            return False
+        entry.checked_at = now
+        if entry.serving is None:
+            return True
+        published = artifacts.current_version(model_dir)
+        return published is not None and published != entry.serving.version
+
+    def _load(self, tenant_id, model_dir):
+        with self._lock:
+            stats = self._stats.setdefault(tenant_id, _new_stats())
+            done = self._loading.get(tenant_id)
+            leader = done is None
+            if leader:
+                done = self._loading[tenant_id] = threading.Event()
+                stats['misses'] += 1
+            else:
+                stats['coalesced'] += 1
+
+        if not leader:
+            done.wait()
+            with self._lock:
+                entry = self._entries.get(tenant_id)
+            return entry.serving if entry is not None else None
+
+        try:
+            start = time.perf_counter()
+            serving = self.loader(model_dir, self.runtime)
+            seconds = time.perf_counter() - start
+            nbytes = model_nbytes(serving.model) if serving is not None else 0
+            with self._lock:
+                stats['loads'] += 1
+                stats['load_seconds_total'] += seconds
+                stats['last_load_seconds'] = round(seconds, 4)
+                self._put(tenant_id, _Entry(serving, nbytes))
+            logger.info("Loaded model for tenant %s", tenant_id, extra={
+                'version': serving.version if serving is not None else None,
+                'bytes': nbytes, 'seconds': round(seconds, 4)})
+            return serving
+        finally:
+            with self._lock:
+                del self._loading[tenant_id]
+            done.set()
+
+    def _put(self, tenant_id, entry):
+        """Make `entry` resident and evict down to the budget; call with the lock held"""
+        previous = self._entries.pop(tenant_id, None)
+        if previous is not None:
+            self._bytes -= previous.nbytes
+        self._entries[tenant_id] = entry
+        self._bytes += entry.nbytes
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            oldest_id = next(iter(self._entries))
+            if oldest_id == tenant_id:
+                break
+            self._evict(oldest_id)
+
+    def _evict(self, tenant_id):
+        """Drop a tenant's resident model; call with the lock held"""
+        entry = self._entries.pop(tenant_id, None)
+        if entry is not None:
+            self._bytes -= entry.nbytes
+            self._stats[tenant_id]['evictions'] += 1
+            logger.info("Evicted model for tenant %s", tenant_id, extra={'bytes': entry.nbytes})
+
+    def totals(self):
+        """Counters summed over every tenant, for /metrics"""
+        with self._lock:
+            totals = {name: sum(stats[name] for stats in self._stats.values())
+                      for name in ('hits', 'misses', 'coalesced', 'loads', 'evictions', 'load_seconds_total')}
+            totals['resident'] = sum(1 for entry in self._entries.values() if entry.serving is not None)
+            totals['bytes'] = self._bytes
+            return totals
+
+    def stats(self):
+        """Memory use and per-tenant hit/miss and load latency counters"""
+        with self._lock:
+            tenants = {}
+            for tenant_id, stats in self._stats.items():
+                entry = self._entries.get(tenant_id)
+                lookups = stats['hits'] + stats['misses'] + stats['coalesced']
+                tenants[tenant_id] = {
+                    **stats,
+                    'load_seconds_total': round(stats['load_seconds_total'], 4),
+                    'load_seconds_avg': round(stats['load_seconds_total'] / stats['loads'], 4) if stats['loads'] else None,
+                    'hit_rate': round(stats['hits'] / lookups, 4) if lookups else 0.0,
+                    'resident': entry is not None and entry.serving is not None,
+                    'version': entry.serving.version if entry is not None and entry.serving is not None else None,
+                    'bytes': entry.nbytes if entry is not None else 0
+                }
+            return {
+                'resident': sum(1 for entry in self._entries.values() if entry.serving is not None),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'tenants': tenants
+            }
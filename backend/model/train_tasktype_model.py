@@ -2,71 +2,155 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
+import hashlib
+import json
+import logging
+import shutil
+import tempfile
+import time
+from io import BytesIO
+
 import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+from sklearn.model_selection import HalvingGridSearchCV, StratifiedKFold, train_test_split
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import classification_report, accuracy_score
 import joblib
-from backend.model.preprocess import clean_pipeline
+from backend.store.columnar_cache import load_cleaned
+from backend.store.segment_log import end_position, load_log, read_rows, segments_dir_for
+from backend.model.preprocess import (
+    clean_chunk,
+    clean_rows,
+    new_statistics,
+    RowHashSet,
+    parse_dates,
+    row_hashes,
+    task_mapping_for,
+    update_statistics
+)
+from backend.model.features import PIPELINE_FILENAME, FeaturePipeline, load_pipeline
+from backend.model.forest_runtime import FOREST_FILENAME, export_forest
+from backend.model import artifacts
+from backend.observability.log import configure_logging
+
+logger = logging.getLogger(__name__)
+
+# Default search space for search_tasktype_model
+SEARCH_PARAM_GRID = {
+    'n_estimators': [50, 100, 200],
+    'max_depth': [6, 10, None],
+    'min_samples_leaf': [1, 2, 4],
+    'max_features': ['sqrt', 0.5]
+}
+
+# Forest trained by train_tasktype_model
+FOREST_PARAMS = {'n_estimators': 100, 'random_state': 42, 'max_depth': 10}
+
+# Trained models are written as versions under backend/model/versions/
+MODEL_DIR = artifacts.MODEL_DIR
+
+# Default log to train on (backend/data)
+DATA_PATH = os.path.join(os.path.dirname(MODEL_DIR), 'data', 'productivity_log_may.csv')
+
+# Incremental training (update_tasktype_model): each update grows this many
+# trees on the most recent WINDOW_ROWS cleaned rows, and the oldest trees are
+# dropped beyond MAX_TREES, so an update costs the same however long the
+# log gets
+TREES_PER_UPDATE = 10
+MAX_TREES = 100
+WINDOW_ROWS = 5000
+TRAIN_STATE_FILENAME = 'train_state.pkl'
+# Hashes of every file row trained on (a RowHashSet), next to the state
+SEEN_DIRNAME = 'seen'
+
+# Bytes just before the watermark, hashed to tell a file that was appended
+# to from one that was rewritten
+TAIL_CHECK_BYTES = 4096
+
+def prepare_training_data(filepath):
+    """Cleaned log turned into the (X, y, mapping, features) the forest is fitted on"""
+    # Load the cleaned data (memory-mapped from the columnar cache when
+    # the source file is unchanged) plus the entries ingested through /log
+    df_cleaned, mapping, _ = load_log(filepath)
+    logger.info("Data loaded and cleaned successfully! Shape: %s", df_cleaned.shape)
+    logger.debug("Columns: %s", list(df_cleaned.columns))
+
+    X, y, features = build_features(df_cleaned)
+    logger.info("Features shape: %s, target shape: %s", X.shape, y.shape)
+    logger.debug("Target distribution:\n%s", y.value_counts())
+    return X, y, mapping, features
+
+def build_features(df_cleaned, features=None):
+    """Feature frame and TaskType target for cleaned rows.
+
+    Without `features` a new FeaturePipeline is fitted on the rows. Returns
+    (X, y, features); X wraps the pipeline's float32 matrix without copying.
+    """
+    if features is None:
+        features = FeaturePipeline()
+        X = features.fit_transform(df_cleaned)
+    else:
+        X = features.transform_frame(df_cleaned)
+    return features.frame(X), df_cleaned['TaskType'], features
+
+def _dump_atomic(obj, path):
+    """joblib.dump through a temporary file so readers never see a partial file"""
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    joblib.dump(obj, tmp_path)
+    os.replace(tmp_path, path)
+
+def save_model(model, mapping, version=None, publish=True, metadata=None, state=None,
+               model_dir=MODEL_DIR, features=None, seen=None):
+    """Write a new model version and (by default) publish it.
+
+    The pickle, compiled forest, task mapping, feature pipeline, optional
+    incremental training state (with its RowHashSet `seen`, which is moved
+    in) and a meta.json are written to a staging directory that is renamed
+    into versions/<version> in one step, so a version is either complete or
+    absent. Publishing then swaps the current.json pointer. With
+    publish=False the caller (the background training worker) publishes
+    after checking the new model. Returns the version id.
+    """
+    version = version or artifacts.new_version_id()
+    root = artifacts.versions_root(model_dir)
+    staging = os.path.join(root, f".tmp-{version}")
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
 
-def train_tasktype_model(filepath):
+    joblib.dump(model, os.path.join(staging, 'model.pkl'))
+    # Export the packed node arrays the server evaluates without sklearn
+    export_forest(model, os.path.join(staging, FOREST_FILENAME))
+    joblib.dump(mapping, os.path.join(staging, 'task_mapping.pkl'))
+    if features is not None:
+        features.save(os.path.join(staging, PIPELINE_FILENAME))
+    if state is not None:
+        joblib.dump(state, os.path.join(staging, TRAIN_STATE_FILENAME))
+    if seen is not None:
+        os.replace(seen.directory, os.path.join(staging, SEEN_DIRNAME))
+    with open(os.path.join(staging, 'meta.json'), 'w') as f:
+        json.dump({'version': version, 'created_at': time.time(), **(metadata or {})},
+                  f, indent=2, default=str)
+
+    directory = artifacts.version_dir(version, model_dir)
+    os.replace(staging, directory)
+    logger.info("Model version %s saved to %s", version, directory)
+
+    if publish:
+        artifacts.publish(version, model_dir)
+        artifacts.prune_versions(model_dir)
+        logger.info("Model version %s published", version)
+    return version
+
+def train_tasktype_model(filepath, version=None, publish=True, model_dir=MODEL_DIR):
     try:
-        # Load and clean the data
-        df_cleaned, mapping = clean_pipeline(filepath)
-        print("Data loaded and cleaned successfully!")
-        print(f"Data shape: {df_cleaned.shape}")
-        print(f"Columns: {list(df_cleaned.columns)}")
-
-        # Convert 'Time' column to datetime if it exists
-        if 'Time' in df_cleaned.columns:
-            df_cleaned['Time'] = pd.to_datetime(df_cleaned['Time'], errors='coerce')
-            df_cleaned['Hour'] = df_cleaned['Time'].apply(lambda x: x.hour if pd.notnull(x) else 14)
-        else:
-            # If Time column doesn't exist, create a default Hour column
-            df_cleaned['Hour'] = 14
-
-        # Convert 'Week(day/End)' to numeric: Weekday=0, Weekend=1
-        if 'Week(day/end)' in df_cleaned.columns:
-            df_cleaned['Week(day/end)'] = df_cleaned['Week(day/end)'].map({'Weekday': 0, 'Weekend': 1})
-            df_cleaned['Week(day/end)'] = df_cleaned['Week(day/end)'].fillna(0)
-
-        # Create DayOfWeek numeric encoding if it doesn't exist
-        if 'DayOfWeek' not in df_cleaned.columns:
-            df_cleaned['DayOfWeek'] = np.random.randint(0, 7, len(df_cleaned))
-
-        # Ensure all required columns exist with default values
-        required_columns = ['Mood', 'Hour', 'Week(day/end)', 'SleepHours', 'Distractions', 
-                          'ConfidenceScore', 'Completed', 'DayOfWeek']
-        
-        for col in required_columns:
-            if col not in df_cleaned.columns:
-                if col == 'Mood':
-                    df_cleaned[col] = np.random.randint(1, 11, len(df_cleaned))
-                elif col == 'SleepHours':
-                    df_cleaned[col] = np.random.randint(5, 11, len(df_cleaned))
-                elif col == 'Distractions':
-                    df_cleaned[col] = np.random.randint(0, 6, len(df_cleaned))
-                elif col == 'ConfidenceScore':
-                    df_cleaned[col] = np.random.randint(1, 11, len(df_cleaned))
-                elif col == 'Completed':
-                    df_cleaned[col] = np.random.randint(0, 2, len(df_cleaned))
-                else:
-                    df_cleaned[col] = 0
-
-        # Define features (inputs) and target (output)
-        X = df_cleaned[required_columns]
-        y = df_cleaned['TaskType']
-
-        print(f"Features shape: {X.shape}")
-        print(f"Target shape: {y.shape}")
-        print(f"Target distribution: {y.value_counts()}")
+        X, y, mapping, features = prepare_training_data(filepath)
 
         # Split data: 80% for training and 20% for testing
         X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
 
         # Initialize the Random Forest Classifier
-        model = RandomForestClassifier(n_estimators=100, random_state=42, max_depth=10)
+        model = RandomForestClassifier(**FOREST_PARAMS)
 
         # Train the model on the training data
         model.fit(X_train, y_train)
@@ -76,37 +160,329 @@ def train_tasktype_model(filepath):
 
         # Print overall accuracy of the model on test data
         accuracy = accuracy_score(y_test, y_pred)
-        print(f"Accuracy: {accuracy:.4f}")
+        logger.info("Accuracy: %.4f", accuracy)
 
-        # Print detailed classification report
-        print("Classification Report:")
-        print(classification_report(y_test, y_pred))
+        # Log detailed classification report
+        logger.info("Classification Report:\n%s", classification_report(y_test, y_pred))
 
         # Save the trained model
-        os.makedirs('model', exist_ok=True)
-        model_path = 'model/model.pkl'
-        joblib.dump(model, model_path)
-        print(f"Model saved to {model_path}")
+        save_model(model, mapping, version, publish,
+                   metadata={'mode': 'full', 'test_accuracy': round(float(accuracy), 4)},
+                   model_dir=model_dir, features=features)
+
+        return model, mapping
+
+    except Exception:
+        logger.exception("Error in training")
+        return None, None
+
+def search_tasktype_model(filepath, param_grid=None, cv=5, factor=3, n_jobs=-1,
+                          version=None, publish=True, model_dir=MODEL_DIR):
+    """Cross-validated successive-halving search over forest hyperparameters.
+
+    Every configuration starts on a small sample of the training split; only
+    the best 1/`factor` of them move on to the next round with `factor` times
+    more rows. Candidates and folds are fitted in parallel across all cores
+    (each forest itself uses one core). The feature matrix is built once and
+    shared by every fold. A per-configuration report (rounds reached, rows,
+    CV accuracy, fit/score seconds) is printed and stored in the version's
+    meta.json; the best configuration is refitted on the whole training split, scored
+    on the held-out 20% and saved like train_tasktype_model's model.
+    """
+    try:
+        X, y, mapping, features = prepare_training_data(filepath)
+        y = y.to_numpy()
+
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+
+        search = HalvingGridSearchCV(
+            RandomForestClassifier(random_state=42, n_jobs=1),
+            param_grid or SEARCH_PARAM_GRID,
+            cv=StratifiedKFold(n_splits=cv, shuffle=True, random_state=42),
+            factor=factor,
+            scoring='accuracy',
+            n_jobs=n_jobs,
+            random_state=42
+        )
+        start = time.perf_counter()
+        search.fit(X_train, y_train)
+        search_seconds = time.perf_counter() - start
+
+        results = search.cv_results_
+        configs = []
+        for i, params in enumerate(results['params']):
+            configs.append({
+                'params': params,
+                'round': int(results['iter'][i]),
+                'n_samples': int(results['n_resources'][i]),
+                'mean_accuracy': round(float(results['mean_test_score'][i]), 4),
+                'std_accuracy': round(float(results['std_test_score'][i]), 4),
+                'fit_seconds': round(float(results['mean_fit_time'][i]) * cv, 4),
+                'score_seconds': round(float(results['mean_score_time'][i]) * cv, 4)
+            })
+        # Keep only each configuration's last round, best first
+        latest = {}
+        for config in configs:
+            key = json.dumps(config['params'], sort_keys=True)
+            if key not in latest or config['round'] > latest[key]['round']:
+                latest[key] = config
+        ranked = sorted(latest.values(), key=lambda c: (-c['round'], -c['mean_accuracy']))
+
+        logger.info("Searched %d configurations in %.2fs (%d rounds)",
+                    len(ranked), search_seconds, search.n_iterations_)
+        for config in ranked:
+            logger.info("Configuration: round %d n=%d acc=%.4f±%.4f fit=%.2fs %s",
+                        config['round'], config['n_samples'], config['mean_accuracy'],
+                        config['std_accuracy'], config['fit_seconds'], config['params'])
 
-        # Save the mapping for reference
-        mapping_path = 'model/task_mapping.pkl'
-        joblib.dump(mapping, mapping_path)
-        print(f"Task mapping saved to {mapping_path}")
+        model = search.best_estimator_
+        accuracy = accuracy_score(y_test, model.predict(X_test))
+        logger.info("Best parameters: %s", search.best_params_)
+        logger.info("Accuracy: %.4f", accuracy)
 
+        report = {
+            'search_seconds': round(search_seconds, 4),
+            'rounds': int(search.n_iterations_),
+            'factor': factor,
+            'cv_folds': cv,
+            'best_params': search.best_params_,
+            'best_cv_accuracy': round(float(search.best_score_), 4),
+            'test_accuracy': round(float(accuracy), 4),
+            'configurations': ranked
+        }
+        save_model(model, mapping, version, publish,
+                   metadata={'mode': 'search', 'test_accuracy': report['test_accuracy'], 'search': report},
+                   model_dir=model_dir, features=features)
+        return model, mapping
+
+    except Exception:
+        logger.exception("Error in hyperparameter search")
+        return None, None
+
+def _tail_digest(f, offset):
+    start = max(0, offset - TAIL_CHECK_BYTES)
+    f.seek(start)
+    return hashlib.sha256(f.read(offset - start)).hexdigest()
+
+def _scratch_dir(model_dir):
+    """Private directory under versions/ for a hash set save_model will move into a version"""
+    root = artifacts.versions_root(model_dir)
+    os.makedirs(root, exist_ok=True)
+    return tempfile.mkdtemp(prefix='.tmp-seen-', dir=root)
+
+def _load_state(version, model_dir=MODEL_DIR):
+    if version is None:
+        return None
+    try:
+        return joblib.load(os.path.join(artifacts.version_dir(version, model_dir), TRAIN_STATE_FILENAME))
+    except (OSError, EOFError, ValueError):
+        return None
+
+def _save_state_in_place(state, version, model_dir=MODEL_DIR):
+    """Replace the state of an existing version (the model itself is unchanged)"""
+    path = os.path.join(artifacts.version_dir(version, model_dir), TRAIN_STATE_FILENAME)
+    _dump_atomic(state, path)
+
+def bootstrap_incremental_model(filepath, version=None, publish=True, model_dir=MODEL_DIR):
+    """Fit a MAX_TREES forest on the whole log and record the incremental state.
+
+    The log is the source file plus the entries ingested through /log
+    (backend/store/segment_log.py). The state, saved inside the model
+    version, holds the byte offset of the file's ingested rows (the
+    watermark) and a digest of the bytes just before it, the segment
+    position read up to, the running cleaning statistics and the training
+    window that later updates fit their new trees on; the hashes of every
+    file row kept (for de-duplication) sit next to it as a RowHashSet.
+    Keeping them with the model means a version that is never published
+    never advances the watermark.
+
+    The forest is fitted on the same rows a full fit gets (load_log); the
+    file is only parsed here for the statistics updates clean new rows with.
+    """
+    with open(filepath, 'rb') as f:
+        data = f.read()
+    offset = data.rfind(b'\n') + 1
+    raw = parse_dates(pd.read_csv(BytesIO(data[:offset])))
+    columns = list(raw.columns)
+    stats = update_statistics(new_statistics(), raw)
+
+    cleaned, mapping, segment_position = load_log(filepath)
+    source, _ = load_cleaned(filepath)
+    if cleaned is None or source is None:
+        raise ValueError(f"Could not clean data file {filepath}")
+    if os.path.getsize(filepath) != len(data):
+        raise ValueError(f"{filepath} changed while the model was being bootstrapped")
+    X, y, features = build_features(cleaned)
+    logger.info("Bootstrapping incremental model on %d rows", len(X))
+
+    model = RandomForestClassifier(n_estimators=MAX_TREES, random_state=42, max_depth=10)
+    model.fit(X, y)
+
+    with open(filepath, 'rb') as f:
+        tail_digest = _tail_digest(f, offset)
+    state = {
+        'source': os.path.abspath(filepath),
+        'columns': columns,
+        'offset': offset,
+        'tail_digest': tail_digest,
+        'segment_position': segment_position,
+        'segment_rows': len(cleaned) - len(source),
+        'stats': stats,
+        'mapping': mapping,
+        'window_X': X.iloc[-WINDOW_ROWS:].reset_index(drop=True),
+        'window_y': y.iloc[-WINDOW_ROWS:].reset_index(drop=True),
+        'features': features,
+        'updates': 0
+    }
+    # Later file rows repeating one the forest was fitted on are dropped
+    seen = RowHashSet(_scratch_dir(model_dir))
+    try:
+        seen.add(row_hashes(source, columns))
+        save_model(model, mapping, version, publish, metadata={'mode': 'bootstrap', 'rows': len(X)}, state=state,
+                   model_dir=model_dir, features=features, seen=seen)
+    finally:
+        shutil.rmtree(seen.directory, ignore_errors=True)
+    return model, mapping
+
+def update_tasktype_model(filepath, version=None, publish=True, model_dir=MODEL_DIR):
+    """Fold rows appended to the log since the last run into the model.
+
+    Starts from the published version and its training state. Only the
+    bytes past the watermark are parsed and cleaned (with the running
+    statistics of everything before them), along with the entries logged to
+    the segments since the recorded position. The forest is grown by
+    TREES_PER_UPDATE warm-started trees fitted on the training window, the
+    oldest trees beyond MAX_TREES are dropped and the result is saved as a
+    new version carrying the advanced watermark. Falls back to
+    bootstrap_incremental_model when there is no state yet, the file was
+    rewritten rather than appended to, the segments were reset or the set
+    of task types changed.
+    """
+    seen = None
+    try:
+        base_version = artifacts.current_version(model_dir)
+        state = _load_state(base_version, model_dir)
+        seen_dir = os.path.join(artifacts.version_dir(base_version, model_dir), SEEN_DIRNAME) if base_version else None
+        if state is None or state['source'] != os.path.abspath(filepath) or not os.path.isdir(seen_dir):
+            logger.info("No incremental training state; running a full fit")
+            return bootstrap_incremental_model(filepath, version, publish, model_dir)
+
+        offset = state['offset']
+        with open(filepath, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < offset or _tail_digest(f, offset) != state['tail_digest']:
+                logger.info("Data file was rewritten; running a full fit")
+                return bootstrap_incremental_model(filepath, version, publish, model_dir)
+            f.seek(offset)
+            tail = f.read(size - offset)
+
+        complete = tail.rfind(b'\n') + 1
+        segments = segments_dir_for(filepath)
+        since = state.get('segment_position')
+        position = end_position(segments)
+        if since is not None and position is not None and position < since:
+            logger.info("Ingestion segments were reset; running a full fit")
+            return bootstrap_incremental_model(filepath, version, publish, model_dir)
+        rows, segment_position = read_rows(segments, since)
+
+        mapping = state['mapping']
+        model_path = os.path.join(artifacts.version_dir(base_version, model_dir), 'model.pkl')
+        if complete == 0 and not len(rows):
+            logger.info("No new rows since the last update")
+            return joblib.load(model_path), mapping
+
+        # Hard-linked copy: the base version's set stays as it is
+        seen = RowHashSet(seen_dir).copy(_scratch_dir(model_dir))
+        stats = state['stats']
+        parts = []
+        if complete:
+            raw = pd.read_csv(BytesIO(tail[:complete]), header=None, names=state['columns'])
+            raw = parse_dates(raw)
+            stats = update_statistics(stats, raw)
+            if task_mapping_for(stats) != mapping:
+                logger.info("New task types in the log; running a full fit")
+                return bootstrap_incremental_model(filepath, version, publish, model_dir)
+
+            cleaned = clean_chunk(raw, stats, mapping)
+            new = seen.add(row_hashes(cleaned, state['columns']))
+            cleaned = cleaned[new]
+            logger.info("Ingesting %d new rows (%d duplicates dropped)", len(cleaned), int((~new).sum()))
+            parts.append(cleaned)
+
+            with open(filepath, 'rb') as f:
+                state['tail_digest'] = _tail_digest(f, offset + complete)
+            state['offset'] = offset + complete
+            state['stats'] = stats
+        if len(rows):
+            ingested = clean_rows(rows, mapping)
+            logger.info("Ingesting %d logged entries", len(ingested))
+            parts.append(ingested)
+            state['segment_rows'] = state.get('segment_rows', 0) + len(ingested)
+        state['segment_position'] = segment_position
+        state['updates'] += 1
+        cleaned = pd.concat(parts, ignore_index=True)
+
+        model = joblib.load(model_path)
+        if not len(cleaned):
+            # Only duplicates: the model (and the hash set) stay as they are,
+            # the watermark moves on
+            _save_state_in_place(state, base_version, model_dir)
+            return model, mapping
+
+        # Updates keep the pipeline the bootstrap fitted
+        features = state.get('features') or load_pipeline(artifacts.version_dir(base_version, model_dir))
+        X_new, y_new, _ = build_features(cleaned, features)
+        window_X = pd.concat([state['window_X'], X_new], ignore_index=True).iloc[-WINDOW_ROWS:]
+        window_y = pd.concat([state['window_y'], y_new], ignore_index=True).iloc[-WINDOW_ROWS:]
+        # warm_start needs every class in the fit so the new trees line
+        # up with the existing ones
+        if set(np.unique(window_y)) != set(model.classes_):
+            logger.info("Training window does not cover every task type; running a full fit")
+            return bootstrap_incremental_model(filepath, version, publish, model_dir)
+
+        start = time.perf_counter()
+        model.set_params(
+            warm_start=True,
+            n_estimators=len(model.estimators_) + TREES_PER_UPDATE,
+            # A fresh seed per update, or trimmed forests would reuse tree seeds
+            random_state=stats['rows'] + state.get('segment_rows', 0)
+        )
+        model.fit(window_X, window_y)
+        model.estimators_ = model.estimators_[-MAX_TREES:]
+        model.set_params(n_estimators=len(model.estimators_), warm_start=False)
+        logger.info("Grew %d trees on %d rows in %.2fs",
+                    TREES_PER_UPDATE, len(window_X), time.perf_counter() - start)
+
+        state['window_X'] = window_X.reset_index(drop=True)
+        state['window_y'] = window_y.reset_index(drop=True)
+        save_model(model, mapping, version, publish, state=state, model_dir=model_dir, features=features, seen=seen,
+                   metadata={'mode': 'incremental', 'base_version': base_version, 'new_rows': len(cleaned)})
         return model, mapping
 
-    except Exception as e:
-        print(f"Error in training: {e}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        logger.exception("Error in incremental training")
         return None, None
+    finally:
+        if seen is not None:
+            shutil.rmtree(seen.directory, ignore_errors=True)
 
 if __name__ == "__main__":
+    configure_logging(fmt='text')
+
+    # Re-export the compiled forest for an already trained model
+    if '--export' in sys.argv:
+        version = artifacts.current_version(MODEL_DIR) or artifacts.LEGACY_VERSION
+        directory = artifacts.version_dir(version, MODEL_DIR)
+        forest_path = os.path.join(directory, FOREST_FILENAME)
+        export_forest(joblib.load(os.path.join(directory, 'model.pkl')), forest_path)
+        logger.info("Compiled forest saved to %s", forest_path)
+        sys.exit(0)
+
     # Create sample data if the file doesn't exist
-    data_path = "data/productivity_log_may.csv"
+    data_path = DATA_PATH
     if not os.path.exists(data_path):
-        print("Creating sample data...")
-        os.makedirs('data', exist_ok=True)
+        logger.info("Creating sample data...")
+        os.makedirs(os.path.dirname(data_path), exist_ok=True)
         
         # Create sample dataset
         np.random.seed(42)
@@ -125,10 +501,17 @@ if __name__ == "__main__":
         
         df = pd.DataFrame(sample_data)
         df.to_csv(data_path, index=False)
-        print(f"Sample data created at {data_path}")
+        logger.info("Sample data created at %s", data_path)
     
-    model, mapping = train_tasktype_model(data_path)
+    # --search runs the cross-validated hyperparameter search instead
+    if '--search' in sys.argv:
+        model, mapping = search_tasktype_model(data_path)
+    # --update folds rows appended since the last run into the model
+    elif '--update' in sys.argv:
+        model, mapping = update_tasktype_model(data_path)
+    else:
+        model, mapping = train_tasktype_model(data_path)
     if model:
-        print("Model training completed successfully!")
+        logger.info("Model training completed successfully!")
     else:
-        print("Model training failed!")
+        logger.error("Model training failed!")
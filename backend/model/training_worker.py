@@ -0,0 +1,239 @@
+import logging
+import multiprocessing
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from backend.model import artifacts
+
+logger = logging.getLogger(__name__)
+
+# Training modes accepted by TrainingWorker.submit
+TRAINING_MODES = ('full', 'incremental', 'search')
+
+# Added to the training process's niceness so request handling keeps priority
+TRAINING_NICENESS = 10
+
+def _lower_priority():
+    """Pool initializer: run training below the serving process"""
+    try:
+        os.nice(TRAINING_NICENESS)
+    except OSError:
+        pass
+
+def _train(mode, data_path, version, model_dir):
+    """Runs inside the training process; saves `version` without publishing it"""
+    from backend.model import train_tasktype_model as training
+
+    train = {
+        'full': training.train_tasktype_model,
+        'incremental': training.update_tasktype_model,
+        'search': training.search_tasktype_model
+    }[mode]
+    started_at = time.time()
+    model, _ = train(data_path, version=version, publish=False, model_dir=model_dir)
+    if model is None:
+        raise RuntimeError(f"{mode} training failed; see the training log")
+    return {'started_at': started_at, 'finished_at': time.time(), 'pid': os.getpid()}
+
+class ModelSlot:
+    """Holds the ServingModel requests predict with.
+
+    Requests call `get()` once and use that snapshot throughout, so a swap
+    never mixes two versions within a request and never blocks one.
+    """
+
+    def __init__(self, serving=None):
+        self._serving = serving
+        self._lock = threading.Lock()
+        self._listeners = []
+        self.swaps = 0
+
+    def get(self):
+        return self._serving
+
+    def add_listener(self, callback):
+        """Call `callback(serving)` after every swap"""
+        self._listeners.append(callback)
+
+    def swap(self, serving):
+        with self._lock:
+            previous, self._serving = self._serving, serving
+            if previous is not None:
+                self.swaps += 1
+        for callback in self._listeners:
+            callback(serving)
+        return previous
+
+class TrainingJob:
+    """State of one background training run"""
+
+    def __init__(self, mode):
+        self.job_id = uuid.uuid4().hex
+        self.mode = mode
+        self.version = artifacts.new_version_id()
+        self.status = 'queued'
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.published = False
+        self.message = None
+        self.error = None
+
+    def to_dict(self):
+        info = {
+            'job_id': self.job_id,
+            'mode': self.mode,
+            'status': self.status,
+            'version': self.version,
+            'published': self.published,
+            'submitted_at': self.submitted_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at
+        }
+        if self.message:
+            info['message'] = self.message
+        if self.error:
+            info['error'] = self.error
+        return info
+
+    @classmethod
+    def from_record(cls, info):
+        job = cls(info['mode'])
+        for key in ('job_id', 'status', 'version', 'published', 'submitted_at', 'started_at', 'finished_at'):
+            setattr(job, key, info[key])
+        job.message = info.get('message')
+        job.error = info.get('error')
+        return job
+
+class TrainingWorker:
+    """Trains models in a background process and hot-swaps the result.
+
+    Each job runs in its own low-priority process, so the fit neither holds
+    the serving process's GIL nor keeps its memory after it finishes. The
+    process writes an unpublished version; back in the server the version is
+    loaded and must pass the smoke prediction before it is published and
+    swapped into the ModelSlot. A version that fails is deleted and the live
+    model is left in place. One job runs at a time; submitting while one is
+    queued or running returns that job. With `records` (a JobRecords), job
+    status is also written to disk for other server processes.
+    """
+
+    def __init__(self, data_path, slot, model_dir=artifacts.MODEL_DIR, runtime='compiled', max_jobs=100,
+                 records=None):
+        self.data_path = data_path
+        self.slot = slot
+        self.model_dir = model_dir
+        self.runtime = runtime
+        self.max_jobs = max_jobs
+        self.records = records
+        self._jobs = OrderedDict()  # job_id -> TrainingJob, oldest first
+        self._active = None
+        self._lock = threading.Lock()
+        self.completed = 0
+        self.failed = 0
+        self.rolled_back = 0
+
+    def submit(self, mode='full'):
+        """Start a training job, or return the active one. Returns (job, coalesced)."""
+        if mode not in TRAINING_MODES:
+            raise ValueError(f"Unknown training mode '{mode}'. Options: {', '.join(TRAINING_MODES)}")
+        with self._lock:
+            if self._active is not None:
+                return self._active, True
+            job = TrainingJob(mode)
+            self._active = job
+            self._jobs[job.job_id] = job
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+        self._record(job)
+        threading.Thread(target=self._run, args=(job,), name=f"training-{job.job_id[:8]}", daemon=True).start()
+        return job, False
+
+    def _run(self, job):
+        directory = artifacts.version_dir(job.version, self.model_dir)
+        try:
+            job.status = 'running'
+            self._record(job)
+            executor = ProcessPoolExecutor(
+                max_workers=1,
+                mp_context=multiprocessing.get_context('fork'),
+                initializer=_lower_priority
+            )
+            try:
+                timing = executor.submit(_train, job.mode, self.data_path, job.version, self.model_dir).result()
+            finally:
+                executor.shutdown(wait=True)
+            job.started_at = timing['started_at']
+
+            if not os.path.isdir(directory):
+                # Incremental run with nothing new to learn
+                job.message = 'No new rows; the live model is unchanged'
+                job.status = 'done'
+                with self._lock:
+                    self.completed += 1
+                return
+
+            try:
+                serving = artifacts.load_version(job.version, self.model_dir, self.runtime)
+                artifacts.smoke_test(serving)
+            except Exception as e:
+                logger.error("Model version %s failed its smoke prediction: %s", job.version, e)
+                shutil.rmtree(directory, ignore_errors=True)
+                job.error = f"Smoke prediction failed: {e}"
+                job.message = 'Rolled back; the live model is unchanged'
+                job.status = 'rolled_back'
+                with self._lock:
+                    self.rolled_back += 1
+                return
+
+            artifacts.publish(job.version, self.model_dir)
+            self.slot.swap(serving)
+            artifacts.prune_versions(self.model_dir)
+            job.published = True
+            job.status = 'done'
+            logger.info("Model version %s published and swapped in", job.version)
+            with self._lock:
+                self.completed += 1
+        except Exception as e:
+            logger.exception("Training job %s failed", job.job_id)
+            shutil.rmtree(directory, ignore_errors=True)
+            job.error = str(e)
+            job.status = 'failed'
+            with self._lock:
+                self.failed += 1
+        finally:
+            job.finished_at = time.time()
+            with self._lock:
+                if self._active is job:
+                    self._active = None
+            self._record(job)
+
+    def _record(self, job):
+        if self.records is not None:
+            self.records.save(job.to_dict())
+
+    def get(self, job_id):
+        """A job by id; jobs accepted by other processes come from the records"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None and self.records is not None:
+            info = self.records.load(job_id)
+            if info is not None:
+                job = TrainingJob.from_record(info)
+        return job
+
+    def stats(self):
+        with self._lock:
+            active = self._active
+            return {
+                'active_job': active.job_id if active is not None else None,
+                'completed': self.completed,
+                'failed': self.failed,
+                'rolled_back': self.rolled_back,
+                'swaps': self.slot.swaps
+            }
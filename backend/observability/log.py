@@ -0,0 +1,105 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+
+# Attributes every LogRecord has; anything else was passed through `extra`
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+_listener = None
+_lock = threading.Lock()
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, extra fields.
+
+    Fields passed with `extra={...}` become top-level keys, so
+    logger.info("Prediction served", extra={'prediction': 3}) logs
+    {"ts": ..., "level": "INFO", "logger": "backend.app",
+     "msg": "Prediction served", "prediction": 3}.
+    """
+
+    def format(self, record):
+        entry = {
+            'ts': round(record.created, 6),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(record.created)),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+            'pid': record.process
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class TextFormatter(logging.Formatter):
+    """Human-readable lines for local development, extra fields appended"""
+
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)-7s %(name)s: %(message)s')
+
+    def format(self, record):
+        line = super().format(record)
+        extra = {key: value for key, value in vars(record).items()
+                 if key not in _RECORD_ATTRIBUTES and not key.startswith('_')}
+        if extra:
+            line += ' ' + ' '.join(f"{key}={value}" for key, value in extra.items())
+        return line
+
+def _start_listener(formatter):
+    """Route the root logger through a queue drained by a background thread"""
+    global _listener
+    log_queue = queue.SimpleQueue()
+    stream = logging.StreamHandler(sys.stderr)
+    stream.setFormatter(formatter)
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    _listener = logging.handlers.QueueListener(log_queue, stream, respect_handler_level=False)
+    _listener.start()
+
+def _direct_after_fork():
+    # The listener thread does not survive fork, and worker processes may exit
+    # without running atexit hooks, so forked children write synchronously
+    if _listener is None:
+        return
+    stream = logging.StreamHandler(sys.stderr)
+    stream.setFormatter(_listener.handlers[0].formatter)
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(stream)
+
+def _stop_listener():
+    if _listener is not None:
+        _listener.stop()
+
+def configure_logging(level=None, fmt=None):
+    """Set up backend logging once per process.
+
+    LOG_LEVEL (default INFO) and LOG_FORMAT ('json', the default, or 'text')
+    pick the level and line format. Records are handed to a QueueHandler,
+    so the calling thread never waits on stderr; a QueueListener thread
+    formats and writes them. Forked workers log directly to stderr.
+
+    This replaces the root logger's handlers, so only entry points call it
+    (serve.py, asgi.py and the scripts run with `python -m`); importing
+    backend.app leaves an embedding host's logging alone.
+    """
+    with _lock:
+        level = level or os.environ.get('LOG_LEVEL', 'INFO')
+        fmt = fmt or os.environ.get('LOG_FORMAT', 'json')
+        logging.getLogger().setLevel(level.upper() if isinstance(level, str) else level)
+        if _listener is not None:
+            return
+        _start_listener(JsonFormatter() if fmt == 'json' else TextFormatter())
+        os.register_at_fork(after_in_child=_direct_after_fork)
+        atexit.register(_stop_listener)
@@ -0,0 +1,303 @@
+import bisect
+import contextvars
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Upper bounds, in seconds, of the request and stage latency buckets
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Upper bounds, in bytes, of the request/response body size buckets
+SIZE_BUCKETS = (128, 512, 2048, 8192, 32768, 131072, 524288, 2097152, 8388608)
+
+# Quantiles reported for every histogram series, over its recent observations
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Observations kept per histogram series for the quantiles
+WINDOW_SIZE = 1024
+
+# Request header that asks for a per-stage breakdown (Server-Timing) of the response
+PROFILE_HEADER = 'X-Profile'
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+def _format_value(value):
+    if isinstance(value, int):
+        return str(value)
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value))
+
+def _quantile(ordered, q):
+    index = min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))
+    return ordered[index]
+
+class Counter:
+    """Monotonic count per label set"""
+
+    kind = 'counter'
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(_label_key(labels), 0)
+
+    def expose(self):
+        with self._lock:
+            values = list(self._values.items())
+        return [f"{self.name}{_format_labels(key)} {_format_value(value)}" for key, value in values]
+
+class Gauge(Counter):
+    """Value that goes up and down, e.g. requests in flight"""
+
+    kind = 'gauge'
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+class Histogram:
+    """Bucketed distribution per label set, plus quantiles of recent values.
+
+    The buckets are cumulative over the process lifetime, as Prometheus
+    expects; p50/p95/p99 are computed at scrape time from the last
+    WINDOW_SIZE observations of each series and exposed as the gauge
+    `<name>_quantile`.
+    """
+
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self._series = {}  # label key -> [bucket counts, sum, count, recent values]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0, deque(maxlen=WINDOW_SIZE)]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+            series[3].append(value)
+
+    def snapshot(self, **labels):
+        """count, sum and quantiles of one series, or None if it has no observations"""
+        with self._lock:
+            series = self._series.get(_label_key(labels))
+            if series is None:
+                return None
+            recent = sorted(series[3])
+            info = {'count': series[2], 'sum': series[1]}
+        for q in QUANTILES:
+            info[f"p{int(q * 100)}"] = _quantile(recent, q)
+        return info
+
+    def expose(self):
+        with self._lock:
+            series = [(key, list(s[0]), s[1], s[2], sorted(s[3])) for key, s in self._series.items()]
+        lines = []
+        for key, counts, total, count, _ in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_format_labels(key, [('le', _format_value(float(bound)))])} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        if series:
+            lines.append(f"# HELP {self.name}_quantile {self.help} (last {WINDOW_SIZE} observations)")
+            lines.append(f"# TYPE {self.name}_quantile gauge")
+            for key, _, _, _, recent in series:
+                for q in QUANTILES:
+                    labels = _format_labels(key, [('quantile', str(q))])
+                    lines.append(f"{self.name}_quantile{labels} {_format_value(_quantile(recent, q))}")
+        return lines
+
+class MetricsRegistry:
+    """Named metrics plus collector callbacks, rendered in Prometheus text format"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help_text):
+        return self._register(Counter(name, help_text))
+
+    def gauge(self, name, help_text):
+        return self._register(Gauge(name, help_text))
+
+    def histogram(self, name, help_text, buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, help_text, buckets))
+
+    def add_collector(self, collect):
+        """Register `collect()`, called on every scrape.
+
+        It returns (name, kind, help, value) tuples for values other
+        components already track, such as cache hit counts.
+        """
+        self._collectors.append(collect)
+
+    def expose(self):
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.expose())
+        for collect in self._collectors:
+            for name, kind, help_text, value in collect():
+                if value is None:
+                    continue
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                lines.append(f"{name} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+REGISTRY = MetricsRegistry()
+
+REQUESTS = REGISTRY.counter('http_requests_total', 'HTTP requests by endpoint, method and status')
+IN_FLIGHT = REGISTRY.gauge('http_requests_in_flight', 'HTTP requests being handled')
+REQUEST_SECONDS = REGISTRY.histogram('http_request_duration_seconds', 'Time to handle a request')
+STAGE_SECONDS = REGISTRY.histogram('http_request_stage_seconds', 'Time spent in each stage of a request')
+REQUEST_BYTES = REGISTRY.histogram('http_request_size_bytes', 'Request body size', SIZE_BUCKETS)
+RESPONSE_BYTES = REGISTRY.histogram('http_response_size_bytes', 'Response body size', SIZE_BUCKETS)
+
+_current = contextvars.ContextVar('request_profile', default=None)
+
+class RequestProfile:
+    """Stage timings of the request being handled.
+
+    Stage times are exclusive: a stage nested inside another (aggregation
+    inside a render) is subtracted from the outer one, so the stages of a
+    request add up to no more than its total time.
+    """
+
+    def __init__(self, endpoint, breakdown=False):
+        self.endpoint = endpoint
+        self.started = time.perf_counter()
+        self.stages = {} if breakdown else None
+        self._nested = [0.0]
+
+    def enter(self):
+        self._nested.append(0.0)
+        return time.perf_counter()
+
+    def exit(self, name, started):
+        elapsed = time.perf_counter() - started
+        own = elapsed - self._nested.pop()
+        self._nested[-1] += elapsed
+        STAGE_SECONDS.observe(own, endpoint=self.endpoint, stage=name)
+        if self.stages is not None:
+            self.stages[name] = self.stages.get(name, 0.0) + own
+
+    def server_timing(self):
+        """Server-Timing header value, durations in milliseconds"""
+        parts = [f"{name};dur={seconds * 1000:.3f}" for name, seconds in self.stages.items()]
+        parts.append(f"total;dur={(time.perf_counter() - self.started) * 1000:.3f}")
+        return ', '.join(parts)
+
+@contextmanager
+def stage(name):
+    """Time a block as stage `name` of the current request; a no-op outside one"""
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    started = profile.enter()
+    try:
+        yield
+    finally:
+        profile.exit(name, started)
+
+def instrument_app(app, registry=REGISTRY):
+    """Record request metrics for every Flask request and serve them on /metrics.
+
+    Requests sending `X-Profile: 1` get a Server-Timing header with the
+    time of each stage in milliseconds.
+    """
+    from flask import Response, g, request
+
+    def endpoint_label():
+        # The route pattern, so job ids don't create a series per request
+        return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+    @app.before_request
+    def start_request():
+        endpoint = endpoint_label()
+        profile = RequestProfile(endpoint, breakdown=request.headers.get(PROFILE_HEADER) == '1')
+        g.metrics_token = _current.set(profile)
+        IN_FLIGHT.inc(endpoint=endpoint)
+        if request.content_length:
+            REQUEST_BYTES.observe(request.content_length, endpoint=endpoint)
+
+    @app.after_request
+    def finish_request(response):
+        profile = _current.get()
+        if profile is None:
+            return response
+        REQUESTS.inc(endpoint=profile.endpoint, method=request.method, status=str(response.status_code))
+        REQUEST_SECONDS.observe(time.perf_counter() - profile.started, endpoint=profile.endpoint)
+        if response.content_length is not None:
+            RESPONSE_BYTES.observe(response.content_length, endpoint=profile.endpoint)
+        if profile.stages is not None:
+            response.headers['Server-Timing'] = profile.server_timing()
+        g.metrics_counted = True
+        return response
+
+    @app.teardown_request
+    def end_request(error=None):
+        token = g.pop('metrics_token', None)
+        if token is None:
+            return
+        profile = _current.get()
+        if not g.pop('metrics_counted', False):
+            # after_request is skipped when the view raised
+            REQUESTS.inc(endpoint=profile.endpoint, method=request.method, status='500')
+            REQUEST_SECONDS.observe(time.perf_counter() - profile.started, endpoint=profile.endpoint)
+        IN_FLIGHT.dec(endpoint=profile.endpoint)
+        _current.reset(token)
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        return Response(registry.expose(), mimetype='text/plain; version=0.0.4')
+
+    return registry
@@ -0,0 +1,311 @@
+"""Production server: preforked Werkzeug workers sharing one listening socket.
+
+    python -m backend.serve [--host 0.0.0.0] [--port 5000] [--workers N]
+
+The parent process imports the app and runs its warm-up (model, dataset,
+plotting stack) before forking, so every worker starts with them already in
+memory and shares the pages copy-on-write. Each worker is a threaded
+Werkzeug server accepting from the same socket, which spreads /predict over
+all cores.
+
+The parent replaces workers that die and restarts them one at a time
+(reloading the model first) when a new model version is published or on
+SIGHUP. SIGTERM/SIGINT stop accepting connections and let in-flight
+requests finish for up to --graceful-timeout seconds. A worker retires
+itself after --max-requests requests (0 = never). Each worker handles at
+most --max-concurrency requests at once and answers the rest with 503 and
+Retry-After.
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import gc
+import json
+import logging
+import random
+import signal
+import socket
+import threading
+import time
+
+from backend.observability.log import configure_logging
+
+logger = logging.getLogger(__name__)
+
+# Seconds between checks of the published model version
+MODEL_POLL_SECONDS = 5
+
+# Retry-After sent with 503s from the concurrency limit
+BUSY_RETRY_AFTER = 1
+
+class ConcurrencyLimiter:
+    """WSGI middleware capping the requests a worker handles at once.
+
+    Requests over `limit` get an immediate 503 with Retry-After instead of
+    queueing behind slow ones. Health probes always pass. `on_finished` is
+    called after every response has been sent.
+    """
+
+    def __init__(self, app, limit, on_finished=None):
+        self.app = app
+        self.limit = limit
+        self.on_finished = on_finished
+        self._slots = threading.BoundedSemaphore(limit)
+        self._lock = threading.Lock()
+        self.active = 0
+        self.rejected = 0
+
+    def _busy(self, start_response):
+        with self._lock:
+            self.rejected += 1
+        body = json.dumps({'error': 'Server is busy. Retry shortly.'}).encode('utf-8')
+        start_response('503 Service Unavailable', [
+            ('Content-Type', 'application/json'),
+            ('Content-Length', str(len(body))),
+            ('Retry-After', str(BUSY_RETRY_AFTER))
+        ])
+        return [body]
+
+    def __call__(self, environ, start_response):
+        limited = not environ.get('PATH_INFO', '').startswith('/health')
+        if limited and not self._slots.acquire(blocking=False):
+            return self._busy(start_response)
+        with self._lock:
+            self.active += 1
+        try:
+            body = self.app(environ, start_response)
+        except BaseException:
+            self._release(limited)
+            raise
+        return _ClosingBody(body, lambda: self._release(limited))
+
+    def _release(self, limited):
+        with self._lock:
+            self.active -= 1
+        if limited:
+            self._slots.release()
+        if self.on_finished is not None:
+            self.on_finished()
+
+class _ClosingBody:
+    """Response iterable that runs `on_close` once the server has sent it"""
+
+    def __init__(self, body, on_close):
+        self.body = body
+        self.on_close = on_close
+
+    def __iter__(self):
+        return iter(self.body)
+
+    def close(self):
+        try:
+            close = getattr(self.body, 'close', None)
+            if close is not None:
+                close()
+        finally:
+            self.on_close()
+
+def _worker_main(api, listener, options):
+    """Serve from a forked worker until told to stop; never returns"""
+    from werkzeug.serving import make_server
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # the parent coordinates shutdown
+    signal.signal(signal.SIGHUP, signal.SIG_DFL)
+    random.seed()
+
+    stopping = threading.Event()
+    served = [0]
+    # Spread recycling so the workers don't all restart together
+    max_requests = options.max_requests
+    if max_requests:
+        max_requests += random.randint(0, max(1, max_requests // 10))
+
+    def stop():
+        if not stopping.is_set():
+            stopping.set()
+            threading.Thread(target=server.shutdown, daemon=True).start()
+
+    def finished():
+        served[0] += 1
+        if max_requests and served[0] >= max_requests:
+            logger.info("Worker recycling after %d requests", served[0])
+            stop()
+
+    limiter = ConcurrencyLimiter(api.app, options.max_concurrency, on_finished=finished)
+    server = make_server(options.host, options.port, limiter, threaded=True, fd=listener.fileno())
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop())
+
+    logger.info("Worker started")
+    server.serve_forever()
+
+    # Stopped accepting; let requests in flight finish
+    deadline = time.monotonic() + options.graceful_timeout
+    while limiter.active and time.monotonic() < deadline:
+        time.sleep(0.05)
+    if limiter.active:
+        logger.warning("Worker exiting with %d requests still in flight", limiter.active)
+    # Waits for the render processes to exit so none is left orphaned
+    api.render_queue.shutdown(wait=True)
+    logger.info("Worker stopped", extra={'requests': served[0]})
+    os._exit(0)
+
+class Arbiter:
+    """Forks and supervises the worker processes"""
+
+    def __init__(self, api, listener, options):
+        self.api = api
+        self.listener = listener
+        self.options = options
+        self.workers = {}  # pid -> generation
+        self.generation = 0
+        self.retiring = None
+        self.stopping = False
+        self.reload_requested = False
+        self._next_poll = time.monotonic() + MODEL_POLL_SECONDS
+
+    def spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                _worker_main(self.api, self.listener, self.options)
+            except BaseException:
+                logger.exception("Worker crashed")
+            finally:
+                os._exit(1)
+        self.workers[pid] = self.generation
+        return pid
+
+    def _on_signal(self, signum, frame):
+        if signum == signal.SIGHUP:
+            self.reload_requested = True
+        else:
+            self.stopping = True
+
+    def _reap(self):
+        while self.workers:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            if pid not in self.workers:
+                continue  # a training or render process of our own, if any
+            del self.workers[pid]
+            if pid == self.retiring:
+                self.retiring = None
+            code = os.waitstatus_to_exitcode(status)
+            if code != 0 and not self.stopping:
+                logger.warning("Worker %d exited with status %d", pid, code)
+
+    def _model_changed(self):
+        if time.monotonic() < self._next_poll:
+            return False
+        self._next_poll = time.monotonic() + MODEL_POLL_SECONDS
+        from backend.model import artifacts
+
+        published = artifacts.current_version(self.api.MODEL_DIR)
+        serving = self.api.model_slot.get()
+        return published is not None and (serving is None or serving.version != published)
+
+    def reload(self):
+        """Reload the model and data in the parent, then roll the workers onto it"""
+        from backend.model.artifacts import load_serving
+
+        serving = load_serving(self.api.MODEL_DIR, self.api.MODEL_RUNTIME)
+        if serving is not None:
+            self.api.model_slot.swap(serving)
+            self.api.prediction_cache.wait()
+        if os.path.exists(self.api.DATA_PATH):
+            self.api.dataset_store.get()
+        gc.freeze()
+        self.generation += 1
+        logger.info("Restarting workers", extra={
+            'generation': self.generation,
+            'model_version': serving.version if serving is not None else None
+        })
+
+    def _roll(self):
+        """Retire one worker from an older generation at a time"""
+        if self.retiring is not None:
+            return
+        stale = [pid for pid, generation in self.workers.items() if generation < self.generation]
+        if stale:
+            self.retiring = stale[0]
+            os.kill(stale[0], signal.SIGTERM)
+
+    def run(self):
+        for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+            signal.signal(signum, self._on_signal)
+        logger.info("Serving", extra={
+            'host': self.options.host, 'port': self.options.port, 'workers': self.options.workers})
+
+        while not self.stopping:
+            self._reap()
+            if self.reload_requested or self._model_changed():
+                self.reload_requested = False
+                self.reload()
+            active = len(self.workers) - (1 if self.retiring in self.workers else 0)
+            for _ in range(self.options.workers - active):
+                self.spawn()
+            self._roll()
+            time.sleep(0.1)
+        self.shutdown()
+
+    def shutdown(self):
+        logger.info("Shutting down", extra={'workers': len(self.workers)})
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.monotonic() + self.options.graceful_timeout + 1
+        while self.workers and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.05)
+        for pid in list(self.workers):
+            logger.warning("Killing worker %d after the graceful timeout", pid)
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        self._reap()
+        self.listener.close()
+
+def _listen(host, port, backlog=2048):
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    return socket.create_server((host, port), family=family, backlog=backlog)
+
+def main(argv=None):
+    cpus = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default=os.environ.get('HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', 5000)))
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('WEB_CONCURRENCY', cpus)))
+    parser.add_argument('--max-requests', type=int, default=int(os.environ.get('MAX_REQUESTS', 0)),
+                        help='recycle a worker after this many requests (0 = never)')
+    parser.add_argument('--max-concurrency', type=int, default=int(os.environ.get('MAX_CONCURRENCY', 32)),
+                        help='requests handled at once per worker before answering 503')
+    parser.add_argument('--graceful-timeout', type=float, default=float(os.environ.get('GRACEFUL_TIMEOUT', 30)))
+    options = parser.parse_args(argv)
+
+    configure_logging()
+    # Share the render process budget between the workers instead of giving
+    # each one a full pool
+    os.environ.setdefault('RENDER_WORKERS', str(max(1, (cpus - 1) // options.workers)))
+    os.environ['WARMUP'] = 'manual'
+    from backend import app as api
+
+    listener = _listen(options.host, options.port)
+    api.warmup.start(background=False)
+    api.prediction_cache.wait()
+    # Keep the loaded objects out of the workers' garbage collection, so
+    # collecting doesn't touch (and copy) the shared pages
+    gc.freeze()
+
+    Arbiter(api, listener, options).run()
+
+if __name__ == '__main__':
+    main()
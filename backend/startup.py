@@ -0,0 +1,80 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+class Warmup:
+    """Runs the slow parts of startup after the server can take requests.
+
+    Steps (loading the model, parsing the data, importing the plotting
+    stack) run in order on one background thread, so importing app.py only
+    costs the imports it needs for routing. The app is live as soon as it
+    is imported and ready once every step in `required` has succeeded.
+    """
+
+    def __init__(self, required=()):
+        self.required = set(required)
+        self._steps = []
+        self._status = {}  # step name -> {'status', 'seconds', 'error'}
+        self._done = threading.Event()
+        self._thread = None
+        self._started = False
+        self.created_at = time.perf_counter()
+        self.finished_seconds = None
+
+    def add(self, name, fn):
+        self._steps.append((name, fn))
+        self._status[name] = {'status': 'pending'}
+
+    def _run_steps(self):
+        try:
+            for name, fn in self._steps:
+                entry = self._status[name]
+                entry['status'] = 'running'
+                started = time.perf_counter()
+                try:
+                    fn()
+                    entry['status'] = 'done'
+                except Exception as e:
+                    logger.exception("Startup step %s failed", name)
+                    entry['status'] = 'failed'
+                    entry['error'] = str(e)
+                entry['seconds'] = round(time.perf_counter() - started, 4)
+            self.finished_seconds = round(time.perf_counter() - self.created_at, 4)
+            logger.info("Startup warm-up finished", extra={'seconds': self.finished_seconds, 'ready': self.ready})
+        finally:
+            self._done.set()
+
+    def start(self, background=True):
+        """Run the steps on a daemon thread, or right here with background=False"""
+        if self._started:
+            return
+        self._started = True
+        if background:
+            self._thread = threading.Thread(target=self._run_steps, name='startup-warmup', daemon=True)
+            self._thread.start()
+        else:
+            self._run_steps()
+
+    def wait(self, timeout=None):
+        """Block until every step has finished; returns whether they have"""
+        return self._done.wait(timeout)
+
+    @property
+    def finished(self):
+        return self._done.is_set()
+
+    def status(self, name):
+        return self._status[name]['status']
+
+    @property
+    def ready(self):
+        return all(self._status[name]['status'] == 'done' for name in self.required)
+
+    def stats(self):
+        return {
+            'finished': self.finished,
+            'seconds_to_finish': self.finished_seconds,
+            'steps': {name: dict(entry) for name, entry in self._status.items()}
+        }
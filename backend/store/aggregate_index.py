@@ -0,0 +1,204 @@
+import copy
+
+import numpy as np
+import pandas as pd
+
+# Columns with more distinct values than this are not used as group keys
+MAX_GROUP_CARDINALITY = 64
+
+# Bin count used for numeric histograms (matches plot_histogram)
+HISTOGRAM_BINS = 20
+
+class AggregateIndex:
+    """Precomputed aggregates behind the bar, histogram and heatmap charts.
+
+    Built once when the dataset is loaded, from two frames: `labeled` (task
+    and day labels applied, what the bar/histogram charts group on) and
+    `frame` (raw values, what the correlation heatmap uses). It holds
+
+    - value counts for every low-cardinality column,
+    - histogram bin counts for every numeric column,
+    - group sums/counts for every low-cardinality x numeric column pair,
+    - joint counts for every pair of low-cardinality columns (crosstabs),
+    - running sufficient statistics for the pairwise correlation matrix.
+
+    `append()` folds new rows into all of these without revisiting the rows
+    already indexed. Lookups return None when a request is not covered by the
+    index, and callers fall back to computing from the frame.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.key_columns = []
+        self.numeric_columns = []
+        self.counts = {}  # column -> {value: count}
+        self.group_stats = {}  # (x, y) -> {key: [sum, count]}
+        self.joint_counts = {}  # (x, y) -> {(x value, y value): count}
+        self.histograms = {}  # column -> (counts, edges)
+        self.corr_columns = []
+        self._shift = None
+        self._n = None  # rows where both columns are present
+        self._sx = None  # sum of column i over rows where column j is present
+        self._sxx = None  # sum of squares of column i over rows where column j is present
+        self._sxy = None  # sum of products over rows where both are present
+
+    @classmethod
+    def build(cls, labeled, frame):
+        index = cls()
+        index.key_columns = [
+            col for col in labeled.columns
+            if labeled[col].nunique(dropna=True) <= MAX_GROUP_CARDINALITY
+        ]
+        index.numeric_columns = list(labeled.select_dtypes(include=[np.number]).columns)
+        index.corr_columns = list(frame.select_dtypes(include=[np.number]).columns)
+
+        for col in index.numeric_columns:
+            values = labeled[col].dropna().to_numpy(dtype=float)
+            if len(values):
+                index.histograms[col] = np.histogram(values, bins=HISTOGRAM_BINS)
+
+        X = frame[index.corr_columns].to_numpy(dtype=float)
+        # Accumulate around the initial column means to limit cancellation
+        index._shift = np.nan_to_num(np.nanmean(X, axis=0)) if len(X) else np.zeros(len(index.corr_columns))
+        k = len(index.corr_columns)
+        index._n = np.zeros((k, k))
+        index._sx = np.zeros((k, k))
+        index._sxx = np.zeros((k, k))
+        index._sxy = np.zeros((k, k))
+
+        index._add_rows(labeled, frame)
+        return index
+
+    def _add_rows(self, labeled, frame):
+        """Fold rows into counts, group sums and correlation statistics"""
+        self.rows += len(labeled)
+
+        for col in list(self.key_columns):
+            target = self.counts.setdefault(col, {})
+            for value, count in labeled[col].value_counts(sort=False, dropna=True).items():
+                target[value] = target.get(value, 0) + int(count)
+            if len(target) > MAX_GROUP_CARDINALITY:
+                self._drop_key_column(col)
+
+        for x in self.key_columns:
+            targets = [y for y in self.numeric_columns if y != x]
+            if targets:
+                grouped = labeled.groupby(x, sort=False)[targets].agg(['sum', 'count'])
+                for y in targets:
+                    stats = self.group_stats.setdefault((x, y), {})
+                    for key, total, count in zip(grouped.index, grouped[(y, 'sum')], grouped[(y, 'count')]):
+                        entry = stats.setdefault(key, [0.0, 0])
+                        entry[0] += float(total)
+                        entry[1] += int(count)
+            for y in self.key_columns:
+                if y == x:
+                    continue
+                joint = self.joint_counts.setdefault((x, y), {})
+                for pair, count in labeled.groupby([x, y], sort=False).size().items():
+                    joint[pair] = joint.get(pair, 0) + int(count)
+
+        X = frame[self.corr_columns].to_numpy(dtype=float) - self._shift
+        present = (~np.isnan(X)).astype(float)
+        X0 = np.nan_to_num(X)
+        self._n += present.T @ present
+        self._sx += X0.T @ present
+        self._sxx += (X0 * X0).T @ present
+        self._sxy += X0.T @ X0
+
+    def _drop_key_column(self, col):
+        self.key_columns.remove(col)
+        self.counts.pop(col, None)
+        for key in [key for key in self.group_stats if col in key]:
+            del self.group_stats[key]
+        for key in [key for key in self.joint_counts if col in key]:
+            del self.joint_counts[key]
+
+    def append(self, labeled, frame, full_labeled):
+        """Return a new index with the given rows added.
+
+        Only the new rows are scanned, except for a histogram whose range the
+        new values fall outside of: that column's bins are rebuilt from
+        `full_labeled`. The current index is left untouched so datasets
+        already handed to requests stay consistent.
+        """
+        index = copy.deepcopy(self)
+        index._add_rows(labeled, frame)
+
+        for col in index.numeric_columns:
+            values = labeled[col].dropna().to_numpy(dtype=float)
+            if not len(values):
+                continue
+            counts, edges = index.histograms.get(col, (None, None))
+            if edges is not None and values.min() >= edges[0] and values.max() <= edges[-1]:
+                index.histograms[col] = (counts + np.histogram(values, bins=edges)[0], edges)
+            else:
+                all_values = full_labeled[col].dropna().to_numpy(dtype=float)
+                index.histograms[col] = np.histogram(all_values, bins=HISTOGRAM_BINS)
+        return index
+
+    def value_counts(self, column):
+        """Same as df[column].value_counts(), or None if not indexed"""
+        counts = self.counts.get(column)
+        if counts is None:
+            return None
+        series = pd.Series(counts, name='count', dtype='int64')
+        series.index.name = column
+        return series.sort_values(ascending=False, kind='stable')
+
+    def histogram(self, column):
+        """(counts, edges) as np.histogram(values, bins=20), or None"""
+        return self.histograms.get(column)
+
+    def group_means(self, x, y):
+        """Same as df.groupby(x)[y].mean().reset_index(), or None"""
+        stats = self.group_stats.get((x, y))
+        if stats is None:
+            return None
+        keys = sorted(stats)
+        means = [stats[key][0] / stats[key][1] if stats[key][1] else np.nan for key in keys]
+        return pd.DataFrame({x: keys, y: means})
+
+    def cross_counts(self, x, y):
+        """Same as pd.crosstab(df[x], df[y]), or None"""
+        joint = self.joint_counts.get((x, y))
+        if joint is None:
+            return None
+        table = pd.Series(joint).unstack(fill_value=0).sort_index().sort_index(axis=1)
+        table.index.name = x
+        table.columns.name = y
+        return table.astype('int64')
+
+    def correlation(self):
+        """Pairwise correlation of the varying numeric columns, as in correlation()"""
+        if len(self.corr_columns) < 2:
+            raise Exception("Not enough numeric columns for correlation heatmap")
+
+        n, sx, sxx, sxy = self._n, self._sx, self._sxx, self._sxy
+        diag_n = np.diag(n)
+        diag_spread = diag_n * np.diag(sxx) - np.diag(sx) ** 2
+        varying = ~(diag_spread <= 1e-10 * np.maximum(diag_n * np.diag(sxx), 1e-300))
+        keep = np.flatnonzero(varying)
+        if len(keep) < 2:
+            raise Exception("Not enough varying numeric columns for correlation")
+
+        n = n[np.ix_(keep, keep)]
+        sx = sx[np.ix_(keep, keep)]
+        sxx = sxx[np.ix_(keep, keep)]
+        sxy = sxy[np.ix_(keep, keep)]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cov = n * sxy - sx * sx.T
+            spread = (n * sxx - sx ** 2) * (n * sxx - sx ** 2).T
+            corr = cov / np.sqrt(spread)
+        corr[n < 2] = np.nan
+        np.fill_diagonal(corr, 1.0)
+        columns = [self.corr_columns[i] for i in keep]
+        return pd.DataFrame(np.clip(corr, -1.0, 1.0), index=columns, columns=columns)
+
+    def stats(self):
+        return {
+            'rows': self.rows,
+            'key_columns': len(self.key_columns),
+            'numeric_columns': len(self.numeric_columns),
+            'group_pairs': len(self.group_stats),
+            'crosstab_pairs': len(self.joint_counts)
+        }
@@ -0,0 +1,214 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+
+import numpy as np
+import pandas as pd
+
+from backend.model.preprocess import clean_pipeline
+
+logger = logging.getLogger(__name__)
+
+# Bump when the on-disk layout or the cleaning output changes
+CACHE_VERSION = 2
+
+# Small-integer columns stored as int8 when every value fits
+INT8_COLUMNS = ('Mood', 'TaskType', 'DayOfWeek', 'Distractions', 'Completed')
+
+# Text columns with at most this many distinct values are stored as categoricals
+MAX_CATEGORIES = 256
+
+_fingerprints = {}  # source path -> ((size, mtime_ns), fingerprint)
+_lock = threading.Lock()
+
+def cache_root_for(source_path):
+    return os.path.join(os.path.dirname(os.path.abspath(source_path)), '.cache')
+
+def _pointer_path(source_path, cache_root):
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    return os.path.join(cache_root, f"{stem}.latest.json")
+
+def source_fingerprint(source_path, cache_root=None):
+    """Content hash of the source file.
+
+    The hash is remembered against the file's size and mtime (in memory and in
+    a pointer file next to the cache) so an unchanged source is not re-read.
+    """
+    stat = os.stat(source_path)
+    signature = (stat.st_size, stat.st_mtime_ns)
+    with _lock:
+        cached = _fingerprints.get(source_path)
+    if cached and cached[0] == signature:
+        return cached[1]
+
+    pointer = _pointer_path(source_path, cache_root or cache_root_for(source_path))
+    try:
+        with open(pointer) as f:
+            saved = json.load(f)
+        if (saved['size'], saved['mtime_ns']) == signature:
+            with _lock:
+                _fingerprints[source_path] = (signature, saved['fingerprint'])
+            return saved['fingerprint']
+    except (OSError, ValueError, KeyError):
+        pass
+
+    digest = hashlib.sha256()
+    with open(source_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    fingerprint = digest.hexdigest()[:16]
+    with _lock:
+        _fingerprints[source_path] = (signature, fingerprint)
+    try:
+        os.makedirs(os.path.dirname(pointer), exist_ok=True)
+        with open(pointer, 'w') as f:
+            json.dump({'size': signature[0], 'mtime_ns': signature[1], 'fingerprint': fingerprint}, f)
+    except OSError:
+        pass
+    return fingerprint
+
+def compact_frame(df):
+    """Narrow dtypes: int8 codes, float32 scores, categoricals for low-cardinality text"""
+    compact = {}
+    for col in df.columns:
+        series = df[col]
+        if pd.api.types.is_bool_dtype(series):
+            compact[col] = series.astype('int8')
+        elif pd.api.types.is_numeric_dtype(series):
+            values = series.to_numpy(dtype='float64')
+            integral = not np.isnan(values).any() and np.array_equal(values, np.round(values))
+            if col in INT8_COLUMNS and integral and (len(values) == 0 or (values.min() >= -128 and values.max() <= 127)):
+                compact[col] = series.astype('int8')
+            elif pd.api.types.is_integer_dtype(series):
+                compact[col] = pd.to_numeric(series, downcast='integer')
+            else:
+                compact[col] = series.astype('float32')
+        elif pd.api.types.is_datetime64_any_dtype(series):
+            compact[col] = series.astype('datetime64[ns]')
+        elif isinstance(series.dtype, pd.CategoricalDtype) or series.nunique(dropna=True) <= MAX_CATEGORIES:
+            compact[col] = series.astype('category')
+        else:
+            compact[col] = series.astype(str)
+    return pd.DataFrame(compact)
+
+def _json_key(value):
+    return value.item() if hasattr(value, 'item') else value
+
+def write_cache(df, mapping, directory, source_path, fingerprint):
+    """Write one .npy file per column plus a meta.json describing them.
+
+    The files are staged in a private directory and renamed into place. A
+    cache directory is never replaced once it exists: readers may have it
+    memory-mapped, and a concurrent writer for the same name holds the same
+    data, so the staged copy is discarded instead.
+    """
+    tmp_dir = f"{directory}.tmp-{os.getpid()}-{threading.get_ident()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    columns = []
+    for i, col in enumerate(df.columns):
+        series = df[col]
+        filename = f"col{i}.npy"
+        entry = {'name': col, 'file': filename}
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            entry['kind'] = 'categorical'
+            entry['categories'] = [_json_key(c) for c in series.cat.categories]
+            values = series.cat.codes.to_numpy()
+        elif pd.api.types.is_datetime64_any_dtype(series):
+            entry['kind'] = 'datetime'
+            values = series.to_numpy(dtype='datetime64[ns]')
+        elif pd.api.types.is_numeric_dtype(series):
+            entry['kind'] = 'numeric'
+            values = series.to_numpy()
+        else:
+            entry['kind'] = 'string'
+            values = series.to_numpy(dtype=str)
+        np.save(os.path.join(tmp_dir, filename), values, allow_pickle=False)
+        columns.append(entry)
+
+    meta = {
+        'version': CACHE_VERSION,
+        'source': os.path.abspath(source_path),
+        'fingerprint': fingerprint,
+        'rows': int(len(df)),
+        'columns': columns,
+        'mapping': [[_json_key(k), _json_key(v)] for k, v in (mapping or {}).items()]
+    }
+    with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+        json.dump(meta, f)
+
+    if os.path.exists(directory):
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        return
+    try:
+        os.replace(tmp_dir, directory)
+    except OSError:
+        # Another writer renamed its copy into place first
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        if not os.path.exists(os.path.join(directory, 'meta.json')):
+            raise
+
+def read_cache(directory):
+    """Load a cache directory as (DataFrame, mapping) with columns memory-mapped.
+
+    Numeric, datetime and categorical-code columns are backed by read-only
+    memory maps of the .npy files; callers must not modify them in place.
+    """
+    with open(os.path.join(directory, 'meta.json')) as f:
+        meta = json.load(f)
+    if meta.get('version') != CACHE_VERSION:
+        raise ValueError(f"Cache version {meta.get('version')} does not match {CACHE_VERSION}")
+
+    data = {}
+    for entry in meta['columns']:
+        values = np.load(os.path.join(directory, entry['file']), mmap_mode='r', allow_pickle=False)
+        if entry['kind'] == 'categorical':
+            data[entry['name']] = pd.Categorical.from_codes(values, entry['categories'])
+        elif entry['kind'] == 'string':
+            data[entry['name']] = np.asarray(values).astype(object)
+        else:
+            data[entry['name']] = values
+    df = pd.DataFrame(data, copy=False)
+    mapping = {k: v for k, v in meta['mapping']}
+    return df, mapping
+
+def load_cleaned(source_path, cache_root=None):
+    """Cleaned dataset for a source CSV, served from the columnar cache.
+
+    On a cache miss the CSV is run through clean_pipeline (without rewriting
+    the source), narrowed with compact_frame and written to
+    `<cache_root>/<name>-<fingerprint>/`; older caches for the same source
+    are removed. Returns (DataFrame, mapping), or (None, None) if cleaning
+    fails.
+    """
+    cache_root = cache_root or cache_root_for(source_path)
+    fingerprint = source_fingerprint(source_path, cache_root)
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    directory = os.path.join(cache_root, f"{stem}-{fingerprint}")
+
+    if os.path.exists(os.path.join(directory, 'meta.json')):
+        try:
+            return read_cache(directory)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("Ignoring unreadable cache %s: %s", directory, e)
+            shutil.rmtree(directory, ignore_errors=True)
+
+    df, mapping = clean_pipeline(source_path, save=False)
+    if df is None:
+        return None, None
+
+    os.makedirs(cache_root, exist_ok=True)
+    write_cache(compact_frame(df), mapping, directory, source_path, fingerprint)
+    current = re.compile(rf"{re.escape(stem)}-[0-9a-f]{{16}}")
+    for name in os.listdir(cache_root):
+        # Only finished caches of this source; staging dirs belong to live writers
+        if current.fullmatch(name) and name != os.path.basename(directory):
+            shutil.rmtree(os.path.join(cache_root, name), ignore_errors=True)
+
+    logger.info("Cleaned data cached at %s", directory)
+    return read_cache(directory)
@@ -0,0 +1,245 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+from backend.store.aggregate_index import AggregateIndex
+from backend.store.date_index import DateIndex
+from backend.store.segment_log import (
+    end_position,
+    fold_rows,
+    load_log_frame,
+    read_rows,
+    segments_dir_for
+)
+from backend.visualizations.labels import apply_mappings, task_labels
+
+logger = logging.getLogger(__name__)
+
+class Dataset:
+    """Immutable snapshot of the productivity log held in memory.
+
+    `frame` keeps the cleaned columns (numeric codes for TaskType/DayOfWeek),
+    which the heatmap and column validation use. `mapping` is the TaskType
+    code -> original value mapping the log was cleaned with; `labeled` has
+    the task labels derived from it (labels.task_labels) and the day names
+    applied, and shares every other column with `frame`. Both are shared
+    between requests and must be treated as read-only; use `view()` to get
+    a frame that is safe to add columns to.
+    `aggregates` is the AggregateIndex over this snapshot, `dates` its
+    DateIndex (None without a Date column) and `segment_position` how far
+    into the ingestion segments it reaches.
+    """
+
+    def __init__(self, frame, signature, load_seconds, labeled=None, aggregates=None,
+                 segment_position=None, dates=None, mapping=None):
+        self.frame = frame
+        self.mapping = mapping
+        self.tasks = task_labels(mapping) if mapping is not None else None
+        self.labeled = labeled if labeled is not None else apply_mappings(frame, self.tasks)
+        self.aggregates = aggregates if aggregates is not None else AggregateIndex.build(self.labeled, frame)
+        self.dates = dates if dates is not None else DateIndex.build(frame)
+        self.signature = signature
+        self.load_seconds = load_seconds
+        self.segment_position = segment_position
+        self.loaded_at = time.time()
+
+    @property
+    def columns(self):
+        return self.frame.columns
+
+    def view(self, labeled=True):
+        """Shallow view of the data; no column values are copied"""
+        source = self.labeled if labeled else self.frame
+        return source.copy(deep=False)
+
+    def in_date_order(self, labeled=True):
+        """The rows sorted by Date (from the date index, nothing is re-sorted)"""
+        source = self.labeled if labeled else self.frame
+        if self.dates is None or self.dates.order is None:
+            return source
+        return source.take(self.dates.order).reset_index(drop=True)
+
+    def window(self, window):
+        """The rows inside a time window from date_index.parse_window, in date
+        order; the whole dataset when `window` is None"""
+        if not window:
+            return self
+        if self.dates is None:
+            raise ValueError("Date filters need a Date column in the data")
+        rows = self.dates.select(**window)
+        return DatasetWindow(self.frame.take(rows).reset_index(drop=True),
+                             self.labeled.take(rows).reset_index(drop=True))
+
+class DatasetWindow:
+    """Rows of a Dataset inside a time window, read like a Dataset.
+
+    The rows are already in date order. There is no aggregate index for a
+    window, so the charts compute their aggregates from the rows.
+    """
+
+    aggregates = None
+
+    def __init__(self, frame, labeled):
+        self.frame = frame
+        self.labeled = labeled
+
+    @property
+    def columns(self):
+        return self.frame.columns
+
+    def view(self, labeled=True):
+        source = self.labeled if labeled else self.frame
+        return source.copy(deep=False)
+
+    def in_date_order(self, labeled=True):
+        return self.labeled if labeled else self.frame
+
+    def window(self, window):
+        if window:
+            raise ValueError("A time window can't be narrowed further")
+        return self
+
+class DatasetStore:
+    """Loads the productivity log once and shares it across requests.
+
+    The file's size and mtime are checked on every `get()` (a single stat
+    call), along with the end of the log's ingestion segments
+    (backend/store/segment_log.py); the data is only loaded again when one
+    of them changes. Full loads go through `loader`, by default the cleaned
+    columnar cache plus the ingested rows, so an unchanged file is
+    memory-mapped rather than parsed; it returns (frame, task mapping,
+    segment position) like segment_log.load_log.
+
+    When only the segments have grown, just the new rows are parsed,
+    cleaned the way a full load cleans them (segment_log.fold_rows) and
+    folded into the aggregate and date indexes, so the result matches a
+    fresh load row for row. A change to the file itself means a full
+    reload: cleaning a file looks at all of it (group means, duplicates,
+    task types), so appended lines can change how earlier ones are cleaned.
+    """
+
+    def __init__(self, path, loader=None):
+        self.path = path
+        self.segments_dir = segments_dir_for(path)
+        self.loader = loader or load_log_frame
+        self._dataset = None
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.appends = 0
+
+    def _signature(self):
+        stat = os.stat(self.path)
+        return (stat.st_size, stat.st_mtime_ns, end_position(self.segments_dir))
+
+    def get(self):
+        """Return the current Dataset, reloading it if the file has changed"""
+        signature = self._signature()
+        dataset = self._dataset
+        if dataset is not None and dataset.signature == signature:
+            return dataset
+
+        with self._lock:
+            # Another request may have reloaded while we waited for the lock
+            dataset = self._dataset
+            if dataset is not None and dataset.signature == signature:
+                return dataset
+
+            start = time.perf_counter()
+            appended = self._load_appended(dataset, signature, start) if dataset is not None else None
+            if appended is not None:
+                self._dataset = appended
+                self.appends += 1
+                return appended
+
+            frame, mapping, segment_position = self.loader(self.path)
+            dataset = Dataset(frame, signature, time.perf_counter() - start,
+                              segment_position=segment_position, mapping=mapping)
+            self._dataset = dataset
+            self.loads += 1
+            logger.info("Dataset loaded from %s. Shape: %s", self.path, frame.shape)
+            return dataset
+
+    def _load_appended(self, dataset, signature, start):
+        """Dataset extended with the rows logged to the segments since
+        `dataset`, or None if the file changed, the segments went back or the
+        new rows don't match the existing columns"""
+        segment_position = dataset.segment_position
+        if signature[:2] != dataset.signature[:2] or signature[2] is None \
+                or (segment_position is not None and signature[2] < segment_position):
+            return None
+        try:
+            rows, segment_position = read_rows(self.segments_dir, segment_position)
+            new_rows = fold_rows(dataset.frame, dataset.mapping, rows)
+        except (OSError, ValueError, TypeError, pd.errors.ParserError):
+            return None
+
+        frame = pd.concat([dataset.frame, new_rows], ignore_index=True)
+        new_labeled = apply_mappings(new_rows, dataset.tasks)
+        labeled = pd.concat([dataset.labeled, new_labeled], ignore_index=True)
+        aggregates = dataset.aggregates.append(new_labeled, new_rows, labeled)
+        dates = dataset.dates.append(new_rows) if dataset.dates is not None else None
+        logger.info("Appended %d rows to %s. Shape: %s", len(new_rows), self.path, frame.shape)
+        return Dataset(frame, signature, time.perf_counter() - start, labeled=labeled,
+                       aggregates=aggregates, segment_position=segment_position,
+                       dates=dates, mapping=dataset.mapping)
+
+    def invalidate(self):
+        """Force the next get() to re-read the file"""
+        with self._lock:
+            self._dataset = None
+
+    def stats(self):
+        dataset = self._dataset
+        return {
+            'loaded': dataset is not None,
+            'rows': int(dataset.frame.shape[0]) if dataset is not None else 0,
+            'loads': self.loads,
+            'appends': self.appends,
+            'last_load_seconds': round(dataset.load_seconds, 4) if dataset is not None else None,
+            'aggregates': dataset.aggregates.stats() if dataset is not None else None,
+            'dates': dataset.dates.stats() if dataset is not None and dataset.dates is not None else None
+        }
+
+class DatasetStores:
+    """A DatasetStore per data file, for serving several logs (one per tenant).
+
+    Stores are created on first use; beyond `max_stores` the least recently
+    used one is dropped along with its loaded data.
+    """
+
+    def __init__(self, max_stores=16, loader=None):
+        self.max_stores = max_stores
+        self.loader = loader
+        self._stores = OrderedDict()  # path -> DatasetStore
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def store(self, path):
+        with self._lock:
+            store = self._stores.get(path)
+            if store is None:
+                store = self._stores[path] = DatasetStore(path, self.loader)
+                while len(self._stores) > self.max_stores:
+                    self._stores.popitem(last=False)
+                    self.dropped += 1
+            else:
+                self._stores.move_to_end(path)
+            return store
+
+    def get(self, path):
+        """The current Dataset for the file at `path`"""
+        return self.store(path).get()
+
+    def stats(self):
+        with self._lock:
+            stores = list(self._stores.values())
+        return {
+            'stores': len(stores),
+            'max_stores': self.max_stores,
+            'dropped': self.dropped,
+            'rows': sum(store.stats()['rows'] for store in stores)
+        }
@@ -0,0 +1,140 @@
+import numpy as np
+import pandas as pd
+
+from backend.visualizations.labels import DAY_MAPPING
+
+# Column the index orders rows by
+DATE_COLUMN = 'Date'
+
+_DAY_CODES = {name.lower(): code for code, name in DAY_MAPPING.items()}
+
+def _as_list(value):
+    return value if isinstance(value, list) else [value]
+
+def _weekday(value):
+    if isinstance(value, str) and value.strip().lower()[:3] in _DAY_CODES:
+        return _DAY_CODES[value.strip().lower()[:3]]
+    if isinstance(value, int) and not isinstance(value, bool) and 0 <= value <= 6:
+        return value
+    raise ValueError(f"Invalid weekday: {value!r}. Use 0-6 (0=Monday) or {', '.join(DAY_MAPPING.values())}")
+
+def _hour(value):
+    if isinstance(value, int) and not isinstance(value, bool) and 0 <= value <= 23:
+        return value
+    raise ValueError(f"Invalid hour: {value!r}. Use 0-23")
+
+def _timestamp(value, name):
+    try:
+        timestamp = pd.Timestamp(value)
+    except (TypeError, ValueError):
+        timestamp = pd.NaT
+    if pd.isnull(timestamp):
+        raise ValueError(f"Invalid {name} date: {value!r}")
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.tz_convert(None)
+    return timestamp
+
+def parse_window(options):
+    """Time window from a request's start/end/weekday/hour fields.
+
+    `start` is inclusive and `end` exclusive, except that a bare date as
+    `end` includes that whole day. `weekday` (0=Monday or a day name) and
+    `hour` take one value or a list. Returns a normalized dict for
+    DateIndex.select (JSON-serializable, so it can be part of a cache key),
+    or None when no filter is given; raises ValueError for bad values.
+    """
+    window = {}
+    if options.get('start') is not None:
+        window['start'] = _timestamp(options['start'], 'start').isoformat()
+    if options.get('end') is not None:
+        end = _timestamp(options['end'], 'end')
+        if isinstance(options['end'], str) and len(options['end'].strip()) <= 10:
+            end += pd.Timedelta(days=1)
+        window['end'] = end.isoformat()
+    if 'start' in window and 'end' in window and window['start'] >= window['end']:
+        raise ValueError("start must be before end")
+    if options.get('weekday') is not None:
+        window['weekdays'] = sorted({_weekday(value) for value in _as_list(options['weekday'])})
+    if options.get('hour') is not None:
+        window['hours'] = sorted({_hour(value) for value in _as_list(options['hour'])})
+    return window or None
+
+class DateIndex:
+    """Rows of a dataset in Date order, built once when it is loaded.
+
+    `dates` holds the parsed datetime64 values sorted ascending and `order`
+    the row positions they belong to (None when the rows are already in
+    date order), so a start/end window is two binary searches and a slice
+    rather than a scan. The weekday and hour of every sorted row are kept
+    alongside, so those filters only look at the rows inside the window.
+    Rows without a parseable date are not indexed.
+    """
+
+    def __init__(self, dates, order, size):
+        self.dates = dates
+        self.order = order
+        self.size = size  # rows in the frame, indexed or not
+        self.weekdays = ((dates.astype('datetime64[D]').astype(np.int64) + 3) % 7).astype(np.int8)
+        self.hours = (dates.astype('datetime64[h]').astype(np.int64) % 24).astype(np.int8)
+
+    @staticmethod
+    def _values(frame):
+        return pd.to_datetime(frame[DATE_COLUMN], errors='coerce').to_numpy(dtype='datetime64[ns]')
+
+    @classmethod
+    def _sorted(cls, values, positions, size):
+        """Index over `values` at row `positions`, sorting only if they are out of order"""
+        valid = ~np.isnat(values)
+        values, positions = values[valid], positions[valid]
+        if len(values) > 1 and (values[1:] < values[:-1]).any():
+            ordering = np.argsort(values, kind='stable')
+            values, positions = values[ordering], positions[ordering]
+        in_place = len(positions) == size and np.array_equal(positions, np.arange(size))
+        return cls(values, None if in_place else positions, size)
+
+    @classmethod
+    def build(cls, frame):
+        """Index for a frame, or None if it has no Date column"""
+        if DATE_COLUMN not in frame.columns:
+            return None
+        return cls._sorted(cls._values(frame), np.arange(len(frame)), len(frame))
+
+    def positions(self):
+        return np.arange(len(self.dates)) if self.order is None else self.order
+
+    def append(self, frame):
+        """Index with rows of `frame` added after the rows already indexed.
+
+        Rows that come after every indexed date (the usual case for a log)
+        are just concatenated; otherwise the two sorted runs are merged.
+        """
+        values = self._values(frame)
+        positions = np.arange(self.size, self.size + len(frame))
+        if len(self.dates) and len(values) and not np.isnat(values).any() \
+                and values.min() >= self.dates[-1] and not (values[1:] < values[:-1]).any():
+            order = None if self.order is None else np.concatenate([self.order, positions])
+            return DateIndex(np.concatenate([self.dates, values]), order, self.size + len(frame))
+        return self._sorted(np.concatenate([self.dates, values]),
+                            np.concatenate([self.positions(), positions]), self.size + len(frame))
+
+    def select(self, start=None, end=None, weekdays=None, hours=None):
+        """Row positions (in date order) inside a window from parse_window"""
+        lo = 0 if start is None else int(np.searchsorted(self.dates, np.datetime64(start, 'ns'), 'left'))
+        hi = len(self.dates) if end is None else int(np.searchsorted(self.dates, np.datetime64(end, 'ns'), 'left'))
+        hi = max(lo, hi)
+        positions = np.arange(lo, hi) if self.order is None else self.order[lo:hi]
+        mask = None
+        if weekdays is not None:
+            mask = np.isin(self.weekdays[lo:hi], weekdays)
+        if hours is not None:
+            in_hours = np.isin(self.hours[lo:hi], hours)
+            mask = in_hours if mask is None else mask & in_hours
+        return positions if mask is None else positions[mask]
+
+    def stats(self):
+        return {
+            'rows': int(len(self.dates)),
+            'in_date_order': self.order is None,
+            'first': pd.Timestamp(self.dates[0]).isoformat() if len(self.dates) else None,
+            'last': pd.Timestamp(self.dates[-1]).isoformat() if len(self.dates) else None
+        }
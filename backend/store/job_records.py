@@ -0,0 +1,64 @@
+import json
+import logging
+import os
+import re
+import time
+
+logger = logging.getLogger(__name__)
+
+_JOB_ID = re.compile(r'^[0-9a-f]{32}$')
+
+class JobRecords:
+    """Job status files shared by every server process.
+
+    Async renders and training jobs live in the memory of the process that
+    accepted them; with several server workers the status request can land
+    on another one. Each status change is also written here as one small
+    JSON file per job (replaced atomically), so any process can answer.
+    Records older than `max_age` seconds are pruned as new ones are saved.
+    """
+
+    def __init__(self, directory, max_age=24 * 3600, prune_every=100):
+        self.directory = directory
+        self.max_age = max_age
+        self.prune_every = prune_every
+        self._saves = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, job_id):
+        return os.path.join(self.directory, f"{job_id}.json")
+
+    def save(self, info):
+        """Write a job's to_dict() (plus any private fields) under its job_id"""
+        path = self._path(info['job_id'])
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(info, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning("Could not save job record %s: %s", info['job_id'], e)
+            return
+        self._saves += 1
+        if self._saves % self.prune_every == 0:
+            self.prune()
+
+    def load(self, job_id):
+        """The last saved status of `job_id`, or None"""
+        if not _JOB_ID.match(job_id):
+            return None
+        try:
+            with open(self._path(job_id)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def prune(self):
+        cutoff = time.time() - self.max_age
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
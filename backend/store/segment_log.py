@@ -0,0 +1,512 @@
+import fcntl
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+
+from backend.model.preprocess import clean_rows, task_key
+from backend.store.columnar_cache import (
+    INT8_COLUMNS,
+    load_cleaned,
+    read_cache,
+    source_fingerprint,
+    write_cache
+)
+
+logger = logging.getLogger(__name__)
+
+# Segment files of a log: <data dir>/segments/<log name>/seg-00000000.csv, ...
+SEGMENTS_DIRNAME = 'segments'
+_SEGMENT_FILE = re.compile(r'^seg-(\d{8})\.csv$')
+COLUMNS_FILENAME = 'columns.json'
+COMPACTED_POINTER = 'compacted.json'
+
+# Columns filled in from Date when an entry doesn't give them
+DERIVED_COLUMNS = ('Time', 'DayOfWeek', 'Week(day/end)')
+
+# Format of Date/Time in segment rows (the same as the source logs)
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# A new segment is started once the current one reaches this size
+MAX_SEGMENT_BYTES = 8 * 1024 * 1024
+
+# fsync policies for SegmentLog: after every group commit before it is
+# acknowledged, at most every `fsync_seconds`, or left to the OS
+FSYNC_POLICIES = ('batch', 'interval', 'never')
+
+def segments_dir_for(source_path):
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    return os.path.join(os.path.dirname(os.path.abspath(source_path)), SEGMENTS_DIRNAME, stem)
+
+def segment_path(directory, index):
+    return os.path.join(directory, f"seg-{index:08d}.csv")
+
+def segment_files(directory):
+    """[(index, path)] of a log's segments, oldest first"""
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    indexes = sorted(int(match.group(1)) for match in map(_SEGMENT_FILE.match, names) if match)
+    return [(index, segment_path(directory, index)) for index in indexes]
+
+def end_position(directory):
+    """(segment index, size) of the newest segment, or None if nothing was logged"""
+    files = segment_files(directory)
+    if not files:
+        return None
+    index, path = files[-1]
+    try:
+        return (index, os.path.getsize(path))
+    except FileNotFoundError:
+        return None
+
+def read_columns(directory):
+    with open(os.path.join(directory, COLUMNS_FILENAME)) as f:
+        return json.load(f)
+
+def read_rows(directory, since=None):
+    """Rows logged after position `since` (None for all of them).
+
+    Returns (DataFrame of the raw CSV values, position after the last
+    complete row). A row still being written is left for the next read.
+    """
+    try:
+        columns = read_columns(directory)
+    except FileNotFoundError:
+        return pd.DataFrame(), since
+    chunks = []
+    position = since
+    for index, path in segment_files(directory):
+        if since is not None and index < since[0]:
+            continue
+        start = since[1] if since is not None and index == since[0] else 0
+        with open(path, 'rb') as f:
+            f.seek(start)
+            data = f.read()
+        complete = data.rfind(b'\n') + 1
+        chunks.append(data[:complete])
+        position = (index, start + complete)
+        if complete < len(data):
+            break
+    data = b''.join(chunks)
+    if not data:
+        return pd.DataFrame(columns=columns), position
+    return pd.read_csv(BytesIO(data), header=None, names=columns), position
+
+def conform_rows(frame, rows):
+    """Rows converted to the columns and dtypes of a cleaned frame.
+
+    A categorical column whose new values aren't all among the frame's
+    categories is left uncategorized rather than losing them.
+    """
+    rows = rows.reindex(columns=frame.columns)
+    dtypes = frame.dtypes.to_dict()
+    for col, dtype in dtypes.items():
+        if isinstance(dtype, pd.CategoricalDtype) and not rows[col].dropna().isin(dtype.categories).all():
+            dtypes[col] = object
+    return rows.astype(dtypes)
+
+def fold_rows(frame, mapping, rows):
+    """Raw segment rows cleaned (preprocess.clean_rows) and conformed to
+    `frame`, the cleaned log they are added to.
+
+    Full loads, compaction and the dataset store's incremental folds all
+    clean ingested rows here, so they agree on every row.
+    """
+    return conform_rows(frame, clean_rows(rows, mapping))
+
+def _read_pointer(directory):
+    try:
+        with open(os.path.join(directory, COMPACTED_POINTER)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def load_log(source_path):
+    """Cleaned source log plus everything ingested into its segments.
+
+    Starts from the newest compaction when it was made from the current
+    source file, otherwise from the source's own columnar cache, and adds
+    the rows logged since (fold_rows). The source file is never rewritten. Returns
+    (DataFrame, mapping, segment position), or (None, None, None) if the
+    source can't be cleaned.
+    """
+    directory = segments_dir_for(source_path)
+    frame = None
+    since = None
+    pointer = _read_pointer(directory)
+    if pointer is not None and pointer['fingerprint'] == source_fingerprint(source_path):
+        try:
+            frame, mapping = read_cache(os.path.join(directory, pointer['directory']))
+            since = tuple(pointer['position'])
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("Ignoring unreadable compaction of %s: %s", source_path, e)
+            frame = None
+    if frame is None:
+        frame, mapping = load_cleaned(source_path)
+        if frame is None:
+            return None, None, None
+
+    rows, position = read_rows(directory, since)
+    if len(rows):
+        frame = pd.concat([frame, fold_rows(frame, mapping, rows)], ignore_index=True)
+    return frame, mapping, position
+
+def load_log_frame(source_path):
+    """load_log for the dataset store: raises ValueError instead of returning None"""
+    frame, mapping, position = load_log(source_path)
+    if frame is None:
+        raise ValueError(f"Could not clean data file {source_path}")
+    return frame, mapping, position
+
+class _Batch:
+    def __init__(self, data, count):
+        self.data = data
+        self.count = count
+        self.done = threading.Event()
+        self.error = None
+
+class SegmentLog:
+    """Append-only ingestion log next to a source CSV.
+
+    append() encodes a batch of entries into CSV rows and hands them to a
+    committer thread, which writes everything queued since its last write in
+    one go (group commit) and then acknowledges all of those callers
+    together, so an entry costs one small write however long the log is.
+    Writes from several processes are serialised with a lock file; rows
+    land in numbered segment files under segments_dir_for(source_path) and
+    a new segment is started every `max_segment_bytes`.
+
+    compact() writes what load_log returns, the cleaned source plus the
+    cleaned segment rows, as a columnar snapshot (the format of
+    backend/store/columnar_cache.py) that load_log then starts from, so
+    the segments aren't parsed again. Ingested rows are never
+    de-duplicated. The segments themselves stay as the record of what was
+    ingested; the source file is not modified.
+    """
+
+    def __init__(self, source_path, fsync='batch', fsync_seconds=1.0,
+                 max_segment_bytes=MAX_SEGMENT_BYTES, compact_seconds=0):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Invalid fsync policy: {fsync}. Choose from {', '.join(FSYNC_POLICIES)}")
+        self.source_path = source_path
+        self.directory = segments_dir_for(source_path)
+        self.fsync = fsync
+        self.fsync_seconds = fsync_seconds
+        self.max_segment_bytes = max_segment_bytes
+        self.compact_seconds = compact_seconds
+        self._columns = None
+        self._task_types = None  # (source fingerprint, {task_key: value})
+        self._pending = []
+        self._cond = threading.Condition()
+        self._pid = None
+        self._last_fsync = time.monotonic()
+        self._unsynced = False
+        self.batches = 0
+        self.entries = 0
+        self.fsyncs = 0
+        self.compactions = 0
+        self.last_compaction = None
+
+    def columns(self):
+        """Columns of the log, taken from the source file's header"""
+        if self._columns is None:
+            try:
+                self._columns = read_columns(self.directory)
+            except FileNotFoundError:
+                columns = list(pd.read_csv(self.source_path, nrows=0).columns)
+                os.makedirs(self.directory, exist_ok=True)
+                path = os.path.join(self.directory, COLUMNS_FILENAME)
+                # Concurrent first appends each write their own temporary file
+                tmp_path = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+                with open(tmp_path, 'w') as f:
+                    json.dump(columns, f)
+                os.replace(tmp_path, path)
+                self._columns = columns
+        return self._columns
+
+    def task_types(self):
+        """{task_key: value} of the task types in the cleaned source log"""
+        fingerprint = source_fingerprint(self.source_path)
+        if self._task_types is None or self._task_types[0] != fingerprint:
+            _, mapping = load_cleaned(self.source_path)
+            if mapping is None:
+                raise RuntimeError(f"Could not clean data file {self.source_path}")
+            self._task_types = (fingerprint, {task_key(task): task for task in mapping.values()})
+        return self._task_types[1]
+
+    def encode(self, entries):
+        """CSV rows for a list of entry dicts; raises ValueError for a bad entry.
+
+        Every column of the log is required, except that in a log with a
+        Date column Time, DayOfWeek and Week(day/end) are derived from it
+        when missing. TaskType must be one of the task types already in the
+        log (a code or a name, whichever the log stores), so that it is
+        encoded the same way as the log's own rows.
+        """
+        if not entries:
+            raise ValueError("No entries to log")
+        columns = self.columns()
+        optional = DERIVED_COLUMNS if 'Date' in columns else ()
+        for i, entry in enumerate(entries):
+            if not isinstance(entry, dict):
+                raise ValueError(f"Entry {i} must be an object")
+            unknown = set(entry) - set(columns)
+            if unknown:
+                raise ValueError(f"Entry {i} has unknown fields: {', '.join(sorted(unknown))}")
+            missing = [col for col in columns if col not in optional and entry.get(col) is None]
+            if missing:
+                raise ValueError(f"Entry {i} is missing: {', '.join(missing)}")
+
+        batch = pd.DataFrame.from_records(entries)
+        if 'Date' in columns:
+            dates = pd.to_datetime(batch['Date'], errors='coerce', format='mixed')
+            if dates.isna().any():
+                raise ValueError(f"Entry {int(dates.isna().to_numpy().argmax())} has an invalid Date")
+            batch['Date'] = dates.dt.strftime(DATE_FORMAT)
+            derived = {
+                'Time': batch['Date'],
+                'DayOfWeek': dates.dt.dayofweek,
+                'Week(day/end)': pd.Series(np.where(dates.dt.dayofweek < 5, 'Weekday', 'Weekend'), index=batch.index)
+            }
+            for col in DERIVED_COLUMNS:
+                if col not in columns:
+                    continue
+                if col in batch.columns:
+                    batch[col] = batch[col].where(batch[col].notna(), derived[col])
+                else:
+                    batch[col] = derived[col]
+        if 'TaskType' in columns:
+            known = self.task_types()
+            tasks = batch['TaskType'].map(lambda task: known.get(task_key(task)))
+            if tasks.isna().any():
+                i = int(tasks.isna().to_numpy().argmax())
+                raise ValueError(f"Entry {i}: unknown TaskType {entries[i]['TaskType']!r}; "
+                                 f"the log has {', '.join(str(task) for task in known.values())}")
+            batch['TaskType'] = tasks
+        if 'Time' in columns:
+            times = pd.to_datetime(batch['Time'], errors='coerce', format='mixed')
+            if times.isna().any():
+                raise ValueError(f"Entry {int(times.isna().to_numpy().argmax())} has an invalid Time")
+            batch['Time'] = times.dt.strftime(DATE_FORMAT)
+
+        for col in columns:
+            if col in ('Date', 'Time', 'Week(day/end)', 'TaskType'):
+                continue
+            values = pd.to_numeric(batch[col], errors='coerce')
+            bad = ~np.isfinite(values.to_numpy(dtype='float64'))
+            if col in INT8_COLUMNS:
+                bad |= (values != values.round()).to_numpy() | (values.abs() > 127).to_numpy()
+            if bad.any():
+                kind = 'a whole number' if col in INT8_COLUMNS else 'a number'
+                raise ValueError(f"Entry {int(bad.argmax())}: {col} must be {kind}")
+            batch[col] = values
+        if 'Week(day/end)' in columns and not batch['Week(day/end)'].isin(['Weekday', 'Weekend']).all():
+            raise ValueError("Week(day/end) must be Weekday or Weekend")
+
+        return batch[columns].to_csv(header=False, index=False).encode('utf-8')
+
+    def append(self, entries):
+        """Log a batch of entries; returns once they are written (and synced,
+        under the 'batch' policy). Returns the number of entries."""
+        batch = _Batch(self.encode(entries), len(entries))
+        with self._cond:
+            self._ensure_threads()
+            self._pending.append(batch)
+            self._cond.notify()
+        batch.done.wait()
+        if batch.error is not None:
+            raise batch.error
+        return batch.count
+
+    def _ensure_threads(self):
+        # Threads don't survive fork; a forked server worker starts its own
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._pending = []
+        threading.Thread(target=self._commit_loop, name='segment-log-commit', daemon=True).start()
+        if self.compact_seconds:
+            threading.Thread(target=self._compact_loop, name='segment-log-compact', daemon=True).start()
+
+    def _commit_loop(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    timeout = None
+                    if self._unsynced:
+                        timeout = max(0.0, self._last_fsync + self.fsync_seconds - time.monotonic())
+                    if not self._cond.wait(timeout) and self._unsynced:
+                        break
+                batches, self._pending = self._pending, []
+            try:
+                if batches:
+                    self._write(b''.join(batch.data for batch in batches))
+                elif self._unsynced:
+                    self._sync_current()
+            except Exception as e:
+                # Fail this round's callers but keep committing for the next ones
+                logger.exception("Segment log write failed")
+                for batch in batches:
+                    batch.error = e
+                if not batches:
+                    self._last_fsync = time.monotonic()  # retry after the next interval
+            else:
+                if batches:
+                    self.batches += 1
+                    self.entries += sum(batch.count for batch in batches)
+            for batch in batches:
+                batch.done.set()
+
+    def _lock(self, name, blocking=True):
+        fd = os.open(os.path.join(self.directory, name), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            os.close(fd)
+            return None
+        return fd
+
+    @staticmethod
+    def _unlock(fd):
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+    def _write(self, data):
+        """Append `data` to the newest segment, under the cross-process lock"""
+        lock = self._lock('.append.lock')
+        try:
+            files = segment_files(self.directory)
+            index, path = files[-1] if files else (0, segment_path(self.directory, 0))
+            created = not files
+            size = os.path.getsize(path) if files else 0
+            if size >= self.max_segment_bytes:
+                if self._unsynced:
+                    # Interval syncs only reach the newest segment; flush this one before it stops being that
+                    self._sync_path(path)
+                index, path, size, created = index + 1, segment_path(self.directory, index + 1), 0, True
+            fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644)
+            try:
+                if size and os.pread(fd, 1, size - 1) != b'\n':
+                    # Left by a writer that died mid-write; drop the partial row
+                    self._repair(fd, size)
+                os.write(fd, data)
+                if self.fsync == 'batch':
+                    os.fsync(fd)
+                    self.fsyncs += 1
+                elif self.fsync == 'interval':
+                    self._unsynced = True
+                    if time.monotonic() >= self._last_fsync + self.fsync_seconds:
+                        self._fsync(fd)
+            finally:
+                os.close(fd)
+            if created:
+                # Make the new segment's directory entry durable as well
+                dir_fd = os.open(self.directory, os.O_RDONLY)
+                try:
+                    os.fsync(dir_fd)
+                finally:
+                    os.close(dir_fd)
+        finally:
+            self._unlock(lock)
+
+    @staticmethod
+    def _repair(fd, size):
+        start = max(0, size - (1 << 16))
+        data = os.pread(fd, size - start, start)
+        complete = data.rfind(b'\n') + 1
+        os.ftruncate(fd, start + complete)
+        logger.warning("Dropped %d bytes of a partially written segment row", size - start - complete)
+
+    def _fsync(self, fd):
+        os.fsync(fd)
+        self.fsyncs += 1
+        self._last_fsync = time.monotonic()
+        self._unsynced = False
+
+    def _sync_path(self, path):
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            self._fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _sync_current(self):
+        files = segment_files(self.directory)
+        if files:
+            self._sync_path(files[-1][1])
+
+    def compact(self):
+        """Write a cleaned columnar snapshot of the source plus the segments.
+
+        Returns the snapshot directory, or None when the newest snapshot is
+        already current or another process is compacting.
+        """
+        self.columns()
+        lock = self._lock('.compact.lock', blocking=False)
+        if lock is None:
+            return None
+        try:
+            fingerprint = source_fingerprint(self.source_path)
+            pointer = _read_pointer(self.directory)
+            position = end_position(self.directory)
+            if position is None or (pointer is not None and pointer['fingerprint'] == fingerprint
+                                    and tuple(pointer['position']) == position):
+                return None
+
+            start = time.perf_counter()
+            source, mapping = load_cleaned(self.source_path)
+            if source is None:
+                raise ValueError(f"Could not clean data file {self.source_path}")
+            rows, position = read_rows(self.directory)
+            df = pd.concat([source, fold_rows(source, mapping, rows)], ignore_index=True)
+
+            name = f"compacted-{fingerprint}-{position[0]:08d}-{position[1]}"
+            write_cache(df, mapping, os.path.join(self.directory, name), self.source_path, fingerprint)
+            pointer_path = os.path.join(self.directory, COMPACTED_POINTER)
+            tmp_path = f"{pointer_path}.tmp-{os.getpid()}"
+            with open(tmp_path, 'w') as f:
+                json.dump({'directory': name, 'fingerprint': fingerprint, 'position': list(position)}, f)
+            os.replace(tmp_path, pointer_path)
+            for old in os.listdir(self.directory):
+                if old.startswith('compacted-') and '.tmp-' not in old and old != name:
+                    shutil.rmtree(os.path.join(self.directory, old), ignore_errors=True)
+
+            self.compactions += 1
+            self.last_compaction = time.time()
+            logger.info("Compacted %s", self.source_path, extra={
+                'rows': int(len(df)), 'segment_rows': int(len(rows)),
+                'seconds': round(time.perf_counter() - start, 4)})
+            return os.path.join(self.directory, name)
+        finally:
+            self._unlock(lock)
+
+    def _compact_loop(self):
+        while True:
+            time.sleep(self.compact_seconds)
+            try:
+                self.compact()
+            except Exception:
+                logger.exception("Compaction of %s failed", self.source_path)
+
+    def stats(self):
+        position = end_position(self.directory)
+        return {
+            'fsync': self.fsync,
+            'batches': self.batches,
+            'entries': self.entries,
+            'avg_batch_entries': round(self.entries / self.batches, 2) if self.batches else None,
+            'fsyncs': self.fsyncs,
+            'segments': len(segment_files(self.directory)),
+            'position': list(position) if position is not None else None,
+            'compactions': self.compactions,
+            'last_compaction': self.last_compaction
+        }
@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+
+from backend.benchmarks.synthetic import generate_log
+from backend.store.aggregate_index import AggregateIndex
+from backend.visualizations.labels import apply_mappings
+
+def _frames(n, seed):
+    frame = generate_log(n, seed=seed, missing_fraction=0.05, duplicate_fraction=0).drop(columns=['Date', 'Time'])
+    return apply_mappings(frame), frame
+
+def test_appended_index_matches_a_rebuild():
+    labeled, frame = _frames(500, 0)
+    new_labeled, new_frame = _frames(200, 1)
+    # Values outside the first histogram range force that column's bins to be rebuilt
+    new_labeled = new_labeled.assign(Duration=new_labeled['Duration'] * 3)
+    new_frame = new_frame.assign(Duration=new_frame['Duration'] * 3)
+    all_labeled = pd.concat([labeled, new_labeled], ignore_index=True)
+    all_frame = pd.concat([frame, new_frame], ignore_index=True)
+
+    index = AggregateIndex.build(labeled, frame)
+    appended = index.append(new_labeled, new_frame, all_labeled)
+    rebuilt = AggregateIndex.build(all_labeled, all_frame)
+
+    assert index.rows == 500 and appended.rows == 700
+    pd.testing.assert_series_equal(appended.value_counts('TaskType'), rebuilt.value_counts('TaskType'))
+    pd.testing.assert_frame_equal(appended.group_means('TaskType', 'SleepHours'),
+                                  rebuilt.group_means('TaskType', 'SleepHours'))
+    pd.testing.assert_frame_equal(appended.cross_counts('TaskType', 'DayOfWeek'),
+                                  rebuilt.cross_counts('TaskType', 'DayOfWeek'))
+    pd.testing.assert_frame_equal(appended.correlation(), rebuilt.correlation())
+    for col in ('Duration', 'SleepHours'):
+        np.testing.assert_array_equal(appended.histogram(col)[0], rebuilt.histogram(col)[0])
+        np.testing.assert_allclose(appended.histogram(col)[1], rebuilt.histogram(col)[1])
+
+def test_lookups_match_pandas():
+    labeled, frame = _frames(400, 2)
+    index = AggregateIndex.build(labeled, frame)
+
+    expected = labeled['TaskType'].value_counts()
+    assert index.value_counts('TaskType').to_dict() == expected.to_dict()
+    means = labeled.groupby('TaskType')['Mood'].mean()
+    np.testing.assert_allclose(index.group_means('TaskType', 'Mood')['Mood'], means.to_numpy())
+    pd.testing.assert_frame_equal(index.cross_counts('TaskType', 'DayOfWeek'),
+                                  pd.crosstab(labeled['TaskType'], labeled['DayOfWeek']), check_names=False)
+    corr = frame.select_dtypes(include=[np.number]).corr()
+    result = index.correlation()
+    np.testing.assert_allclose(result.to_numpy(), corr.loc[result.index, result.columns].to_numpy(), atol=1e-9)
+
+def test_numeric_histograms_are_drawn_from_the_index(tmp_path, monkeypatch):
+    from backend.store.dataset_store import DatasetStore
+    from backend.visualizations import visualize_data
+
+    path = str(tmp_path / 'log.csv')
+    generate_log(500, duplicate_fraction=0).to_csv(path, index=False)
+    dataset = DatasetStore(path).get()
+    figures = []
+    monkeypatch.setattr(visualize_data, 'save_figure', lambda fig, save_path, profile: figures.append(fig))
+    monkeypatch.setattr(visualize_data.np, 'histogram', None)  # no recount of the rows
+
+    visualize_data.plot_histogram(dataset.labeled, 'SleepHours', None, aggregates=dataset.aggregates)
+    counts, edges = dataset.aggregates.histogram('SleepHours')
+    bars = figures[0].axes[0].patches
+    assert [bar.get_height() for bar in bars] == list(counts)
+    assert [bar.get_x() for bar in bars] == list(edges[:-1])
@@ -0,0 +1,68 @@
+import os
+
+import pytest
+
+from backend.benchmarks.synthetic import generate_log
+from backend.store.dataset_store import DatasetStore, DatasetStores
+
+def _write(tmp_path, tasks):
+    df = generate_log(len(tasks), missing_fraction=0, duplicate_fraction=0)
+    df['TaskType'] = tasks
+    path = str(tmp_path / 'log.csv')
+    df.to_csv(path, index=False)
+    return path
+
+@pytest.mark.parametrize('stores', [False, True])
+def test_task_names_survive_the_columnar_cache(tmp_path, stores):
+    path = _write(tmp_path, ['Work'] * 50 + ['Exercise'] * 10)
+    # The first load writes the cache, the second memory-maps it
+    for _ in range(2):
+        dataset = DatasetStores().get(path) if stores else DatasetStore(path).get()
+        assert dataset.labeled['TaskType'].value_counts().to_dict() == {'Work': 50, 'Exercise': 10}
+
+def test_numeric_task_codes_are_labelled_by_value_not_position(tmp_path):
+    path = _write(tmp_path, [0] * 5 + [2] * 7 + [5] * 9)
+    dataset = DatasetStore(path).get()
+    assert dataset.labeled['TaskType'].value_counts().to_dict() == {'Work': 9, 'Social': 7, 'Study': 5}
+
+def test_rows_appended_to_the_file_reload_it(tmp_path):
+    path = _write(tmp_path, [1, 2, 3] * 10)
+    store = DatasetStore(path)
+    store.get()
+    with open(path) as f:
+        lines = f.readlines()
+    with open(path, 'a') as f:
+        f.writelines(lines[1:4])
+
+    dataset = store.get()
+    assert store.loads == 2
+    assert len(dataset.frame) == len(DatasetStore(path).get().frame)
+
+def test_cache_cleanup_spares_other_sources_and_staging_dirs(tmp_path):
+    from backend.store.columnar_cache import cache_root_for, load_cleaned
+
+    path = _write(tmp_path, [1, 2, 3] * 10)
+    root = cache_root_for(path)
+    others = ['log-archive', 'log-0123456789abcdef.tmp-99-1', 'log-0123456789abcdef']
+    for name in others:
+        (tmp_path / '.cache' / name).mkdir(parents=True)
+
+    df, _ = load_cleaned(path)
+    assert len(df) == 30
+    names = set(os.listdir(root))
+    assert {'log-archive', 'log-0123456789abcdef.tmp-99-1'} <= names
+    assert 'log-0123456789abcdef' not in names
+
+def test_existing_cache_directory_is_kept_by_a_second_writer(tmp_path):
+    from backend.store.columnar_cache import load_cleaned, read_cache, write_cache
+
+    path = _write(tmp_path, [1, 2, 3] * 10)
+    df, mapping = load_cleaned(path)
+    directory = str(tmp_path / 'cache')
+    write_cache(df, mapping, directory, path, 'a' * 16)
+    before = os.stat(os.path.join(directory, 'col0.npy')).st_ino
+    write_cache(df.iloc[:5], mapping, directory, path, 'a' * 16)
+
+    assert os.stat(os.path.join(directory, 'col0.npy')).st_ino == before
+    assert len(read_cache(directory)[0]) == 30
+    assert not [n for n in os.listdir(tmp_path) if '.tmp-' in n]
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.store.date_index import DateIndex, parse_window
+
+def _frame(n, seed, start='2025-01-01'):
+    rng = np.random.default_rng(seed)
+    dates = pd.Timestamp(start) + pd.to_timedelta(rng.integers(0, 90 * 24 * 60, n), unit='min')
+    return pd.DataFrame({'Date': dates, 'Mood': rng.integers(0, 6, n)})
+
+def _expected(frame, start=None, end=None, weekdays=None, hours=None):
+    dates = frame['Date']
+    mask = pd.Series(True, index=frame.index)
+    if start is not None:
+        mask &= dates >= pd.Timestamp(start)
+    if end is not None:
+        mask &= dates < pd.Timestamp(end)
+    if weekdays is not None:
+        mask &= dates.dt.dayofweek.isin(weekdays)
+    if hours is not None:
+        mask &= dates.dt.hour.isin(hours)
+    return set(np.flatnonzero(mask.to_numpy()))
+
+WINDOWS = [
+    {},
+    {'start': '2025-02-01T00:00:00', 'end': '2025-03-01T00:00:00'},
+    {'weekdays': [5, 6]},
+    {'start': '2025-01-15T00:00:00', 'hours': [9, 10, 11]},
+]
+
+@pytest.mark.parametrize('window', WINDOWS)
+def test_select_matches_a_scan(window):
+    frame = _frame(2000, 0)
+    index = DateIndex.build(frame)
+    positions = index.select(**window)
+    assert set(positions) == _expected(frame, **window)
+    assert (np.diff(frame['Date'].to_numpy()[positions]) >= np.timedelta64(0)).all()
+
+@pytest.mark.parametrize('later', [True, False])
+def test_append_matches_a_rebuild(later):
+    frame = _frame(1000, 1).sort_values('Date', ignore_index=True)
+    new = _frame(300, 2, start='2025-06-01' if later else '2025-01-10')
+    if later:
+        new = new.sort_values('Date', ignore_index=True)
+    appended = DateIndex.build(frame).append(new)
+    rebuilt = DateIndex.build(pd.concat([frame, new], ignore_index=True))
+
+    # Rows logged after everything indexed keep the index in place
+    assert (appended.order is None) == later
+    np.testing.assert_array_equal(appended.dates, rebuilt.dates)
+    for window in WINDOWS:
+        assert set(appended.select(**window)) == set(rebuilt.select(**window))
+
+def test_parse_window():
+    window = parse_window({'start': '2025-01-01', 'end': '2025-01-31', 'weekday': ['Sat', 0], 'hour': 9})
+    assert window == {'start': '2025-01-01T00:00:00', 'end': '2025-02-01T00:00:00',
+                      'weekdays': [0, 5], 'hours': [9]}
+    assert parse_window({}) is None
+    for bad in ({'start': 'soon'}, {'start': '2025-02-01', 'end': '2025-01-01'},
+                {'weekday': 7}, {'hour': 24}):
+        with pytest.raises(ValueError):
+            parse_window(bad)
@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.visualizations.downsample import density_grid, downsample_series, lttb
+from backend.visualizations.visualize_data import scatter_reduction
+
+def _reference_lttb(x, y, n_out):
+    """Straightforward per-bucket LTTB, bucket edges as in lttb()"""
+    n = len(x)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    kept = [0]
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_x, next_y = x[hi:edges[i + 2]].mean(), y[hi:edges[i + 2]].mean()
+        else:
+            next_x, next_y = x[n - 1], y[n - 1]
+        a = kept[-1]
+        best, best_area = lo, -1.0
+        for j in range(lo, hi):
+            area = abs((x[a] - next_x) * (y[j] - y[a]) - (x[a] - x[j]) * (next_y - y[a]))
+            if area > best_area:
+                best, best_area = j, area
+        kept.append(best)
+    kept.append(n - 1)
+    return np.array(kept)
+
+@pytest.mark.parametrize('n,n_out', [(1000, 50), (1237, 101), (10, 3)])
+def test_lttb_matches_the_reference(n, n_out):
+    rng = np.random.default_rng(n)
+    x = np.sort(rng.uniform(0, 100, n))
+    y = np.cumsum(rng.normal(size=n))
+    np.testing.assert_array_equal(lttb(x, y, n_out), _reference_lttb(x, y, n_out))
+
+def test_lttb_keeps_a_spike():
+    x = np.arange(10000, dtype=float)
+    y = np.zeros(10000)
+    y[4321] = 50.0
+    kept = lttb(x, y, 100)
+    assert len(kept) == 100 and kept[0] == 0 and kept[-1] == 9999
+    assert 4321 in kept
+
+def test_downsample_series_splits_the_budget_by_group():
+    n = 6000
+    df = pd.DataFrame({
+        'Date': pd.date_range('2025-01-01', periods=n, freq='min'),
+        'Mood': np.random.default_rng(0).normal(size=n),
+        'TaskType': np.repeat(['Work', 'Study'], [4000, 2000])
+    })
+    rows, method = downsample_series(df, 'Date', 'Mood', hue='TaskType', max_points=600)
+    assert method == 'lttb'
+    assert rows['TaskType'].value_counts().to_dict() == {'Work': 400, 'Study': 200}
+    assert rows.index.is_monotonic_increasing
+
+    small, method = downsample_series(df.head(500), 'Date', 'Mood', max_points=600)
+    assert method is None and len(small) == 500
+
+def test_large_numeric_scatter_becomes_a_density_grid():
+    rng = np.random.default_rng(1)
+    df = pd.DataFrame({'Mood': rng.normal(size=5000), 'SleepHours': rng.normal(size=5000)})
+    df.loc[::100, 'Mood'] = np.nan
+
+    counts, _, _ = density_grid(df['Mood'], df['SleepHours'], bins=20)
+    assert counts.sum() == df.dropna().shape[0]
+
+    grid, reduction, points = scatter_reduction(df, 'Mood', 'SleepHours', max_points=1000)
+    assert reduction == 'density' and points == np.count_nonzero(grid[0])
+    rows, reduction, points = scatter_reduction(df.head(800), 'Mood', 'SleepHours', max_points=1000)
+    assert reduction is None and points == 800
@@ -0,0 +1,47 @@
+import os
+
+import joblib
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+from backend.model.forest_runtime import CompiledForest, export_forest, load_model
+
+@pytest.fixture
+def model():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(400, 5)).astype(np.float32)
+    X[rng.random(X.shape) < 0.05] = np.nan
+    y = rng.integers(0, 4, size=400)
+    return RandomForestClassifier(n_estimators=12, max_depth=8, random_state=0).fit(X, y)
+
+def test_compiled_forest_matches_sklearn(model):
+    rng = np.random.default_rng(1)
+    X = rng.normal(size=(5000, 5)).astype(np.float32)
+    X[rng.random(X.shape) < 0.05] = np.nan
+    forest = CompiledForest.from_sklearn(model)
+
+    np.testing.assert_allclose(forest.predict_proba(X), model.predict_proba(X), rtol=0, atol=1e-12)
+    np.testing.assert_array_equal(forest.predict(X), model.predict(X))
+
+def test_saved_forest_round_trips(model, tmp_path):
+    X = np.random.default_rng(2).normal(size=(100, 5)).astype(np.float32)
+    joblib.dump(model, tmp_path / 'model.pkl')
+    export_forest(model, tmp_path / 'forest.npz')
+
+    forest = CompiledForest.load(tmp_path / 'forest.npz')
+    np.testing.assert_allclose(forest.predict_proba(X), model.predict_proba(X), rtol=0, atol=1e-12)
+
+def test_load_model_checks_the_pickle_digest_not_mtimes(model, tmp_path):
+    model_path = tmp_path / 'model.pkl'
+    joblib.dump(model, model_path)
+    export_forest(model, tmp_path / 'forest.npz')
+
+    # A checkout gives both files arbitrary mtimes
+    os.utime(tmp_path / 'forest.npz', (0, 0))
+    assert load_model(str(model_path))[1] == 'compiled'
+
+    model.set_params(n_estimators=13).fit(np.zeros((4, 5)), [0, 1, 0, 1])
+    joblib.dump(model, model_path)
+    assert load_model(str(model_path))[1] == 'sklearn'
+    assert load_model(str(model_path), runtime='sklearn')[1] == 'sklearn'
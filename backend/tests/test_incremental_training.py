@@ -0,0 +1,53 @@
+import os
+
+import joblib
+import pandas as pd
+import pytest
+
+from backend.benchmarks.synthetic import generate_log, write_log
+from backend.model import artifacts
+from backend.model.train_tasktype_model import (
+    TRAIN_STATE_FILENAME,
+    bootstrap_incremental_model,
+    prepare_training_data,
+    update_tasktype_model
+)
+from backend.store.segment_log import SegmentLog
+
+def _state(model_dir):
+    directory = artifacts.version_dir(artifacts.current_version(model_dir), model_dir)
+    return joblib.load(os.path.join(directory, TRAIN_STATE_FILENAME))
+
+@pytest.fixture
+def source(tmp_path):
+    # Missing values and repeated rows give the cleaning steps work to do
+    path = write_log(str(tmp_path / 'data' / 'log.csv'), 400, missing_fraction=0.05, duplicate_fraction=0.05)
+    entries = generate_log(20, seed=3, missing_fraction=0, duplicate_fraction=0)
+    SegmentLog(path).append(entries.drop(columns=['Time', 'DayOfWeek', 'Week(day/end)']).to_dict('records'))
+    model_dir = tmp_path / 'model'
+    model_dir.mkdir()
+    return path, str(model_dir)
+
+def test_bootstrap_trains_on_the_full_fit_rows(source):
+    path, model_dir = source
+    X, y, _, _ = prepare_training_data(path)
+    bootstrap_incremental_model(path, model_dir=model_dir)
+    state = _state(model_dir)
+
+    pd.testing.assert_frame_equal(state['window_X'], X.reset_index(drop=True))
+    pd.testing.assert_series_equal(state['window_y'], y.reset_index(drop=True), check_dtype=False)
+    assert state['segment_rows'] == 20
+
+def test_updates_drop_rows_the_bootstrap_already_trained_on(source):
+    path, model_dir = source
+    bootstrap_incremental_model(path, model_dir=model_dir)
+    bootstrapped = artifacts.current_version(model_dir)
+    with open(path) as f:
+        lines = f.readlines()
+    with open(path, 'a') as f:
+        f.writelines(lines[1:6])
+
+    update_tasktype_model(path, model_dir=model_dir)
+    assert artifacts.current_version(model_dir) == bootstrapped
+    assert _state(model_dir)['offset'] == os.path.getsize(path)
+    assert not [name for name in os.listdir(artifacts.versions_root(model_dir)) if name.startswith('.tmp')]
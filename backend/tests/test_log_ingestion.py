@@ -0,0 +1,74 @@
+import json
+import os
+
+import pytest
+
+from backend.benchmarks.synthetic import generate_log
+from backend.model import artifacts
+from backend.model.registry import TENANT_DATA_PATH, TENANT_MODEL_DIRNAME
+from backend.model.train_tasktype_model import update_tasktype_model
+
+TASKS = ['Work', 'Exercise', 'Study']
+
+@pytest.fixture(scope='module')
+def api():
+    os.environ.setdefault('WARMUP', 'lazy')
+    from backend import app as api
+    yield api
+    api.render_queue.shutdown()
+
+@pytest.fixture
+def tenant(api, tmp_path, monkeypatch):
+    """A tenant whose log names its task types instead of numbering them"""
+    monkeypatch.setattr(api.model_registry, 'root', str(tmp_path))
+    data_path = tmp_path / 'acme' / TENANT_DATA_PATH
+    data_path.parent.mkdir(parents=True)
+    (tmp_path / 'acme' / TENANT_MODEL_DIRNAME).mkdir()
+    df = generate_log(300, missing_fraction=0, duplicate_fraction=0)
+    df['TaskType'] = [TASKS[code % 3] for code in df['TaskType']]
+    df.to_csv(data_path, index=False)
+    return 'acme', str(data_path), str(tmp_path / 'acme' / TENANT_MODEL_DIRNAME)
+
+def _entries(n, task):
+    rows = generate_log(n, seed=5, missing_fraction=0, duplicate_fraction=0)
+    rows = rows.drop(columns=['Time', 'DayOfWeek', 'Week(day/end)']).assign(TaskType=task)
+    return rows.to_dict('records')
+
+def _task_counts(client, tenant_id):
+    response = client.post('/visualize', json={
+        'tenant': tenant_id, 'graphType': 'histogram', 'column1': 'TaskType', 'profile': 'data'})
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return response.get_json()
+
+def test_log_then_train_incrementally_and_visualize(api, tenant):
+    tenant_id, data_path, model_dir = tenant
+    client = api.app.test_client()
+    before = _task_counts(client, tenant_id)
+
+    assert update_tasktype_model(data_path, model_dir=model_dir)[0] is not None
+    bootstrapped = artifacts.current_version(model_dir)
+
+    response = client.post('/log', json={'tenant': tenant_id, 'entries': _entries(40, 'Work')})
+    assert response.status_code == 201 and response.get_json() == {'accepted': 40}
+
+    model, _ = update_tasktype_model(data_path, model_dir=model_dir)
+    version = artifacts.current_version(model_dir)
+    assert model is not None and version != bootstrapped
+    with open(os.path.join(artifacts.version_dir(version, model_dir), 'meta.json')) as f:
+        meta = json.load(f)
+    assert meta['mode'] == 'incremental' and meta['new_rows'] == 40
+
+    # Nothing new since: the live model stays
+    update_tasktype_model(data_path, model_dir=model_dir)
+    assert artifacts.current_version(model_dir) == version
+
+    before = dict(zip(before['labels'], before['counts']))
+    after = _task_counts(client, tenant_id)
+    assert dict(zip(after['labels'], after['counts'])) == {**before, 'Work': before['Work'] + 40}
+
+def test_unknown_task_types_are_rejected(api, tenant):
+    tenant_id, _, _ = tenant
+    client = api.app.test_client()
+    response = client.post('/log', json={'tenant': tenant_id, 'entries': _entries(2, 'Gardening')})
+    assert response.status_code == 400
+    assert 'Gardening' in response.get_json()['error']
@@ -0,0 +1,19 @@
+import os
+import time
+
+from backend.visualizations.plot_cache import STALE_STAGING_SECONDS, PlotCache
+
+def test_new_cache_only_clears_abandoned_staging_files(tmp_path):
+    cache = PlotCache(str(tmp_path))
+    published = cache.put_bytes('a' * 32, b'png', 'fp')
+    fresh = cache.staging_path('b' * 32, token='other-worker')
+    abandoned = cache.staging_path('c' * 32, token='dead-worker')
+    for path in (fresh, abandoned):
+        with open(path, 'wb') as f:
+            f.write(b'partial')
+    old = time.time() - STALE_STAGING_SECONDS - 60
+    os.utime(abandoned, (old, old))
+
+    PlotCache(str(tmp_path))  # another worker starting up
+    assert os.path.exists(published) and os.path.exists(fresh)
+    assert not os.path.exists(abandoned)
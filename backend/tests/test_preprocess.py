@@ -0,0 +1,60 @@
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from backend.benchmarks.synthetic import generate_log, write_log
+from backend.model import preprocess
+from backend.model.preprocess import (
+    RowHashSet,
+    clean_chunk,
+    clean_pipeline_streaming,
+    new_statistics,
+    parse_dates,
+    task_mapping_for,
+    update_statistics
+)
+
+def _streaming_peak(tmp_path, rows):
+    path = write_log(str(tmp_path / f'log-{rows}.csv'), rows)
+    tracemalloc.start()
+    try:
+        output, _ = clean_pipeline_streaming(path, chunksize=1000)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    cleaned = pd.read_csv(output)
+    assert not cleaned.duplicated().any()
+    assert len(cleaned) == len(pd.read_csv(path).drop_duplicates())
+    return peak
+
+def test_streaming_dedup_memory_is_flat_across_chunk_counts(tmp_path, monkeypatch):
+    monkeypatch.setattr(preprocess, 'DEDUP_PARTITION_ROWS', 1000)
+    # Both files are larger than the CSV reader's own buffer
+    small = _streaming_peak(tmp_path, 10000)
+    large = _streaming_peak(tmp_path, 40000)
+    assert large < small * 1.25, (small, large)
+
+def test_row_hash_set_splits_and_copies_independently(tmp_path, monkeypatch):
+    monkeypatch.setattr(preprocess, 'DEDUP_PARTITION_ROWS', 100)
+    hashes = np.random.default_rng(0).integers(0, 2**63, 1000, dtype=np.uint64)
+    seen = RowHashSet(str(tmp_path / 'seen'))
+    assert seen.add(hashes[:600]).all()
+    assert seen.bits > 0 and len(seen) == 600
+
+    copy = seen.copy(str(tmp_path / 'copy'))
+    new = copy.add(np.concatenate([hashes[500:], hashes[900:]]))
+    assert new.tolist() == [False] * 100 + [True] * 400 + [False] * 100
+    assert len(RowHashSet(str(tmp_path / 'copy'))) == 1000
+    assert len(RowHashSet(str(tmp_path / 'seen'))) == 600
+    assert RowHashSet(str(tmp_path / 'seen')).add(hashes[600:]).all()
+
+def test_task_codes_do_not_wrap_past_127_types():
+    raw = generate_log(400, missing_fraction=0, duplicate_fraction=0)
+    raw['TaskType'] = [f"task-{i % 200:03d}" for i in range(len(raw))]
+    raw = parse_dates(raw)
+    stats = update_statistics(new_statistics(), raw)
+    mapping = task_mapping_for(stats)
+    cleaned = clean_chunk(raw.copy(), stats, mapping)
+    assert cleaned['TaskType'].min() == 0 and cleaned['TaskType'].max() == 199
+    assert [mapping[code] for code in cleaned['TaskType']] == list(raw['TaskType'])
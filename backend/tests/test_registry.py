@@ -0,0 +1,72 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+from backend.model import artifacts
+from backend.model.artifacts import ServingModel
+from backend.model.forest_runtime import CompiledForest
+from backend.model.registry import ModelRegistry, UnknownTenant, model_nbytes
+
+@pytest.fixture(scope='module')
+def forest():
+    X = np.random.default_rng(0).normal(size=(200, 3))
+    return CompiledForest.from_sklearn(RandomForestClassifier(n_estimators=3, random_state=0).fit(X, X[:, 0] > 0))
+
+@pytest.fixture
+def root(tmp_path):
+    for tenant_id in ('a', 'b', 'c'):
+        (tmp_path / tenant_id / 'model').mkdir(parents=True)
+    return tmp_path
+
+def _registry(root, forest, resident, **options):
+    loads = []
+
+    def loader(model_dir, runtime):
+        loads.append(model_dir)
+        return ServingModel(forest, {}, runtime, artifacts.current_version(model_dir) or 'v0')
+    budget = int(model_nbytes(forest) * (resident + 0.5))
+    return ModelRegistry(str(root), max_bytes=budget, loader=loader, **options), loads
+
+def test_least_recently_used_model_is_evicted(root, forest):
+    registry, loads = _registry(root, forest, resident=2)
+    registry.get('a')
+    registry.get('b')
+    registry.get('a')
+    registry.get('c')  # over budget: b is the least recently used
+
+    stats = registry.stats()['tenants']
+    assert stats['a']['hits'] == 1 and stats['a']['resident']
+    assert stats['b']['evictions'] == 1 and not stats['b']['resident']
+    assert len(loads) == 3
+    registry.get('b')
+    assert len(loads) == 4 and registry.totals()['evictions'] == 2
+
+def test_new_published_version_is_reloaded(root, forest):
+    registry, loads = _registry(root, forest, resident=3, refresh_seconds=0)
+    assert registry.get('a').version == 'v0'
+    artifacts.publish('v1', str(root / 'a' / 'model'))
+    assert registry.get('a').version == 'v1'
+    assert registry.get('a').version == 'v1'
+    assert len(loads) == 2
+
+def test_concurrent_requests_share_one_load(root, forest):
+    registry, loads = _registry(root, forest, resident=3)
+    slow = registry.loader
+    registry.loader = lambda model_dir, runtime: (time.sleep(0.2), slow(model_dir, runtime))[1]
+    threads = [threading.Thread(target=registry.get, args=('a',)) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(loads) == 1
+    assert registry.stats()['tenants']['a']['coalesced'] == 4
+
+def test_unknown_and_invalid_tenants(root, forest):
+    registry, _ = _registry(root, forest, resident=1)
+    with pytest.raises(UnknownTenant):
+        registry.get('missing')
+    with pytest.raises(ValueError):
+        registry.get('../a')
@@ -0,0 +1,102 @@
+import os
+import threading
+
+import pandas as pd
+import pytest
+
+from backend.benchmarks.synthetic import generate_log, write_log
+from backend.store.dataset_store import DatasetStore
+from backend.store.segment_log import SegmentLog, load_log
+
+def _entries(n, seed=1):
+    rows = generate_log(n, seed=seed, missing_fraction=0, duplicate_fraction=0)
+    rows = rows.drop(columns=['Time', 'DayOfWeek', 'Week(day/end)'])
+    return rows.to_dict('records')
+
+@pytest.fixture
+def source(tmp_path):
+    return write_log(str(tmp_path / 'log.csv'), 300)
+
+def test_folded_rows_match_a_fresh_load(source):
+    store = DatasetStore(source)
+    base = len(store.get().frame)
+    log = SegmentLog(source)
+    entries = _entries(20)
+    # The same entry logged twice is two entries, not a duplicate to drop
+    log.append(entries[:10] + entries[:1])
+    folded = store.get()
+    log.append(entries[10:])
+    folded = store.get()
+    assert store.appends == 2 and store.loads == 1
+    assert len(folded.frame) == base + 21
+
+    fresh = DatasetStore(source).get()
+    pd.testing.assert_frame_equal(folded.frame, fresh.frame)
+    pd.testing.assert_frame_equal(folded.labeled, fresh.labeled)
+    assert len(load_log(source)[0]) == base + 21
+
+def test_compaction_keeps_every_logged_row(source):
+    log = SegmentLog(source)
+    base = len(load_log(source)[0])
+    entries = _entries(10)
+    log.append(entries + entries)
+    assert log.compact() is not None
+    assert log.compact() is None  # already current
+
+    log.append(entries[:3])
+    frame, _, position = load_log(source)
+    assert len(frame) == base + 23
+    assert position == tuple(log.stats()['position'])
+    pd.testing.assert_frame_equal(frame, DatasetStore(source).get().frame)
+
+def test_concurrent_appends_are_group_committed(source):
+    base = len(load_log(source)[0])
+    log = SegmentLog(source, fsync='batch')
+    entries = _entries(4)
+    errors = []
+
+    def client():
+        try:
+            for _ in range(10):
+                log.append(entries)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=client) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert log.entries == 8 * 10 * 4
+    assert log.batches <= 8 * 10
+    assert log.fsyncs == log.batches
+    assert len(load_log(source)[0]) == base + 320
+
+def test_commit_thread_survives_an_unexpected_error(source, monkeypatch):
+    log = SegmentLog(source)
+    write = log._write
+    calls = []
+
+    def failing_write(data):
+        calls.append(data)
+        if len(calls) == 1:
+            raise RuntimeError('boom')
+        write(data)
+
+    monkeypatch.setattr(log, '_write', failing_write)
+    with pytest.raises(RuntimeError):
+        log.append(_entries(2))
+    assert log.append(_entries(3)) == 3
+    assert log.entries == 3
+
+def test_interval_policy_syncs_a_segment_before_rolling_over(source, monkeypatch):
+    log = SegmentLog(source, fsync='interval', fsync_seconds=3600, max_segment_bytes=1)
+    synced = []
+    sync_path = log._sync_path
+    monkeypatch.setattr(log, '_sync_path', lambda path: synced.append(path) or sync_path(path))
+    log.append(_entries(2))
+    log.append(_entries(2))
+    assert [os.path.basename(path) for path in synced] == ['seg-00000000.csv']
+    assert log._unsynced  # the new segment waits for the next interval
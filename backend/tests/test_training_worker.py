@@ -0,0 +1,46 @@
+import os
+import time
+
+import pytest
+
+from backend.benchmarks.synthetic import write_log
+from backend.model import artifacts
+from backend.model.training_worker import ModelSlot, TrainingWorker
+
+def _wait(job, timeout=120):
+    deadline = time.monotonic() + timeout
+    while job.status in ('queued', 'running'):
+        assert time.monotonic() < deadline, "training job did not finish"
+        time.sleep(0.05)
+    return job
+
+@pytest.fixture
+def worker(tmp_path):
+    data_path = write_log(str(tmp_path / 'data' / 'log.csv'), 600)
+    model_dir = tmp_path / 'model'
+    model_dir.mkdir()
+    return TrainingWorker(data_path, ModelSlot(), model_dir=str(model_dir))
+
+def test_jobs_publish_into_the_workers_model_dir(worker):
+    default_version = artifacts.current_version()
+    for mode in ('full', 'incremental'):
+        job = _wait(worker.submit(mode)[0])
+        assert job.status == 'done' and job.published, job.error
+        assert artifacts.current_version(worker.model_dir) == job.version
+        assert worker.slot.get().version == job.version
+        assert os.path.isdir(artifacts.version_dir(job.version, worker.model_dir))
+    assert artifacts.current_version() == default_version
+
+def test_failed_smoke_test_rolls_back(worker, monkeypatch):
+    live = _wait(worker.submit('full')[0])
+    assert live.status == 'done', live.error
+
+    def broken(serving):
+        raise ValueError("bad model")
+    monkeypatch.setattr(artifacts, 'smoke_test', broken)
+    job = _wait(worker.submit('full')[0])
+
+    assert job.status == 'rolled_back'
+    assert not os.path.exists(artifacts.version_dir(job.version, worker.model_dir))
+    assert artifacts.current_version(worker.model_dir) == live.version
+    assert worker.slot.get().version == live.version
@@ -0,0 +1,97 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# Scatter and line charts over more rows than this are reduced before they
+# are drawn, so render time stops growing with the size of the log
+MAX_POINTS = int(os.environ.get('PLOT_MAX_POINTS', 2000))
+
+# Bins per axis of the density grid that replaces a large scatter plot
+DENSITY_BINS = int(os.environ.get('PLOT_DENSITY_BINS', 60))
+
+def _numeric(values):
+    """float64 array of a Series; datetimes become nanoseconds"""
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.to_numpy(dtype='datetime64[ns]').astype(np.int64).astype(np.float64)
+    return values.to_numpy(dtype=np.float64)
+
+def lttb(x, y, n_out):
+    """Positions of the `n_out` points Largest-Triangle-Three-Buckets keeps.
+
+    The first and last points are always kept. The points between are split
+    into n_out - 2 equal buckets, and from each the point forming the largest
+    triangle with the previously kept point and the average of the next
+    bucket is chosen, which preserves peaks and troughs that evenly spaced
+    sampling would miss. x must be in ascending order.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    # Averages of every bucket, with the last point as the bucket after the last
+    sums_x = np.add.reduceat(x[1:n - 1], edges[:-1] - 1)
+    sums_y = np.add.reduceat(y[1:n - 1], edges[:-1] - 1)
+    sizes = np.diff(edges)
+    avg_x = np.append(sums_x / sizes, x[n - 1])
+    avg_y = np.append(sums_y / sizes, y[n - 1])
+
+    kept = np.empty(n_out, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        bucket_x, bucket_y = x[lo:hi], y[lo:hi]
+        # Twice the triangle area; the constant factor doesn't change the argmax
+        area = np.abs((x[a] - avg_x[i + 1]) * (bucket_y - y[a]) - (x[a] - bucket_x) * (avg_y[i + 1] - y[a]))
+        a = lo + int(area.argmax())
+        kept[i + 1] = a
+    return kept
+
+def downsample_series(df, x, y, hue=None, max_points=MAX_POINTS):
+    """Rows of a time series to draw: all of them up to `max_points`, else an
+    LTTB selection per hue group (budget split by group size).
+
+    `df` must be in x order. Returns (rows, method) with method None when
+    nothing was dropped, 'lttb' otherwise ('stride', evenly spaced rows,
+    for a non-numeric y).
+    """
+    if len(df) <= max_points:
+        return df, None
+    if hue is not None and hue in df.columns:
+        groups = list(df.groupby(hue, sort=False, observed=True).indices.values())
+    else:
+        groups = [np.arange(len(df))]
+    numeric_y = pd.api.types.is_numeric_dtype(df[y])
+    xs = _numeric(df[x]) if x in df.columns else np.arange(len(df), dtype=np.float64)
+    ys = _numeric(df[y]) if numeric_y else None
+
+    kept = []
+    for positions in groups:
+        budget = max(3, int(max_points * len(positions) / len(df)))
+        if not numeric_y:
+            kept.append(positions[np.linspace(0, len(positions) - 1, min(budget, len(positions))).astype(np.int64)])
+            continue
+        valid = positions[~np.isnan(ys[positions]) & ~np.isnan(xs[positions])]
+        kept.append(valid[lttb(xs[valid], ys[valid], budget)])
+    rows = np.sort(np.concatenate(kept))
+    return df.take(rows), 'lttb' if numeric_y else 'stride'
+
+def density_grid(x_values, y_values, bins=DENSITY_BINS):
+    """2-D histogram of two numeric Series: (counts, x edges, y edges).
+
+    counts[i, j] is the number of rows in x bin i and y bin j; rows with a
+    missing value are left out.
+    """
+    x = _numeric(x_values)
+    y = _numeric(y_values)
+    present = ~np.isnan(x) & ~np.isnan(y)
+    return np.histogram2d(x[present], y[present], bins=bins)
+
+def sample_rows(df, max_points=MAX_POINTS, seed=0):
+    """A fixed random subset of rows, in their original order"""
+    if len(df) <= max_points:
+        return df
+    rows = np.sort(np.random.default_rng(seed).choice(len(df), max_points, replace=False))
+    return df.take(rows)
@@ -0,0 +1,66 @@
+import numbers
+
+import pandas as pd
+
+# Define the task mapping - this is crucial!
+TASK_MAPPING = {
+    0: 'Study', 
+    1: 'Exercise', 
+    2: 'Social', 
+    3: 'Leisure', 
+    4: 'Sleep', 
+    5: 'Work'
+}
+
+DAY_MAPPING = {
+    0: 'Mon', 1: 'Tue', 2: 'Wed', 3: 'Thu', 4: 'Fri', 5: 'Sat', 6: 'Sun'
+}
+
+def needs_mappings(df):
+    """Whether TaskType/DayOfWeek still hold numeric codes rather than labels"""
+    return any(
+        col in df.columns and pd.api.types.is_numeric_dtype(df[col])
+        for col in ('TaskType', 'DayOfWeek')
+    )
+
+def task_labels(mapping):
+    """TaskType code -> label for a cleaned log.
+
+    `mapping` is the code -> original value mapping from
+    preprocess.encode_tasktypes, which numbers the task types found in the
+    log in sorted order. Logs that store numeric task codes are labelled
+    with TASK_MAPPING; logs that store task names keep those names.
+    """
+    labels = {}
+    for code, value in mapping.items():
+        if isinstance(value, numbers.Number) and float(value).is_integer():
+            labels[code] = TASK_MAPPING.get(int(value), str(int(value)))
+        else:
+            labels[code] = str(value)
+    return labels
+
+def apply_mappings(df, tasks=None):
+    """Apply task type and day mappings to dataframe.
+
+    TaskType codes are labelled with `tasks` (see task_labels) when given,
+    otherwise with TASK_MAPPING. Frames that are already labelled (such as
+    those handed out by the dataset store) are returned as-is instead of
+    being copied.
+    """
+    if not needs_mappings(df):
+        return df
+
+    # Shallow copy: replacing the mapped columns leaves the caller's frame untouched
+    df_plot = df.copy(deep=False)
+    
+    # Map TaskType to meaningful names
+    if 'TaskType' in df_plot.columns:
+        if pd.api.types.is_numeric_dtype(df_plot['TaskType']):
+            df_plot['TaskType'] = df_plot['TaskType'].map(TASK_MAPPING if tasks is None else tasks).fillna('Unknown')
+    
+    # Map DayOfWeek to day names
+    if 'DayOfWeek' in df_plot.columns:
+        if pd.api.types.is_numeric_dtype(df_plot['DayOfWeek']):
+            df_plot['DayOfWeek'] = df_plot['DayOfWeek'].map(DAY_MAPPING).fillna('Unknown')
+    
+    return df_plot
@@ -0,0 +1,186 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Staging files older than this were left by a process that died mid-render
+STALE_STAGING_SECONDS = 3600
+
+def _file_digest(path, chunk_size=1 << 20):
+    """Hash a file's contents in fixed-size chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+class PlotCache:
+    """Content-addressed cache of rendered plot files with LRU eviction.
+
+    Entries are keyed on the graph type, the requested columns, a fingerprint
+    of the data file contents and any render options, so a repeat request for
+    the same chart over the same data is served from disk without rendering.
+    When a data file changes its fingerprint changes, and every entry built
+    from its old contents is dropped. Entries from other data files (the
+    `source` passed to put) are kept. Each entry can carry a small `info`
+    dict about the render (such as the points drawn), returned by info().
+    """
+
+    def __init__(self, cache_dir, max_entries=128, max_bytes=256 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (path, size, fingerprint, source, info)
+        self._total_bytes = 0
+        self._fingerprints = {}  # data path -> ((size, mtime_ns), digest)
+        self._current_fingerprints = {}  # source -> fingerprint of the last put
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self._clear_orphans()
+
+    def _clear_orphans(self):
+        """Remove staging files abandoned by a process that died mid-render.
+
+        The directory is shared by every server process, so published
+        entries and recent staging files (another worker may be rendering
+        into them) are left alone.
+        """
+        cutoff = time.time() - STALE_STAGING_SECONDS
+        for name in os.listdir(self.cache_dir):
+            if '.tmp.' not in name:
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def data_fingerprint(self, data_path):
+        """Fingerprint of the data file, re-hashed only when its size or mtime changes"""
+        stat = os.stat(data_path)
+        signature = (stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            cached = self._fingerprints.get(data_path)
+        if cached and cached[0] == signature:
+            return cached[1]
+
+        digest = _file_digest(data_path)
+        with self._lock:
+            self._fingerprints[data_path] = (signature, digest)
+        return digest
+
+    @staticmethod
+    def make_key(graph_type, columns, fingerprint, options=None):
+        """Build the cache key for a render request"""
+        payload = json.dumps({
+            'graph_type': graph_type,
+            'columns': list(columns),
+            'data': fingerprint,
+            'options': options or {}
+        }, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+
+    def path_for(self, key, extension='png'):
+        """Final path of the cache entry for this key"""
+        return os.path.join(self.cache_dir, f"{key}.{extension}")
+
+    def staging_path(self, key, extension='png', token=None):
+        """Private path to render into before the file is published with put()"""
+        # Thread idents repeat across processes, so the pid is part of the token
+        token = token or f"{os.getpid()}-{threading.get_ident()}"
+        return os.path.join(self.cache_dir, f"{key}.{token}.tmp.{extension}")
+
+    def get(self, key):
+        """Return the cached file path for a key, or None on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or not os.path.exists(entry[0]):
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def info(self, key):
+        """The info stored with a cache entry, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry[4] if entry is not None else None
+
+    def put(self, key, rendered_path, fingerprint, extension='png', source=None, info=None):
+        """Publish a freshly rendered file under its key and evict down to the budget.
+
+        `source` names the data file the chart was built from (None for the
+        main log).
+        """
+        path = self.path_for(key, extension)
+        # Atomic rename so concurrent renders of the same chart never expose a partial file
+        os.replace(rendered_path, path)
+        size = os.path.getsize(path)
+        with self._lock:
+            if fingerprint != self._current_fingerprints.get(source):
+                # The data changed since the last render: entries built from
+                # the old contents can never be hit again.
+                stale = [k for k, (_, _, fp, src, _) in self._entries.items() if src == source and fp != fingerprint]
+                for stale_key in stale:
+                    self._drop(stale_key)
+                self._current_fingerprints[source] = fingerprint
+
+            if key in self._entries:
+                self._total_bytes -= self._entries[key][1]
+            self._entries[key] = (path, size, fingerprint, source, info)
+            self._entries.move_to_end(key)
+            self._total_bytes += size
+
+            while self._entries and (len(self._entries) > self.max_entries
+                                     or self._total_bytes > self.max_bytes):
+                oldest = next(iter(self._entries))
+                if oldest == key and len(self._entries) == 1:
+                    break
+                self._drop(oldest)
+                self.evictions += 1
+        return path
+
+    def put_bytes(self, key, data, fingerprint, extension='png', source=None, info=None):
+        """Publish an in-memory render under its key"""
+        staging = self.staging_path(key, extension)
+        with open(staging, 'wb') as f:
+            f.write(data)
+        return self.put(key, staging, fingerprint, extension, source, info)
+
+    def _drop(self, key):
+        path, size, _, _, _ = self._entries.pop(key)
+        self._total_bytes -= size
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            for key in list(self._entries):
+                self._drop(key)
+
+    def stats(self):
+        """Counters for the /health endpoint"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._total_bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
@@ -0,0 +1,33 @@
+# Output format and resolution tiers selectable per request. 'print' is the
+# original 300 dpi PNG and stays the default; 'data' skips matplotlib and
+# returns the aggregated series as JSON for the frontend to draw.
+RENDER_PROFILES = {
+    'thumbnail': {'format': 'png', 'dpi': 40, 'mimetype': 'image/png'},
+    'screen': {'format': 'png', 'dpi': 100, 'mimetype': 'image/png'},
+    'print': {'format': 'png', 'dpi': 300, 'mimetype': 'image/png'},
+    'svg': {'format': 'svg', 'mimetype': 'image/svg+xml'},
+    'data': {'format': 'json', 'mimetype': 'application/json'}
+}
+DEFAULT_PROFILE = 'print'
+
+GRAPH_TYPES = ('histogram', 'bar', 'scatter', 'line', 'heatmap')
+
+def validate_chart_request(graph_type, column1, column2, columns, profile=DEFAULT_PROFILE):
+    """Return an error message for an invalid chart request, or None if it is valid"""
+    if not graph_type:
+        return "Graph type is required"
+    if not column1:
+        return "Column1 is required"
+    if column1 not in columns:
+        return f"Column '{column1}' not found in data"
+    if column2 and column2 not in columns:
+        return f"Column '{column2}' not found in data"
+    if graph_type not in GRAPH_TYPES:
+        return f"Invalid graph type: {graph_type}"
+    if graph_type == "bar" and not column2:
+        return "Column2 is required for bar charts"
+    if graph_type == "scatter" and not column2:
+        return "Column2 is required for scatter plots"
+    if profile not in RENDER_PROFILES:
+        return f"Invalid render profile: {profile}. Choose from {', '.join(RENDER_PROFILES)}"
+    return None
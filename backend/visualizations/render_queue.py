@@ -0,0 +1,355 @@
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+
+from backend.visualizations.render_profiles import RENDER_PROFILES
+
+logger = logging.getLogger(__name__)
+
+# Per-worker dataset stores, created once by the pool initializer: the main
+# log's, and one per other data file (tenant logs) rendered from
+_worker_store = None
+_worker_stores = None
+
+def _warm_worker(data_path):
+    """Pool initializer: import the plotting stack and load the data once per worker"""
+    global _worker_store, _worker_stores
+    import backend.visualizations.visualize_data  # noqa: F401
+    from backend.store.dataset_store import DatasetStore, DatasetStores
+
+    _worker_store = DatasetStore(data_path)
+    _worker_stores = DatasetStores()
+    try:
+        _worker_store.get()
+    except OSError:
+        # Missing data file: each job will report the error instead
+        pass
+
+def _ping():
+    return os.getpid()
+
+def _worker_dataset(data_path):
+    return _worker_store.get() if data_path is None else _worker_stores.get(data_path)
+
+def _render_job(graph_type, column1, column2, save_path, profile, data_path=None, window=None):
+    """Runs inside a worker process"""
+    from backend.visualizations.visualize_data import render_chart
+
+    started_at = time.time()
+    summary = render_chart(_worker_dataset(data_path), graph_type, column1, column2, save_path, profile, window)
+    return {'started_at': started_at, 'finished_at': time.time(), 'pid': os.getpid(), 'summary': summary}
+
+def _render_bytes_job(graph_type, column1, column2, profile, data_path=None, window=None):
+    """Runs inside a worker process; returns the image instead of writing a file"""
+    from backend.visualizations.visualize_data import render_chart
+
+    started_at = time.time()
+    buffer = BytesIO()
+    summary = render_chart(_worker_dataset(data_path), graph_type, column1, column2, buffer, profile, window)
+    return buffer.getvalue(), {'started_at': started_at, 'finished_at': time.time(), 'pid': os.getpid(),
+                               'summary': summary}
+
+def _percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return round(ordered[index], 4)
+
+class RenderQueueFull(Exception):
+    """Raised by RenderQueue.submit when max_pending renders are already in flight"""
+
+class RenderJob:
+    """State of one asynchronous plot render"""
+
+    def __init__(self, cache_key, graph_type, column1, column2, profile):
+        self.job_id = uuid.uuid4().hex
+        self.cache_key = cache_key
+        self.graph_type = graph_type
+        self.column1 = column1
+        self.column2 = column2
+        self.profile = profile
+        self.status = 'queued'
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.result_path = None
+        self.summary = None
+        self.error = None
+        self.future = None
+
+    def refresh(self):
+        if self.status == 'queued' and self.future is not None and self.future.running():
+            self.status = 'running'
+
+    def to_dict(self):
+        self.refresh()
+        info = {
+            'job_id': self.job_id,
+            'status': self.status,
+            'graph_type': self.graph_type,
+            'column1': self.column1,
+            'column2': self.column2,
+            'profile': self.profile,
+            'submitted_at': self.submitted_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at
+        }
+        if self.summary is not None:
+            info['points'] = self.summary.get('points')
+            info['reduction'] = self.summary.get('reduction')
+        if self.error:
+            info['error'] = self.error
+        return info
+
+    def to_record(self):
+        """to_dict() plus what another process needs to serve the result"""
+        info = self.to_dict()
+        info['cache_key'] = self.cache_key
+        info['result_path'] = self.result_path
+        info['summary'] = self.summary
+        return info
+
+    @classmethod
+    def from_record(cls, info):
+        job = cls(info['cache_key'], info['graph_type'], info['column1'], info['column2'], info['profile'])
+        job.job_id = info['job_id']
+        job.status = info['status']
+        job.submitted_at = info['submitted_at']
+        job.started_at = info['started_at']
+        job.finished_at = info['finished_at']
+        job.result_path = info.get('result_path')
+        job.summary = info.get('summary')
+        job.error = info.get('error')
+        return job
+
+class RenderQueue:
+    """Renders plots in a pool of pre-warmed worker processes.
+
+    matplotlib's pyplot state is global to a process, so rendering in
+    separate processes keeps concurrent requests from trampling each other
+    and keeps slow charts off the Flask request threads. Requests for a
+    chart that is already queued or rendering share the in-flight job.
+    Finished renders are published to the plot cache.
+
+    With `max_pending`, submitting a new chart while that many renders are
+    queued or running raises RenderQueueFull instead of growing the queue.
+    With `records` (a JobRecords), job status is also written to disk so
+    other server processes can answer status requests. Charts are drawn
+    from `data_path` unless a request names another data file (a tenant's
+    log). A request's time window (date_index.parse_window) is applied by
+    the worker.
+    """
+
+    def __init__(self, data_path, plot_cache, max_workers=None, max_jobs=1000, render_stats=None,
+                 max_pending=None, records=None):
+        self.data_path = data_path
+        self.plot_cache = plot_cache
+        self.render_stats = render_stats
+        self.max_workers = max_workers or max(1, min(4, (os.cpu_count() or 1) - 1))
+        self.max_jobs = max_jobs
+        self.max_pending = max_pending
+        self.records = records
+        self._executor = None
+        self._jobs = OrderedDict()  # job_id -> RenderJob, oldest first
+        self._in_flight = {}  # cache_key -> RenderJob
+        self._lock = threading.Lock()
+        self._started_at = None
+        self._busy_seconds = 0.0
+        self._render_seconds = deque(maxlen=500)
+        self._wait_seconds = deque(maxlen=500)
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.coalesced = 0
+        self.rejected = 0
+
+    def start(self):
+        """Create the pool and spawn every worker up front"""
+        with self._lock:
+            executor = self._ensure_executor()
+        for future in [executor.submit(_ping) for _ in range(self.max_workers)]:
+            future.result()
+
+    def _ensure_executor(self):
+        if self._executor is None:
+            # fork keeps start-up cheap: workers inherit the already imported
+            # libraries. Import the plotting stack here first, so no fork
+            # happens while another thread is halfway through importing it.
+            import backend.visualizations.visualize_data  # noqa: F401
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context('fork'),
+                initializer=_warm_worker,
+                initargs=(self.data_path,)
+            )
+            self._started_at = time.time()
+        return self._executor
+
+    def submit(self, cache_key, fingerprint, graph_type, column1, column2, profile, data_path=None,
+               window=None):
+        """Queue a render, or join the in-flight job for the same chart.
+
+        Returns (job, coalesced).
+        """
+        with self._lock:
+            job = self._in_flight.get(cache_key)
+            if job is not None:
+                self.coalesced += 1
+                return job, True
+            if self.max_pending is not None and len(self._in_flight) >= self.max_pending:
+                self.rejected += 1
+                raise RenderQueueFull(f"{len(self._in_flight)} renders already in flight")
+
+            job = RenderJob(cache_key, graph_type, column1, column2, profile)
+            save_path = self.plot_cache.staging_path(
+                cache_key, RENDER_PROFILES[profile]['format'], token=job.job_id)
+            executor = self._ensure_executor()
+            try:
+                future = executor.submit(
+                    _render_job, graph_type, column1, column2, save_path, profile, data_path, window)
+            except BrokenProcessPool:
+                # A worker died; replace the pool and retry once
+                self._executor = None
+                future = self._ensure_executor().submit(
+                    _render_job, graph_type, column1, column2, save_path, profile, data_path, window)
+
+            job.future = future
+            self._in_flight[cache_key] = job
+            self._remember(job)
+            self.submitted += 1
+
+        self._record(job)
+        future.add_done_callback(
+            lambda done: self._on_done(job, done, save_path, fingerprint, data_path))
+        return job, False
+
+    def render(self, graph_type, column1, column2, profile, timeout=None, data_path=None, window=None):
+        """Render one chart in the pool and wait for its bytes.
+
+        For synchronous requests: the calling thread only waits, so the
+        rendering itself doesn't compete with the server's threads for the GIL.
+        Returns (image bytes, seconds spent rendering, render_chart summary).
+        """
+        with self._lock:
+            executor = self._ensure_executor()
+        try:
+            future = executor.submit(_render_bytes_job, graph_type, column1, column2, profile, data_path, window)
+        except BrokenProcessPool:
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+                executor = self._ensure_executor()
+            future = executor.submit(_render_bytes_job, graph_type, column1, column2, profile, data_path, window)
+        image, timing = future.result(timeout)
+        return image, timing['finished_at'] - timing['started_at'], timing['summary']
+
+    def record_cached(self, cache_key, graph_type, column1, column2, profile, path, summary=None):
+        """Create an already finished job for a chart served from the cache"""
+        job = RenderJob(cache_key, graph_type, column1, column2, profile)
+        job.status = 'done'
+        job.started_at = job.finished_at = job.submitted_at
+        job.result_path = path
+        job.summary = summary
+        with self._lock:
+            self._remember(job)
+        self._record(job)
+        return job
+
+    def _record(self, job):
+        if self.records is not None:
+            self.records.save(job.to_record())
+
+    def _remember(self, job):
+        self._jobs[job.job_id] = job
+        while len(self._jobs) > self.max_jobs:
+            oldest_id, oldest = next(iter(self._jobs.items()))
+            if oldest.status in ('queued', 'running'):
+                break
+            del self._jobs[oldest_id]
+
+    def _on_done(self, job, future, save_path, fingerprint, data_path=None):
+        try:
+            timing = future.result()
+            job.summary = timing['summary']
+            job.result_path = self.plot_cache.put(
+                job.cache_key, save_path, fingerprint, RENDER_PROFILES[job.profile]['format'], data_path,
+                job.summary)
+            job.started_at = timing['started_at']
+            job.finished_at = timing['finished_at']
+            job.status = 'done'
+            with self._lock:
+                self.completed += 1
+                render_seconds = job.finished_at - job.started_at
+                self._busy_seconds += render_seconds
+                self._render_seconds.append(render_seconds)
+                self._wait_seconds.append(max(0.0, job.started_at - job.submitted_at))
+            if self.render_stats is not None:
+                self.render_stats.record(job.profile, render_seconds, os.path.getsize(job.result_path))
+        except Exception as e:
+            logger.exception("Render job %s failed", job.job_id)
+            job.error = str(e)
+            job.finished_at = time.time()
+            job.status = 'failed'
+            if os.path.exists(save_path):
+                os.remove(save_path)
+            with self._lock:
+                self.failed += 1
+        finally:
+            job.future = None
+            with self._lock:
+                if self._in_flight.get(job.cache_key) is job:
+                    del self._in_flight[job.cache_key]
+            self._record(job)
+
+    def get(self, job_id):
+        """A job by id; jobs accepted by other processes come from the records"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None and self.records is not None:
+            info = self.records.load(job_id)
+            if info is not None:
+                job = RenderJob.from_record(info)
+        return job
+
+    def stats(self):
+        """Queue depth, worker utilization and render latency"""
+        with self._lock:
+            in_flight = list(self._in_flight.values())
+            for job in in_flight:
+                job.refresh()
+            # The executor marks jobs running as soon as they enter its call
+            # queue, which can run ahead of the workers; cap at the pool size.
+            running = min(self.max_workers, sum(1 for job in in_flight if job.status == 'running'))
+            elapsed = time.time() - self._started_at if self._started_at else 0.0
+            return {
+                'workers': self.max_workers,
+                'pool_started': self._executor is not None,
+                'queue_depth': len(in_flight) - running,
+                'running': running,
+                'utilization': round(running / self.max_workers, 4),
+                'busy_fraction': round(self._busy_seconds / (elapsed * self.max_workers), 4) if elapsed else 0.0,
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'failed': self.failed,
+                'coalesced': self.coalesced,
+                'rejected': self.rejected,
+                'max_pending': self.max_pending,
+                'render_seconds_p50': _percentile(self._render_seconds, 50),
+                'render_seconds_p95': _percentile(self._render_seconds, 95),
+                'queue_wait_seconds_p50': _percentile(self._wait_seconds, 50),
+                'queue_wait_seconds_p95': _percentile(self._wait_seconds, 95)
+            }
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=not wait)
@@ -0,0 +1,37 @@
+import threading
+
+class RenderProfileStats:
+    """Render time and payload size per render profile.
+
+    Used to compare how much each output tier costs so the cheapest one
+    that still looks acceptable can be picked for each chart.
+    """
+
+    def __init__(self):
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def record(self, profile, seconds, payload_bytes):
+        with self._lock:
+            entry = self._stats.setdefault(profile, {
+                'renders': 0, 'total_seconds': 0.0, 'total_bytes': 0,
+                'max_seconds': 0.0, 'max_bytes': 0
+            })
+            entry['renders'] += 1
+            entry['total_seconds'] += seconds
+            entry['total_bytes'] += payload_bytes
+            entry['max_seconds'] = max(entry['max_seconds'], seconds)
+            entry['max_bytes'] = max(entry['max_bytes'], payload_bytes)
+
+    def stats(self):
+        with self._lock:
+            return {
+                profile: {
+                    'renders': entry['renders'],
+                    'avg_seconds': round(entry['total_seconds'] / entry['renders'], 4),
+                    'max_seconds': round(entry['max_seconds'], 4),
+                    'avg_bytes': int(entry['total_bytes'] / entry['renders']),
+                    'max_bytes': entry['max_bytes']
+                }
+                for profile, entry in self._stats.items()
+            }
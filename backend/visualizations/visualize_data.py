@@ -1,238 +1,419 @@
 import matplotlib
 matplotlib.use('Agg')  # Use non-GUI backend
 import matplotlib.pyplot as plt
+from matplotlib import colormaps
+from matplotlib.artist import setp
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
 import seaborn as sns
 import pandas as pd
 import numpy as np
 import os
+import json
+from io import BytesIO
+
+from backend.observability.metrics import stage
+# Re-exported: callers that don't render import these from render_profiles
+from backend.visualizations.render_profiles import (  # noqa: F401
+    DEFAULT_PROFILE,
+    GRAPH_TYPES,
+    RENDER_PROFILES,
+    validate_chart_request
+)
+from backend.visualizations.labels import apply_mappings
+from backend.visualizations.downsample import MAX_POINTS, density_grid, downsample_series, sample_rows
 
 # Set style
 plt.style.use('default')
 sns.set_palette("husl")
 
-# Define the task mapping - this is crucial!
-TASK_MAPPING = {
-    0: 'Study', 
-    1: 'Exercise', 
-    2: 'Social', 
-    3: 'Leisure', 
-    4: 'Sleep', 
-    5: 'Work'
-}
-
-DAY_MAPPING = {
-    0: 'Mon', 1: 'Tue', 2: 'Wed', 3: 'Thu', 4: 'Fri', 5: 'Sat', 6: 'Sun'
-}
-
-def apply_mappings(df):
-    """Apply task type and day mappings to dataframe"""
-    df_plot = df.copy()
-    
-    # Map TaskType to meaningful names
-    if 'TaskType' in df_plot.columns:
-        if df_plot['TaskType'].dtype in ['int64', 'float64']:
-            df_plot['TaskType'] = df_plot['TaskType'].map(TASK_MAPPING).fillna('Unknown')
-    
-    # Map DayOfWeek to day names
-    if 'DayOfWeek' in df_plot.columns:
-        if df_plot['DayOfWeek'].dtype in ['int64', 'float64']:
-            df_plot['DayOfWeek'] = df_plot['DayOfWeek'].map(DAY_MAPPING).fillna('Unknown')
-    
-    return df_plot
+# Every plot function builds its own Figure on an Agg canvas rather than going
+# through pyplot's global current-figure state, so renders are safe to run
+# from several threads at once and nothing leaks when a plot fails.
+
+def new_figure(figsize):
+    """Create a standalone Figure and Axes attached to an Agg canvas"""
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    return fig, ax
+
+def save_figure(fig, save_path, profile=DEFAULT_PROFILE):
+    """Write a figure to a file path or a writable binary buffer"""
+    settings = RENDER_PROFILES[profile]
+    options = {'format': settings['format'], 'bbox_inches': 'tight'}
+    if 'dpi' in settings:
+        options['dpi'] = settings['dpi']
+    with stage('savefig'):
+        fig.tight_layout()
+        fig.savefig(save_path, **options)
+    return save_path
+
+def is_categorical(series):
+    """Whether a column should be counted rather than averaged or binned"""
+    return not pd.api.types.is_numeric_dtype(series)
+
+# Aggregation steps shared by the plots and the 'data' render profile. When
+# the dataset store's AggregateIndex is passed in they are lookups; otherwise
+# (or when the index does not cover the request) they are computed from df.
+# Each is timed as the request's 'aggregate' stage.
+
+@stage('aggregate')
+def value_counts(df, column, aggregates=None):
+    counts = aggregates.value_counts(column) if aggregates is not None else None
+    return counts if counts is not None else df[column].value_counts()
+
+@stage('aggregate')
+def group_means(df, x, y, aggregates=None):
+    means = aggregates.group_means(x, y) if aggregates is not None else None
+    return means if means is not None else df.groupby(x)[y].mean().reset_index()
+
+@stage('aggregate')
+def cross_counts(df, x, y, aggregates=None):
+    table = aggregates.cross_counts(x, y) if aggregates is not None else None
+    return table if table is not None else pd.crosstab(df[x], df[y])
+
+@stage('aggregate')
+def histogram_bins(df, column, aggregates=None):
+    bins = aggregates.histogram(column) if aggregates is not None else None
+    return bins if bins is not None else np.histogram(df[column].dropna(), bins=20)
 
-def plot_scatter(df, x, y, save_path):
+@stage('aggregate')
+def correlation(df, aggregates=None):
+    """Correlation of the numeric columns that actually vary"""
+    if aggregates is not None:
+        return aggregates.correlation()
+    numeric_cols = df.select_dtypes(include=[np.number]).columns
+    if len(numeric_cols) < 2:
+        raise Exception("Not enough numeric columns for correlation heatmap")
+
+    numeric_data = df[numeric_cols]
+    numeric_data = numeric_data.loc[:, numeric_data.var() != 0]
+
+    if numeric_data.shape[1] < 2:
+        raise Exception("Not enough varying numeric columns for correlation")
+
+    return numeric_data.corr()
+
+def plot_scatter(df, x, y, save_path, profile=DEFAULT_PROFILE):
     """Create scatter plot"""
     try:
-        plt.figure(figsize=(14, 10))
+        fig, ax = new_figure((14, 10))
         
         # Apply mappings
         df_plot = apply_mappings(df)
         
         if 'TaskType' in df_plot.columns and x != 'TaskType' and y != 'TaskType':
-            sns.scatterplot(data=df_plot, x=x, y=y, hue='TaskType', palette='viridis', s=80, alpha=0.7)
+            sns.scatterplot(data=df_plot, x=x, y=y, hue='TaskType', palette='viridis', s=80, alpha=0.7, ax=ax)
         else:
-            sns.scatterplot(data=df_plot, x=x, y=y, s=80, alpha=0.7)
-        
-        plt.title(f'Scatter Plot: {y} vs {x}', fontsize=20, fontweight='bold')
-        plt.xlabel(x, fontsize=16)
-        plt.ylabel(y, fontsize=16)
-        plt.grid(True, alpha=0.3)
-        plt.tight_layout()
-        plt.savefig(save_path, dpi=300, bbox_inches='tight')
-        plt.close()
-        return save_path
+            sns.scatterplot(data=df_plot, x=x, y=y, s=80, alpha=0.7, ax=ax)
+        
+        ax.set_title(f'Scatter Plot: {y} vs {x}', fontsize=20, fontweight='bold')
+        ax.set_xlabel(x, fontsize=16)
+        ax.set_ylabel(y, fontsize=16)
+        ax.grid(True, alpha=0.3)
+        return save_figure(fig, save_path, profile)
+    except Exception as e:
+        raise Exception(f"Error creating scatter plot: {str(e)}")
+
+def plot_density(grid, x, y, rows, save_path, profile=DEFAULT_PROFILE):
+    """Scatter plot of many rows drawn as a density grid (see density_grid)"""
+    try:
+        fig, ax = new_figure((14, 10))
+        counts, x_edges, y_edges = grid
+        mesh = ax.pcolormesh(x_edges, y_edges, np.ma.masked_equal(counts.T, 0), cmap='viridis', shading='flat')
+        colorbar = fig.colorbar(mesh, ax=ax)
+        colorbar.set_label('Rows', fontsize=14)
+        
+        ax.set_title(f'Scatter Plot: {y} vs {x} (density of {rows:,} rows)', fontsize=20, fontweight='bold')
+        ax.set_xlabel(x, fontsize=16)
+        ax.set_ylabel(y, fontsize=16)
+        ax.grid(True, alpha=0.3)
+        return save_figure(fig, save_path, profile)
     except Exception as e:
-        plt.close()
         raise Exception(f"Error creating scatter plot: {str(e)}")
 
-def plot_histogram(df, column, save_path):
+def _count_bars(ax, counts):
+    """Bar chart of category counts with the count written above each bar"""
+    colors = colormaps['viridis'](np.linspace(0, 1, len(counts)))
+    bars = ax.bar(range(len(counts)), counts.values, color=colors, alpha=0.8)
+    ax.set_xticks(range(len(counts)))
+    ax.set_xticklabels(counts.index, rotation=45, fontsize=14, ha='right')
+    
+    # Add value labels on bars
+    for bar, value in zip(bars, counts.values):
+        ax.text(bar.get_x() + bar.get_width()/2, bar.get_height() + max(counts.values) * 0.01,
+                str(value), ha='center', va='bottom', fontsize=12, fontweight='bold')
+
+def plot_histogram(df, column, save_path, profile=DEFAULT_PROFILE, aggregates=None):
     """Create histogram"""
     try:
-        plt.figure(figsize=(14, 10))
+        fig, ax = new_figure((14, 10))
         
         # Apply mappings
         df_plot = apply_mappings(df)
         
-        if column == 'TaskType' or df_plot[column].dtype == 'object':
+        if column == 'TaskType' or is_categorical(df_plot[column]):
             # For categorical data, create a count plot
-            value_counts = df_plot[column].value_counts()
-            
-            # Create a beautiful bar chart
-            colors = plt.cm.viridis(np.linspace(0, 1, len(value_counts)))
-            bars = plt.bar(range(len(value_counts)), value_counts.values, color=colors, alpha=0.8)
-            
-            # Set labels
-            plt.xticks(range(len(value_counts)), value_counts.index, rotation=45, fontsize=14, ha='right')
-            plt.title(f'Distribution of {column}', fontsize=20, fontweight='bold')
-            plt.xlabel(column, fontsize=16)
-            plt.ylabel('Count', fontsize=16)
-            
-            # Add value labels on bars
-            for bar, value in zip(bars, value_counts.values):
-                plt.text(bar.get_x() + bar.get_width()/2, bar.get_height() + max(value_counts.values) * 0.01, 
-                        str(value), ha='center', va='bottom', fontsize=12, fontweight='bold')
+            _count_bars(ax, value_counts(df_plot, column, aggregates))
+            ax.set_title(f'Distribution of {column}', fontsize=20, fontweight='bold')
+            ax.set_xlabel(column, fontsize=16)
+            ax.set_ylabel('Count', fontsize=16)
         else:
-            # For numeric data, create histogram
-            sns.histplot(df_plot[column], bins=20, kde=True, color='skyblue', alpha=0.7)
-            plt.title(f'Distribution of {column}', fontsize=20, fontweight='bold')
-            plt.xlabel(column, fontsize=16)
-            plt.ylabel('Frequency', fontsize=16)
-        
-        plt.grid(True, alpha=0.3)
-        plt.tight_layout()
-        plt.savefig(save_path, dpi=300, bbox_inches='tight')
-        plt.close()
-        return save_path
+            # For numeric data, draw the bins the aggregate index already holds
+            counts, edges = histogram_bins(df_plot, column, aggregates)
+            ax.bar(edges[:-1], counts, width=np.diff(edges), align='edge',
+                   color='skyblue', alpha=0.7, edgecolor='white')
+            ax.set_title(f'Distribution of {column}', fontsize=20, fontweight='bold')
+            ax.set_xlabel(column, fontsize=16)
+            ax.set_ylabel('Frequency', fontsize=16)
+        
+        ax.grid(True, alpha=0.3)
+        return save_figure(fig, save_path, profile)
     except Exception as e:
-        plt.close()
         raise Exception(f"Error creating histogram: {str(e)}")
 
-def plot_line(df, y, save_path):
-    """Create line plot"""
+def plot_line(df, y, save_path, profile=DEFAULT_PROFILE, ordered=False):
+    """Create line plot.
+
+    With ordered=True the rows are already in date order with parsed dates
+    (Dataset.in_date_order()) and are plotted as they are.
+    """
     try:
-        plt.figure(figsize=(16, 10))
+        fig, ax = new_figure((16, 10))
         
         # Apply mappings
         df_plot = apply_mappings(df)
         
         if 'Date' in df_plot.columns:
-            df_sorted = df_plot.sort_values("Date")
-            df_sorted['Date'] = pd.to_datetime(df_sorted['Date'], errors='coerce')
+            df_sorted = df_plot if ordered else _sorted_by_date(df_plot)
             
             if 'TaskType' in df_plot.columns and y != 'TaskType':
-                sns.lineplot(data=df_sorted, x='Date', y=y, hue='TaskType', marker='o', linewidth=2)
+                sns.lineplot(data=df_sorted, x='Date', y=y, hue='TaskType', marker='o', linewidth=2, ax=ax)
             else:
-                sns.lineplot(data=df_sorted, x='Date', y=y, marker='o', linewidth=2)
+                sns.lineplot(data=df_sorted, x='Date', y=y, marker='o', linewidth=2, ax=ax)
         else:
             if 'TaskType' in df_plot.columns and y != 'TaskType':
-                sns.lineplot(data=df_plot, x=df_plot.index, y=y, hue='TaskType', marker='o', linewidth=2)
+                sns.lineplot(data=df_plot, x=df_plot.index, y=y, hue='TaskType', marker='o', linewidth=2, ax=ax)
             else:
-                sns.lineplot(data=df_plot, x=df_plot.index, y=y, marker='o', linewidth=2)
-        
-        plt.title(f'Time Series: {y}', fontsize=20, fontweight='bold')
-        plt.xlabel('Date' if 'Date' in df_plot.columns else 'Index', fontsize=16)
-        plt.ylabel(y, fontsize=16)
-        plt.xticks(rotation=45, fontsize=12)
-        plt.yticks(fontsize=12)
-        plt.grid(True, alpha=0.3)
-        plt.tight_layout()
-        plt.savefig(save_path, dpi=300, bbox_inches='tight')
-        plt.close()
-        return save_path
+                sns.lineplot(data=df_plot, x=df_plot.index, y=y, marker='o', linewidth=2, ax=ax)
+        
+        ax.set_title(f'Time Series: {y}', fontsize=20, fontweight='bold')
+        ax.set_xlabel('Date' if 'Date' in df_plot.columns else 'Index', fontsize=16)
+        ax.set_ylabel(y, fontsize=16)
+        ax.tick_params(axis='x', labelrotation=45, labelsize=12)
+        ax.tick_params(axis='y', labelsize=12)
+        ax.grid(True, alpha=0.3)
+        return save_figure(fig, save_path, profile)
     except Exception as e:
-        plt.close()
         raise Exception(f"Error creating line plot: {str(e)}")
 
-def plot_bar(df, x, y, save_path):
+def _line_hue(df, y):
+    return 'TaskType' if 'TaskType' in df.columns and y != 'TaskType' else None
+
+def line_rows(ordered, y, max_points=MAX_POINTS):
+    """Rows of a date-ordered frame to draw for a line chart: (rows, reduction)"""
+    x = 'Date' if 'Date' in ordered.columns else None
+    return downsample_series(ordered, x, y, _line_hue(ordered, y), max_points)
+
+def scatter_reduction(df, x, y, max_points=MAX_POINTS):
+    """What a scatter chart draws: (rows or density grid, reduction, points).
+
+    Up to `max_points` rows every row is drawn. Above that two numeric
+    columns become a density grid (points = occupied cells), and anything
+    else is drawn from a fixed sample of max_points rows.
+    """
+    if len(df) <= max_points:
+        return df, None, int(len(df))
+    if pd.api.types.is_numeric_dtype(df[x]) and pd.api.types.is_numeric_dtype(df[y]):
+        grid = density_grid(df[x], df[y])
+        return grid, 'density', int(np.count_nonzero(grid[0]))
+    sample = sample_rows(df, max_points)
+    return sample, 'sample', int(len(sample))
+
+def _sorted_by_date(df):
+    df_sorted = df.sort_values("Date")
+    if not pd.api.types.is_datetime64_any_dtype(df_sorted['Date']):
+        df_sorted['Date'] = pd.to_datetime(df_sorted['Date'], errors='coerce')
+    return df_sorted
+
+def plot_bar(df, x, y, save_path, profile=DEFAULT_PROFILE, aggregates=None):
     """Create bar plot with intelligent handling"""
     try:
-        plt.figure(figsize=(16, 10))
+        fig, ax = new_figure((16, 10))
         
         # Apply mappings
         df_plot = apply_mappings(df)
         
         # Handle different combinations intelligently
-        if df_plot[y].dtype in ['object', 'category'] or y == 'TaskType':
+        if is_categorical(df_plot[y]) or y == 'TaskType':
             # If y is categorical, create a count plot
             if x == y:
                 # If x and y are the same, just show distribution
-                value_counts = df_plot[x].value_counts()
-                colors = plt.cm.viridis(np.linspace(0, 1, len(value_counts)))
-                bars = plt.bar(range(len(value_counts)), value_counts.values, color=colors, alpha=0.8)
-                plt.xticks(range(len(value_counts)), value_counts.index, rotation=45, fontsize=14, ha='right')
-                plt.title(f'Distribution of {x}', fontsize=20, fontweight='bold')
-                plt.ylabel('Count', fontsize=16)
-                
-                # Add value labels
-                for bar, value in zip(bars, value_counts.values):
-                    plt.text(bar.get_x() + bar.get_width()/2, bar.get_height() + max(value_counts.values) * 0.01, 
-                            str(value), ha='center', va='bottom', fontsize=12, fontweight='bold')
+                _count_bars(ax, value_counts(df_plot, x, aggregates))
+                ax.set_title(f'Distribution of {x}', fontsize=20, fontweight='bold')
+                ax.set_ylabel('Count', fontsize=16)
             else:
                 # Cross tabulation for two categorical variables
-                cross_tab = pd.crosstab(df_plot[x], df_plot[y])
-                cross_tab.plot(kind='bar', stacked=False, colormap='viridis', figsize=(16, 10), alpha=0.8)
-                plt.title(f'Count of {y} by {x}', fontsize=20, fontweight='bold')
-                plt.ylabel('Count', fontsize=16)
-                plt.legend(title=y, bbox_to_anchor=(1.05, 1), loc='upper left', fontsize=12)
+                cross_tab = cross_counts(df_plot, x, y, aggregates)
+                cross_tab.plot(kind='bar', stacked=False, colormap='viridis', alpha=0.8, ax=ax)
+                ax.set_title(f'Count of {y} by {x}', fontsize=20, fontweight='bold')
+                ax.set_ylabel('Count', fontsize=16)
+                ax.legend(title=y, bbox_to_anchor=(1.05, 1), loc='upper left', fontsize=12)
         else:
             # If y is numeric, calculate mean
-            avg_data = df_plot.groupby(x)[y].mean().reset_index()
+            avg_data = group_means(df_plot, x, y, aggregates)
             
             # Create bar plot
-            bars = plt.bar(avg_data[x], avg_data[y], color=plt.cm.viridis(np.linspace(0, 1, len(avg_data))), alpha=0.8)
+            bars = ax.bar(avg_data[x], avg_data[y], color=colormaps['viridis'](np.linspace(0, 1, len(avg_data))), alpha=0.8)
             
-            plt.title(f'Average {y} by {x}', fontsize=20, fontweight='bold')
-            plt.ylabel(f'Average {y}', fontsize=16)
+            ax.set_title(f'Average {y} by {x}', fontsize=20, fontweight='bold')
+            ax.set_ylabel(f'Average {y}', fontsize=16)
             
             # Add value labels on bars
             for bar, value in zip(bars, avg_data[y]):
-                plt.text(bar.get_x() + bar.get_width()/2, bar.get_height() + max(avg_data[y]) * 0.01, 
+                ax.text(bar.get_x() + bar.get_width()/2, bar.get_height() + max(avg_data[y]) * 0.01,
                         f'{value:.2f}', ha='center', va='bottom', fontsize=12, fontweight='bold')
         
-        plt.xlabel(x, fontsize=16)
-        plt.xticks(rotation=45, fontsize=12, ha='right')
-        plt.yticks(fontsize=12)
-        plt.grid(True, alpha=0.3, axis='y')
-        plt.tight_layout()
-        plt.savefig(save_path, dpi=300, bbox_inches='tight')
-        plt.close()
-        return save_path
+        ax.set_xlabel(x, fontsize=16)
+        ax.tick_params(axis='x', labelrotation=45, labelsize=12)
+        setp(ax.get_xticklabels(), ha='right')
+        ax.tick_params(axis='y', labelsize=12)
+        ax.grid(True, alpha=0.3, axis='y')
+        return save_figure(fig, save_path, profile)
     except Exception as e:
-        plt.close()
         raise Exception(f"Error creating bar plot: {str(e)}")
 
-def plot_heatmap(df, save_path):
+def plot_heatmap(df, save_path, profile=DEFAULT_PROFILE, aggregates=None):
     """Create correlation heatmap"""
     try:
-        plt.figure(figsize=(16, 14))
+        fig, ax = new_figure((16, 14))
         
-        # Select only numeric columns
-        numeric_cols = df.select_dtypes(include=[np.number]).columns
-        if len(numeric_cols) < 2:
-            raise Exception("Not enough numeric columns for correlation heatmap")
-        
-        numeric_data = df[numeric_cols]
-        numeric_data = numeric_data.loc[:, numeric_data.var() != 0]
-        
-        if numeric_data.shape[1] < 2:
-            raise Exception("Not enough varying numeric columns for correlation")
-        
-        corr = numeric_data.corr()
+        corr = correlation(df, aggregates)
         
         # Create heatmap with better formatting
         mask = np.triu(np.ones_like(corr, dtype=bool))  # Mask upper triangle
         sns.heatmap(corr, mask=mask, annot=True, fmt=".2f", cmap='coolwarm', square=True,
-                   linewidths=0.5, cbar_kws={"shrink": .8}, center=0, 
-                   annot_kws={'fontsize': 12})
-        
-        plt.title('Correlation Heatmap (Lower Triangle)', fontsize=20, fontweight='bold')
-        plt.xticks(fontsize=12, rotation=45)
-        plt.yticks(fontsize=12)
-        plt.tight_layout()
-        plt.savefig(save_path, dpi=300, bbox_inches='tight')
-        plt.close()
-        return save_path
+                   linewidths=0.5, cbar_kws={"shrink": .8}, center=0,
+                   annot_kws={'fontsize': 12}, ax=ax)
+        
+        ax.set_title('Correlation Heatmap (Lower Triangle)', fontsize=20, fontweight='bold')
+        ax.tick_params(axis='x', labelrotation=45, labelsize=12)
+        ax.tick_params(axis='y', labelsize=12)
+        return save_figure(fig, save_path, profile)
     except Exception as e:
-        plt.close()
         raise Exception(f"Error creating heatmap: {str(e)}")
 
+def _json_values(values):
+    """Plain Python list from a Series/array, with NaN as None"""
+    series = pd.Series(values)
+    if series.dtype == np.float32:
+        # float32 columns from the columnar cache: drop the widening noise (6.6 -> 6.599999904)
+        series = series.astype('float64').round(6)
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return [None if pd.isnull(v) else v.isoformat() for v in series]
+    return [None if pd.isnull(v) else (v.item() if hasattr(v, 'item') else v) for v in series.tolist()]
+
+def chart_data(dataset, graph_type, column1, column2):
+    """Aggregated series behind a chart, for the 'data' render profile"""
+    df = dataset.labeled
+    aggregates = dataset.aggregates
+    if graph_type == "histogram":
+        if column1 == 'TaskType' or is_categorical(df[column1]):
+            counts = value_counts(df, column1, aggregates)
+            return {'kind': 'counts', 'labels': _json_values(counts.index), 'counts': _json_values(counts.values)}
+        counts, edges = histogram_bins(df, column1, aggregates)
+        return {'kind': 'histogram', 'bin_edges': _json_values(edges), 'counts': _json_values(counts)}
+    elif graph_type == "bar":
+        if is_categorical(df[column2]) or column2 == 'TaskType':
+            if column1 == column2:
+                counts = value_counts(df, column1, aggregates)
+                return {'kind': 'counts', 'labels': _json_values(counts.index), 'counts': _json_values(counts.values)}
+            cross_tab = cross_counts(df, column1, column2, aggregates)
+            return {
+                'kind': 'crosstab',
+                'index': _json_values(cross_tab.index),
+                'columns': _json_values(cross_tab.columns),
+                'counts': cross_tab.to_numpy().tolist()
+            }
+        avg_data = group_means(df, column1, column2, aggregates)
+        return {'kind': 'mean', 'labels': _json_values(avg_data[column1]), 'values': _json_values(avg_data[column2])}
+    elif graph_type == "scatter":
+        points, reduction, drawn = scatter_reduction(df, column1, column2)
+        if reduction == 'density':
+            counts, x_edges, y_edges = points
+            return {
+                'kind': 'density', 'x_edges': _json_values(x_edges), 'y_edges': _json_values(y_edges),
+                'counts': counts.astype(np.int64).tolist(), 'rows': int(len(df)), 'points': drawn,
+                'reduction': reduction
+            }
+        data = {'kind': 'points', 'x': _json_values(points[column1]), 'y': _json_values(points[column2]),
+                'rows': int(len(df)), 'points': drawn, 'reduction': reduction}
+        if 'TaskType' in df.columns and 'TaskType' not in (column1, column2):
+            data['hue'] = _json_values(points['TaskType'])
+        return data
+    elif graph_type == "line":
+        ordered, reduction = line_rows(dataset.in_date_order(), column1)
+        x = ordered['Date'] if 'Date' in ordered.columns else ordered.index
+        data = {'kind': 'series', 'x': _json_values(x), 'y': _json_values(ordered[column1]),
+                'rows': int(len(df)), 'points': int(len(ordered)), 'reduction': reduction}
+        if _line_hue(ordered, column1) is not None:
+            data['hue'] = _json_values(ordered['TaskType'])
+        return data
+    elif graph_type == "heatmap":
+        corr = correlation(dataset.frame, aggregates)
+        return {'kind': 'correlation', 'columns': list(corr.columns), 'matrix': np.round(corr.to_numpy(), 4).tolist()}
+    raise ValueError(f"Invalid graph type: {graph_type}")
+
+def render_chart(dataset, graph_type, column1, column2, save_path, profile=DEFAULT_PROFILE, window=None):
+    """Render a validated chart request for a store Dataset to save_path.
+
+    `window` (from date_index.parse_window) restricts the chart to the rows
+    in a time window. Returns a summary of what was drawn: {'rows',
+    'points', 'reduction'}, where points and reduction are set for scatter
+    and line charts (see scatter_reduction and line_rows).
+    """
+    dataset = dataset.window(window)
+    df = dataset.labeled
+    summary = {'rows': int(len(df)), 'points': None, 'reduction': None}
+    if profile == 'data':
+        data = chart_data(dataset, graph_type, column1, column2)
+        payload = json.dumps(data).encode('utf-8')
+        if isinstance(save_path, (str, os.PathLike)):
+            with open(save_path, 'wb') as f:
+                f.write(payload)
+        else:
+            save_path.write(payload)
+        summary['points'] = data.get('points')
+        summary['reduction'] = data.get('reduction')
+        return summary
+
+    aggregates = dataset.aggregates
+    if graph_type == "histogram":
+        plot_histogram(df, column1, save_path, profile, aggregates)
+    elif graph_type == "bar":
+        plot_bar(df, column1, column2, save_path, profile, aggregates)
+    elif graph_type == "scatter":
+        points, reduction, summary['points'] = scatter_reduction(df, column1, column2)
+        summary['reduction'] = reduction
+        if reduction == 'density':
+            plot_density(points, column1, column2, len(df), save_path, profile)
+        else:
+            plot_scatter(points, column1, column2, save_path, profile)
+    elif graph_type == "line":
+        ordered, summary['reduction'] = line_rows(dataset.in_date_order(), column1)
+        summary['points'] = int(len(ordered))
+        plot_line(ordered, column1, save_path, profile, ordered=True)
+    elif graph_type == "heatmap":
+        # Select only numeric columns for heatmap
+        numeric_cols = dataset.frame.select_dtypes(include=[np.number]).columns
+        plot_heatmap(dataset.frame[numeric_cols], save_path, profile, aggregates)
+    else:
+        raise ValueError(f"Invalid graph type: {graph_type}")
+    return summary
+
+def render_chart_bytes(dataset, graph_type, column1, column2, profile=DEFAULT_PROFILE, window=None):
+    """Render a validated chart request straight to bytes in memory"""
+    buffer = BytesIO()
+    render_chart(dataset, graph_type, column1, column2, buffer, profile, window)
+    return buffer.getvalue()
@@ -50,6 +50,7 @@ export default function FeatureCompare() {
                 graphType,
                 column1,
                 column2: graphType === "scatter" || graphType === "bar" ? column2 : null,
+                profile: "screen",
             }, {
                 responseType: 'blob',
                 timeout: 30000